@@ -0,0 +1,10 @@
+"""
+Benchmarks
+Deterministic synthetic chains, timings of the node's hot paths, a load
+generator for a running node and a simulation of difficulty retargeting.
+
+Usage: python -m bench.run [--scales small,medium] [--output results.json]
+                           [--baseline baseline.json] [--threshold 1.25]
+       python -m bench.loadgen [--node ws://localhost:8765] [--rate 200] [--duration 30]
+       python -m bench.retarget_sim [--phases 10x200,1x200,8x200,0.25x200] [--check]
+"""
@@ -0,0 +1,287 @@
+"""
+Load Generator
+Drives a node with a mix of protocol requests at a target rate over several
+connections and reports throughput and p50/p95/p99 latency per request type
+as JSON, to find the rate at which a node's latency starts to degrade.
+
+Everything is prepared before the clock starts: wallets are generated and
+transactions signed in the same format as BlockchainClient.send_transaction,
+and blocks for submit_block are mined on the node's current tip. With --key
+the transactions spend from that (funded) wallet, so the node accepts them;
+without it they come from fresh wallets and are rejected for insufficient
+balance, before the node gets to their signatures. Pre-mined blocks are
+submitted in order; once they run out, the last one is resent and rejected.
+
+Requests are sent on schedule whether or not earlier ones were answered, and
+latency counts from the scheduled send time, so a node that falls behind
+shows it in the percentiles rather than by slowing the generator down.
+
+Usage: python -m bench.loadgen [--node ws://localhost:8765] [--rate 200] [--duration 30]
+                               [--connections 8] [--mix send_tx=0.5,get_balance=0.45,submit_block=0.05]
+                               [--key HEX] [--output results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+
+from config import NODE_PORT
+from blockchain_client import BlockchainClient, signing_message, make_transaction
+from bench.synthetic import seal_block
+from src import crypto
+from src.difficulty import target_from_hex
+import miner
+
+MESSAGE_TYPES = ("send_tx", "get_balance", "submit_block", "get_node_info")
+DEFAULT_MIX = "send_tx=0.5,get_balance=0.45,submit_block=0.05"
+DEFAULT_RATE = 200  # Requests per second over all connections
+DEFAULT_DURATION = 30  # Seconds
+DEFAULT_CONNECTIONS = 8
+DEFAULT_WALLETS = 200
+MAX_BLOCKS = 50  # Blocks mined up front for submit_block
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(text):
+    """{message type: share} from "send_tx=0.5,get_balance=0.5"; shares are normalized."""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in MESSAGE_TYPES:
+            raise ValueError(f"Unknown message type {kind!r}, expected one of {', '.join(MESSAGE_TYPES)}")
+        try:
+            mix[kind] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight for {kind}: {weight!r}")
+        if mix[kind] < 0:
+            raise ValueError(f"Negative weight for {kind}")
+    total = sum(mix.values())
+    if not total:
+        raise ValueError("The mix needs at least one message type with a positive weight")
+    return {kind: weight / total for kind, weight in mix.items() if weight}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Per-type and overall stats from [(type, latency seconds, error or None)]."""
+    def stats(entries):
+        latencies = sorted(latency for _, latency, _ in entries)
+        errors = {}
+        for _, _, error in entries:
+            if error is not None:
+                errors[error] = errors.get(error, 0) + 1
+        result = {
+            "count": len(entries),
+            "ok": len(entries) - sum(errors.values()),
+            "throughput": len(entries) / elapsed if elapsed else 0.0,
+            "latency_ms": {f"p{p}": percentile(latencies, p) * 1000 if latencies else None for p in PERCENTILES},
+            "errors": errors,
+        }
+        if latencies:
+            result["latency_ms"]["mean"] = sum(latencies) / len(latencies) * 1000
+            result["latency_ms"]["max"] = latencies[-1] * 1000
+        return result
+
+    by_type = {}
+    for sample in samples:
+        by_type.setdefault(sample[0], []).append(sample)
+    return {"total": stats(samples), "by_type": {kind: stats(entries) for kind, entries in sorted(by_type.items())}}
+
+
+def sign_transfers(count, wallets, private_key=None):
+    """'count' signed 1 PHN transfers to the wallets, from 'private_key' if
+    given, otherwise each from one of the wallets to the next."""
+    base = time.time()
+    funder = crypto.public_key(private_key) if private_key is not None else None
+    items = []
+    for i in range(count):
+        recipient = wallets[i % len(wallets)][1]
+        if private_key is not None:
+            sender_key, sender = private_key, funder
+        else:
+            sender_key, sender = wallets[(i + 1) % len(wallets)]
+        items.append((sender_key, sender, recipient, 1, base + i / 1e6))
+    signatures = crypto.sign_many(
+        [(key, signing_message(sender, recipient, amount, ts)) for key, sender, recipient, amount, ts in items]
+    )
+    return [
+        make_transaction(sender, recipient, amount, ts, signature)
+        for (_, sender, recipient, amount, ts), signature in zip(items, signatures)
+    ]
+
+
+def mine_blocks(count, info, address):
+    """'count' blocks extending the node's tip, each with just a coinbase.
+    All are sealed against the node's current target, so a run that crosses a
+    retarget height may see the later ones rejected."""
+    target = target_from_hex(info["target"]) if "target" in info else None
+    blocks = []
+    prev_hash, index = info["tip"]["hash"], info["length"]
+    for i in range(count):
+        candidate = miner.build_block_candidate(
+            address, info["block_reward"], info["difficulty"], info.get("header_v2_height"), index + i, prev_hash, []
+        )
+        blocks.append(seal_block(candidate, info["difficulty"], target))
+        prev_hash = candidate["hash"]
+    return blocks
+
+
+class Workload:
+    """Prepared requests, handed out in order."""
+
+    def __init__(self, txs, addresses, blocks):
+        self.txs = iter(txs)
+        self.addresses = itertools.cycle(addresses)
+        self.blocks = blocks
+        self.next_block = 0
+
+    def request(self, kind):
+        if kind == "send_tx":
+            return {"type": "send_tx", "tx": next(self.txs)}
+        if kind == "get_balance":
+            return {"type": "get_balance", "address": next(self.addresses)}
+        if kind == "submit_block":
+            block = self.blocks[min(self.next_block, len(self.blocks) - 1)]
+            self.next_block += 1
+            return {"type": "submit_block", "block": block}
+        return {"type": kind}
+
+
+def _error_of(response):
+    if response.get("status") == "error" or "error" in response:
+        return str(response.get("error") or response.get("message") or "error")
+    return None
+
+
+async def _timed_request(client, kind, request, scheduled, samples):
+    loop = asyncio.get_running_loop()
+    try:
+        error = _error_of(await client.send_request(request, retries=0))
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except ConnectionError as e:
+        error = str(e)
+    samples.append((kind, loop.time() - scheduled, error))
+
+
+async def drive(clients, workload, mix, rate, duration, seed=0):
+    """Send requests at 'rate' per second spread over 'clients' for 'duration'
+    seconds. Returns (samples, elapsed seconds)."""
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    total = int(rate * duration)
+    samples = []
+    tasks = []
+    start = loop.time()
+    for n in range(total):
+        scheduled = start + n / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = rng.choices(kinds, weights)[0]
+        client = clients[n % len(clients)]
+        tasks.append(asyncio.create_task(
+            _timed_request(client, kind, workload.request(kind), scheduled, samples)
+        ))
+    await asyncio.gather(*tasks)
+    return samples, loop.time() - start
+
+
+async def run(node_url, rate, duration, connections, mix, private_key=None, wallet_count=DEFAULT_WALLETS, seed=0):
+    clients = [BlockchainClient(node_url) for _ in range(connections)]
+    try:
+        info = await clients[0].send_request({"type": "get_node_info"})
+        if "tip" not in info:
+            raise SystemExit(f"❌ {node_url} did not return node info: {info}")
+
+        start = time.time()
+        wallets = crypto.generate_keypairs(wallet_count)
+        tx_count = math.ceil(rate * duration * mix.get("send_tx", 0) * 1.2) + 10
+        txs = sign_transfers(tx_count, wallets, private_key) if "send_tx" in mix else []
+        block_count = min(math.ceil(rate * duration * mix.get("submit_block", 0)), MAX_BLOCKS)
+        with contextlib.redirect_stdout(io.StringIO()):
+            blocks = mine_blocks(block_count, info, wallets[0][1])
+        crypto.shutdown_sign_pool()
+        print(f"Prepared {len(txs)} transactions and {len(blocks)} blocks "
+              f"in {time.time() - start:.1f}s", file=sys.stderr)
+        if private_key is None and txs:
+            print("No --key given: send_tx requests will be rejected for insufficient balance", file=sys.stderr)
+
+        await asyncio.gather(*[client.connect() for client in clients])
+        print(f"Sending {rate} req/s for {duration}s over {connections} connections...", file=sys.stderr)
+        workload = Workload(txs, [address for _, address in wallets], blocks)
+        samples, elapsed = await drive(clients, workload, mix, rate, duration, seed)
+    finally:
+        await asyncio.gather(*[client.disconnect() for client in clients])
+
+    return {
+        "params": {
+            "node": node_url,
+            "target_rate": rate,
+            "duration": duration,
+            "connections": connections,
+            "mix": mix,
+            "funded": private_key is not None,
+        },
+        "elapsed": elapsed,
+        **summarize(samples, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a PHN node")
+    parser.add_argument("--node", default=f"ws://localhost:{NODE_PORT}", help="Node WebSocket URL")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help=f"Requests per second (default: {DEFAULT_RATE})")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help=f"Seconds (default: {DEFAULT_DURATION})")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help=f"Concurrent connections (default: {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Message types and weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--key", default=os.environ.get("PHN_PRIVATE_KEY"),
+                        help="Funded private key hex to send transactions from; defaults to $PHN_PRIVATE_KEY")
+    parser.add_argument("--wallets", type=int, default=DEFAULT_WALLETS, help=f"Wallets to generate (default: {DEFAULT_WALLETS})")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the order of message types")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    if args.rate <= 0 or args.duration <= 0:
+        parser.error("--rate and --duration must be positive")
+    if args.connections < 1 or args.wallets < 2:
+        parser.error("need at least 1 connection and 2 wallets")
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = asyncio.run(run(args.node, args.rate, args.duration, args.connections, mix, args.key, args.wallets, args.seed))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    total = results["total"]
+    if total["count"]:
+        print(f"{total['count']} requests, {total['throughput']:.1f} req/s, "
+              f"p50 {total['latency_ms']['p50']:.1f} ms, p99 {total['latency_ms']['p99']:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Retarget Simulation
+Mines a simulated chain under the retargeting rules in src/difficulty.py
+while the network hashrate changes, and reports the mean block interval per
+retarget window, to check that intervals settle back to TARGET_BLOCK_TIME
+after each change. No hashing happens: each block takes an exponentially
+distributed time with mean (expected hashes for the target) / hashrate, as
+real mining does.
+
+Hashrates are multiples of the rate that finds blocks every TARGET_BLOCK_TIME
+at the starting target, given as phases of MULTIPLIERxBLOCKS: the default
+10x200,1x200,8x200,0.25x200 starts the chain at ten times the expected
+hashrate, drops back, climbs again and then loses most of it.
+
+With --manipulate, a miner finds the last block of every retarget window and
+stamps it as far ahead as it can, asking each adjustment for the easiest
+target the clamp allows. The timestamp rules (MAX_FUTURE_BLOCK_TIME ahead of
+real time at most, after the median of recent blocks) keep that from adding
+up; --max-future inf shows what happens without the future bound.
+
+Each adjustment estimates the hashrate from only --interval exponential block
+times, so settled intervals still wander by tens of percent around the
+target; without retargeting the default phases would be off by 90% to 300%.
+
+Usage: python -m bench.retarget_sim [--phases 10x200,1x200] [--interval 20]
+                                    [--block-time 60] [--max-factor 4]
+                                    [--manipulate] [--max-future 600]
+                                    [--seed 0] [--check [--tolerance 0.4]] [--output results.json]
+"""
+import argparse
+import json
+import random
+import sys
+from config import TARGET_BLOCK_TIME, RETARGET_INTERVAL, MAX_RETARGET_FACTOR, MAX_FUTURE_BLOCK_TIME
+from src.difficulty import LEGACY_TARGET, RetargetSchedule, median_time_past, target_to_difficulty
+
+DEFAULT_PHASES = "10x200,1x200,8x200,0.25x200"
+DEFAULT_TOLERANCE = 0.4  # --check: allowed relative error of a phase's settled mean interval
+SETTLED_FRACTION = 0.5  # --check: share of each phase (its end) that counts as settled
+
+
+def parse_phases(text):
+    """'10x200,1x200' -> [(10.0, 200), (1.0, 200)]"""
+    phases = []
+    for part in text.split(","):
+        multiplier, sep, blocks = part.strip().partition("x")
+        try:
+            phase = (float(multiplier), int(blocks))
+        except ValueError:
+            raise ValueError(f"Bad phase '{part}', expected MULTIPLIERxBLOCKS") from None
+        if not sep or phase[0] <= 0 or phase[1] < 1:
+            raise ValueError(f"Bad phase '{part}', expected MULTIPLIERxBLOCKS")
+        phases.append(phase)
+    return phases
+
+
+def simulate(phases, interval, block_time, max_factor, seed=0, manipulate=False, max_future=MAX_FUTURE_BLOCK_TIME):
+    """Headers of a simulated chain, each with the phase, hashrate multiplier
+    and target it was mined at, and the real "time" it was found next to the
+    "timestamp" it carries. Every timestamp passes the schedule's rules."""
+    rng = random.Random(seed)
+    schedule = RetargetSchedule(LEGACY_TARGET, 0, interval, block_time, max_factor, max_future=max_future)
+    base_hashrate = 2 ** 256 / (LEGACY_TARGET + 1) / block_time
+    chain = [{"index": 0, "time": 0.0, "timestamp": 0.0, "hash": "0", "phase": 0,
+              "multiplier": phases[0][0], "target": LEGACY_TARGET}]
+    for phase, (multiplier, blocks) in enumerate(phases):
+        for _ in range(blocks):
+            height = len(chain)
+            target = schedule.target_at(chain, height)
+            mean = 2 ** 256 / (target + 1) / (base_hashrate * multiplier)
+            now = chain[-1]["time"] + rng.expovariate(1 / mean)
+            timestamp = max(now, median_time_past(chain, height, schedule.median_blocks) + 1)
+            if manipulate and (height + 1) % interval == 0:
+                # Closes a window: claim it took the longest the clamp still counts
+                window_start = chain[max(height - interval, 0)]["timestamp"]
+                timestamp = max(timestamp, min(window_start + max_factor * block_time * interval, now + max_future))
+            valid, msg = schedule.check_timestamp(chain, height, timestamp, now)
+            assert valid, msg
+            chain.append({
+                "index": height,
+                "time": now,
+                "timestamp": timestamp,
+                "hash": f"{height:x}",  # Only needs to be unique: the schedule keys its cache on it
+                "phase": phase,
+                "multiplier": multiplier,
+                "target": target,
+            })
+    return chain
+
+
+def _mean_interval(blocks, chain):
+    return sum(block["time"] - chain[block["index"] - 1]["time"] for block in blocks) / len(blocks)
+
+
+def summarize(chain, phases, interval, block_time):
+    mined = chain[1:]
+    windows = []
+    for start in range(0, len(mined), interval):
+        blocks = mined[start:start + interval]
+        windows.append({
+            "from_height": blocks[0]["index"],
+            "multiplier": blocks[0]["multiplier"],
+            "difficulty": target_to_difficulty(blocks[0]["target"]),
+            "mean_interval": _mean_interval(blocks, chain),
+        })
+    summary = []
+    for phase, (multiplier, _) in enumerate(phases):
+        blocks = [block for block in mined if block["phase"] == phase]
+        settled = blocks[int(len(blocks) * (1 - SETTLED_FRACTION)):] or blocks
+        summary.append({
+            "multiplier": multiplier,
+            "blocks": len(blocks),
+            "mean_interval": _mean_interval(blocks, chain),
+            "settled_mean_interval": _mean_interval(settled, chain),
+        })
+    return {"block_time": block_time, "interval": interval, "phases": summary, "windows": windows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate PHN difficulty retargeting under changing hashrate")
+    parser.add_argument("--phases", default=DEFAULT_PHASES, help=f"Hashrate phases (default: {DEFAULT_PHASES})")
+    parser.add_argument("--interval", type=int, default=RETARGET_INTERVAL,
+                        help=f"Blocks between adjustments (default: {RETARGET_INTERVAL})")
+    parser.add_argument("--block-time", type=float, default=TARGET_BLOCK_TIME,
+                        help=f"Target seconds per block (default: {TARGET_BLOCK_TIME})")
+    parser.add_argument("--max-factor", type=float, default=MAX_RETARGET_FACTOR,
+                        help=f"Largest adjustment either way (default: {MAX_RETARGET_FACTOR})")
+    parser.add_argument("--manipulate", action="store_true", help="Stamp every window's last block as late as allowed")
+    parser.add_argument("--max-future", type=float, default=MAX_FUTURE_BLOCK_TIME,
+                        help=f"Seconds a timestamp may run ahead of real time (default: {MAX_FUTURE_BLOCK_TIME})")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for block times")
+    parser.add_argument("--check", action="store_true", help="Exit 1 unless every phase settles within --tolerance")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed relative error of the settled mean interval (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    if args.interval < 1 or args.block_time <= 0 or args.max_factor <= 1:
+        parser.error("need --interval >= 1, --block-time > 0 and --max-factor > 1")
+    try:
+        phases = parse_phases(args.phases)
+    except ValueError as e:
+        parser.error(str(e))
+
+    chain = simulate(phases, args.interval, args.block_time, args.max_factor, args.seed, args.manipulate, args.max_future)
+    results = summarize(chain, phases, args.interval, args.block_time)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    print(f"{'height':>8} {'hashrate':>9} {'difficulty':>11} {'interval':>9}", file=sys.stderr)
+    for window in results["windows"]:
+        print(f"{window['from_height']:>8} {window['multiplier']:>8g}x {window['difficulty']:>11.3f} "
+              f"{window['mean_interval']:>8.1f}s", file=sys.stderr)
+    failed = False
+    for phase in results["phases"]:
+        error = abs(phase["settled_mean_interval"] - args.block_time) / args.block_time
+        failed |= error > args.tolerance
+        print(f"{phase['multiplier']:g}x hashrate: {phase['mean_interval']:.1f}s per block, "
+              f"{phase['settled_mean_interval']:.1f}s once settled ({error:.0%} off)", file=sys.stderr)
+    if args.check and failed:
+        print(f"❌ Block intervals did not settle within {args.tolerance:.0%} of {args.block_time:g}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
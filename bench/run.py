@@ -0,0 +1,304 @@
+"""
+Benchmark Runner
+Times the hot paths (block hashing, balance lookups, signature checks, block
+validation, chain save/load and the miner's hash loop) and measures the
+memory of a loaded chain on synthetic chains of several sizes, writes the
+results as JSON and optionally compares them with a saved baseline.
+
+Usage: python -m bench.run [--scales small,medium] [--output results.json]
+                           [--baseline baseline.json] [--threshold 1.25]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from config import DIFFICULTY
+from bench.synthetic import make_chain
+from src import genesis
+from src.ledger import LedgerState
+from src.pow import validate_block
+from src import crypto, transactions
+from src.compact import compact_chain
+from src.header import HEADER_VERSION, merkle_root, pack_header_prefix
+import miner
+
+# name -> (blocks, transactions per block, addresses)
+SCALES = {
+    "small": (20, 50, 100),
+    "medium": (50, 200, 1000),
+    "large": (200, 500, 5000),
+}
+DEFAULT_SCALES = "small,medium"
+REPEAT = 5  # Runs per benchmark; the fastest is reported
+DEFAULT_THRESHOLD = 1.25  # Slowdown ratio against the baseline that counts as a regression
+BALANCE_LOOKUPS = 10000
+MINER_HASHES_V1 = 2000
+MINER_HASHES_V2 = 50000
+
+
+def measure(func, ops=1, setup=None, repeat=REPEAT):
+    """Time 'func' 'repeat' times ('setup' runs untimed before each run)."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        "seconds": best,
+        "median_seconds": statistics.median(times),
+        "ops": ops,
+        "per_op_us": best / ops * 1e6,
+    }
+
+
+def measure_memory(build, ops=1):
+    """Bytes still allocated by what 'build' returns."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"bytes": allocated, "ops": ops, "per_op_bytes": allocated / ops}
+
+
+def clear_signature_caches():
+    transactions._verified_txs.clear()
+    crypto._public_keys.clear()
+
+
+@contextlib.contextmanager
+def isolated_store():
+    """Run save/load_blockchain against an empty block store in a temp directory."""
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp(prefix="phn-bench-")
+    os.chdir(directory)
+    genesis._block_store = None
+    try:
+        yield directory
+    finally:
+        if genesis._block_store is not None:
+            genesis._block_store.close()
+            genesis._block_store = None
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_hashing(chain, owner, wallets):
+    return {"hash_block": measure(lambda: [genesis.hash_block(block) for block in chain], len(chain))}
+
+
+def bench_balances(chain, owner, wallets):
+    addresses = [address for _, address in wallets[:20]]
+    ledger = LedgerState.from_chain(chain)
+    lookups = [wallets[i % len(wallets)][1] for i in range(BALANCE_LOOKUPS)]
+    return {
+        "get_balance_scan": measure(
+            lambda: [transactions.get_balance(address, chain) for address in addresses], len(addresses)
+        ),
+        "get_balance_ledger": measure(
+            lambda: [transactions.get_balance(address, chain, ledger) for address in lookups], len(lookups)
+        ),
+        "ledger_from_chain": measure(lambda: LedgerState.from_chain(chain), len(chain)),
+    }
+
+
+def bench_signatures(chain, owner, wallets):
+    txs = [tx for tx in chain[-1]["transactions"] if tx["sender"] != "coinbase"]
+    results = {
+        "verify_signature": measure(
+            lambda: [transactions.verify_signature(tx) for tx in txs], len(txs), clear_signature_caches
+        ),
+        "verify_signatures_parallel": measure(
+            lambda: transactions.verify_signatures(txs, parallel=True), len(txs), clear_signature_caches
+        ),
+    }
+    transactions.shutdown_verify_pool()
+    return results
+
+
+def bench_validation(chain, owner, wallets):
+    parent = chain[:-1]
+    block = chain[-1]
+    state = {}
+
+    def setup():
+        clear_signature_caches()
+        state["ledger"] = LedgerState.from_chain(parent)
+
+    def run():
+        valid, message = validate_block(block, parent, owner, state["ledger"])
+        if not valid:
+            raise RuntimeError(f"Synthetic block failed validation: {message}")
+
+    results = {"validate_block": measure(run, len(block["transactions"]), setup)}
+    transactions.shutdown_verify_pool()
+    return results
+
+
+def bench_storage(chain, owner, wallets):
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        def fresh():
+            if genesis._block_store is not None:
+                genesis._block_store.close()
+                genesis._block_store = None
+            shutil.rmtree(genesis.BLOCKSTORE_DIR, ignore_errors=True)
+
+        def reopen():
+            if genesis._block_store is not None:
+                genesis._block_store.close()
+                genesis._block_store = None
+
+        with isolated_store():
+            results["save_blockchain"] = measure(lambda: genesis.save_blockchain(chain), len(chain), fresh)
+            results["load_blockchain"] = measure(lambda: genesis.load_blockchain(), len(chain), reopen)
+            results["load_blockchain_lazy"] = measure(lambda: genesis.load_blockchain(lazy=True), len(chain), reopen)
+    return results
+
+
+def bench_miner(chain, owner, wallets):
+    miner._init_worker(threading.Event(), [0])
+    candidate = {k: v for k, v in chain[-1].items() if k != "hash"}
+    prefix = pack_header_prefix({
+        **candidate,
+        "version": HEADER_VERSION,
+        "difficulty": DIFFICULTY,
+        "merkle_root": merkle_root(candidate["transactions"]),
+    })
+    # A target no hash can meet, so the whole range is searched
+    return {
+        "miner_hash_loop_v1": measure(
+            lambda: miner._search_nonce_range(candidate, "", 0, 0, MINER_HASHES_V1), MINER_HASHES_V1
+        ),
+        "miner_hash_loop_v2": measure(
+            lambda: miner._search_nonce_range(prefix, "", 0, 0, MINER_HASHES_V2), MINER_HASHES_V2
+        ),
+    }
+
+
+def bench_memory(chain, owner, wallets):
+    # A JSON round trip gives every block its own strings, as loading from disk does
+    stored = json.dumps(chain)
+    tx_count = sum(len(block["transactions"]) for block in chain)
+    loaded = json.loads(stored)
+    compact = compact_chain(loaded)
+    ledger = LedgerState.from_chain(loaded)
+    if LedgerState.from_chain(compact).balances != ledger.balances:
+        raise RuntimeError("Compact chain gives different balances")
+    return {
+        "chain_memory_dict": measure_memory(lambda: json.loads(stored), tx_count),
+        "chain_memory_compact": measure_memory(lambda: compact_chain(json.loads(stored)), tx_count),
+        "compact_chain": measure(lambda: compact_chain(loaded), tx_count),
+        "ledger_from_chain_compact": measure(lambda: LedgerState.from_chain(compact), len(chain)),
+        "hash_block_compact": measure(lambda: [genesis.hash_block(block) for block in compact], len(chain)),
+    }
+
+
+BENCHMARKS = [bench_hashing, bench_balances, bench_signatures, bench_validation, bench_storage, bench_miner, bench_memory]
+
+
+def per_op(stats):
+    """(value, unit) of a result: time per op, or bytes per op for memory results."""
+    if "per_op_bytes" in stats:
+        return stats["per_op_bytes"], "B/op"
+    return stats["per_op_us"], "us/op"
+
+
+def run_scale(name):
+    blocks, txs_per_block, addresses = SCALES[name]
+    start = time.perf_counter()
+    chain, owner, wallets = make_chain(blocks, txs_per_block, addresses)
+    print(f"[{name}] generated {blocks} blocks x {txs_per_block} txs, {addresses} addresses "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    results = {}
+    for bench in BENCHMARKS:
+        for bench_name, stats in bench(chain, owner, wallets).items():
+            results[bench_name] = stats
+            value, unit = per_op(stats)
+            print(f"[{name}] {bench_name:28s} {value:12.2f} {unit}", file=sys.stderr)
+    return {
+        "params": {"blocks": blocks, "txs_per_block": txs_per_block, "addresses": addresses},
+        "benchmarks": results,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print per-benchmark ratios against 'baseline'. Returns the regressions as
+    [(scale, benchmark, ratio)]."""
+    regressions = []
+    for scale, data in results["results"].items():
+        base_scale = baseline.get("results", {}).get(scale)
+        if base_scale is None:
+            print(f"{scale}: not in baseline, skipped")
+            continue
+        for bench_name, stats in data["benchmarks"].items():
+            base = base_scale["benchmarks"].get(bench_name)
+            if base is None:
+                continue
+            value, unit = per_op(stats)
+            base_value, _ = per_op(base)
+            ratio = value / base_value if base_value else float("inf")
+            flag = "REGRESSION" if ratio > threshold else ""
+            print(f"{scale:8s} {bench_name:28s} {base_value:12.2f} -> {value:12.2f} {unit}  x{ratio:5.2f} {flag}")
+            if ratio > threshold:
+                regressions.append((scale, bench_name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PHN hot paths")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"Comma-separated of {', '.join(SCALES)} (default: {DEFAULT_SCALES})")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against a results JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Slowdown ratio that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        raise SystemExit(f"Unknown scale(s): {', '.join(unknown)}")
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.time(),
+            "repeat": REPEAT,
+        },
+        "results": {scale: run_scale(scale) for scale in scales},
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} benchmark(s) slower than x{args.threshold} of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Synthetic Chains
+Deterministic chains for benchmarks: the same (blocks, txs_per_block,
+addresses, seed) always gives the same wallets, transactions and block hashes.
+Blocks are valid under validate_block (signatures, balances, proof of work).
+"""
+import hashlib
+import random
+from ecdsa import SigningKey, SECP256k1
+from config import BLOCK_REWARD, DIFFICULTY, MAX_BLOCK_TXS, OWNER_ALLOCATION
+from src.genesis import hash_block
+from src.difficulty import difficulty_to_target, hash_meets_target, target_at
+
+BASE_TIMESTAMP = 1700000000.0
+BLOCK_INTERVAL = 10.0  # Seconds between synthetic block timestamps
+
+
+def make_wallets(count, seed=0):
+    """[(SigningKey, canonical address)] derived from 'seed'."""
+    wallets = []
+    for i in range(count):
+        digest = hashlib.sha256(f"phn-bench-{seed}-{i}".encode()).digest()
+        secexp = int.from_bytes(digest, "big") % (SECP256k1.order - 1) + 1
+        sk = SigningKey.from_secret_exponent(secexp, curve=SECP256k1)
+        wallets.append((sk, sk.get_verifying_key().to_string().hex()))
+    return wallets
+
+
+def sign_tx(sk, sender, recipient, amount, timestamp):
+    """A transaction in the same shape as BlockchainClient.send_transaction,
+    with a deterministic (RFC 6979) signature."""
+    message = f"{sender}{recipient}{amount}{timestamp}".encode()
+    return {
+        "sender": sender,
+        "recipient": recipient,
+        "amount": amount,
+        "timestamp": timestamp,
+        "txid": hashlib.sha256(message).hexdigest(),
+        "signature": sk.sign_deterministic(message).hex(),
+    }
+
+
+def coinbase_tx(recipient, amount, height, timestamp):
+    return {
+        "sender": "coinbase",
+        "recipient": recipient,
+        "amount": amount,
+        "timestamp": timestamp,
+        "txid": hashlib.sha256(f"coinbase_{recipient}_{height}".encode()).hexdigest(),
+        "signature": "coinbase_signature",
+    }
+
+
+def seal_block(block, difficulty=DIFFICULTY, target=None):
+    """Find a nonce for 'block' and set its hash. 'target' overrides 'difficulty'."""
+    target = difficulty_to_target(difficulty) if target is None else target
+    block["nonce"] = 0
+    while True:
+        block_hash = hash_block(block)
+        if hash_meets_target(block_hash, target):
+            block["hash"] = block_hash
+            return block
+        block["nonce"] += 1
+
+
+def make_chain(blocks, txs_per_block, addresses, seed=0, difficulty=DIFFICULTY):
+    """A chain of 'blocks' blocks (genesis included) with up to 'txs_per_block'
+    signed transfers each between 'addresses' wallets. The owner funds every
+    wallet first, so the first few blocks are funding blocks.
+    Returns (chain, owner_address, wallets)."""
+    rng = random.Random(seed)
+    txs_per_block = min(txs_per_block, MAX_BLOCK_TXS - 1)
+    owner_sk, owner = make_wallets(1, f"{seed}-owner")[0]
+    wallets = make_wallets(addresses, seed)
+    balances = {owner: OWNER_ALLOCATION}
+    funding = OWNER_ALLOCATION // (2 * max(addresses, 1))
+
+    genesis = {
+        "index": 0,
+        "timestamp": BASE_TIMESTAMP,
+        "transactions": [coinbase_tx(owner, OWNER_ALLOCATION, 0, BASE_TIMESTAMP)],
+        "prev_hash": "0",
+        "nonce": 0,
+    }
+    genesis["transactions"][0]["signature"] = "genesis_signature"
+    genesis["hash"] = hash_block(genesis)
+    chain = [genesis]
+
+    to_fund = list(wallets)
+    for height in range(1, blocks):
+        timestamp = BASE_TIMESTAMP + height * BLOCK_INTERVAL
+        txs = [coinbase_tx(owner, BLOCK_REWARD, height, timestamp)]
+        received = {}  # Credits only become spendable in the next block, as in validate_block
+        for i in range(txs_per_block):
+            tx_time = timestamp + i / 1000
+            if to_fund:
+                sk, recipient = to_fund.pop(0)
+                sender_sk, sender, amount = owner_sk, owner, funding
+            else:
+                sender_sk, sender = rng.choice(wallets)
+                recipient = rng.choice(wallets)[1]
+                amount = rng.randint(1, 5)
+                if balances.get(sender, 0) < amount:
+                    continue
+            balances[sender] -= amount
+            received[recipient] = received.get(recipient, 0) + amount
+            txs.append(sign_tx(sender_sk, sender, recipient, amount, tx_time))
+        for address, amount in received.items():
+            balances[address] = balances.get(address, 0) + amount
+        balances[owner] += BLOCK_REWARD
+        block = {
+            "index": height,
+            "timestamp": timestamp,
+            "transactions": txs,
+            "prev_hash": chain[-1]["hash"],
+            "nonce": 0,
+        }
+        # Under retargeting the schedule, not 'difficulty', decides what validate_block expects
+        chain.append(seal_block(block, difficulty, target_at(chain, height) if difficulty == DIFFICULTY else None))
+    return chain, owner, wallets
@@ -2,114 +2,401 @@ import asyncio
 import websockets
 import json
 import hashlib
+import os
 import time
-from ecdsa import SigningKey, SECP256k1
+from collections import deque
+from src import codec, crypto
+from src.crypto import get_display_address
+from src.blockstore import BlockStore
+from src.directory import is_canonical_address, is_display_address
 
-# -------------------------
-# Utility: Address Conversion
-# -------------------------
-def get_display_address(canonical_public_key_hex):
-    """Convert canonical public key hex to PHN address."""
-    public_key_bytes = bytes.fromhex(canonical_public_key_hex)
-    address_hash = hashlib.sha256(public_key_bytes).hexdigest()[:40]
-    return f"PHN{address_hash}"
-
-def canonical_from_display(display_address):
-    """Placeholder for PHN -> Canonical conversion."""
-    if display_address.startswith("PHN"):
-        raise NotImplementedError("PHN to canonical conversion not implemented. Use canonical hex for now.")
-    return display_address
+CACHE_DIR = "client_chain"  # Local on-disk copy of the node's blocks
+ADDRESS_CACHE_FILE = "client_addresses.json"  # PHN address -> canonical key, learned from the node
+
+def normalize_display_address(display_address):
+    return "PHN" + display_address[3:].lower()
+
+def signing_message(sender, recipient, amount, timestamp):
+    """The bytes a transaction's signature covers (and its txid hashes)."""
+    return f"{sender}{recipient}{amount}{timestamp}".encode()
+
+def make_transaction(sender, recipient, amount, timestamp, signature):
+    return {
+        "sender": sender,
+        "recipient": recipient,
+        "amount": amount,
+        "timestamp": timestamp,
+        "txid": hashlib.sha256(signing_message(sender, recipient, amount, timestamp)).hexdigest(),
+        "signature": signature,
+    }
 
 # -------------------------
 # Blockchain Client
 # -------------------------
 class BlockchainClient:
-    def __init__(self, node_url="ws://31.97.229.45:8765"):
+    """Keeps one long-lived WebSocket to the node. Requests carry an "id" so many
+    calls can be in flight at once and responses are matched back to callers.
+    Responses without an id (older nodes) are matched to requests in order.
+    On connect the client offers the binary block encoding; nodes that don't
+    know it keep talking JSON."""
+
+    PUSH_TYPES = ("new_tip", "mempool_delta")
+    BATCH_SIZE = 1000  # Matches the node's MAX_BATCH_SIZE
+    BLOCK_PAGE_SIZE = 100  # Blocks asked for per get_blocks request
+    HEADER_PAGE_SIZE = 2000  # Matches the node's MAX_HEADERS_PAGE
+    MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, node_url="ws://31.97.229.45:8765", ping_interval=20, ping_timeout=20,
+                 request_timeout=30, reconnect_attempts=5, binary=True, address_cache=None):
         self.node_url = node_url
-    
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.request_timeout = request_timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.binary = binary
+        self.encoding = "json"  # What the node agreed to in the hello exchange
+        self.on_push = None  # Optional callback for pushed (subscription) messages
+        self.ws = None
+        self._reader = None
+        self._pending = {}
+        self._unmatched = deque()  # Request ids in send order, for id-less responses
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+        self.address_cache = address_cache  # Optional file the PHN address cache is kept in
+        self._addresses = {}  # PHN address -> canonical address
+        if address_cache is not None and os.path.exists(address_cache):
+            try:
+                with open(address_cache) as f:
+                    self._addresses = json.load(f)
+            except (OSError, ValueError):
+                pass
+
     async def connect(self):
-        """Reconnect every time to avoid ping timeout."""
-        self.ws = await websockets.connect(
-            self.node_url,
-            ping_interval=None,   # disable auto ping
-            ping_timeout=None
-        )
+        """Open the connection if it isn't already, retrying with backoff."""
+        async with self._connect_lock:
+            if self.ws is not None:
+                return
+            delay = 0.5
+            for attempt in range(1, self.reconnect_attempts + 1):
+                try:
+                    self.ws = await websockets.connect(
+                        self.node_url,
+                        ping_interval=self.ping_interval,  # keepalive pings
+                        ping_timeout=self.ping_timeout,
+                        max_size=self.MAX_MESSAGE_SIZE
+                    )
+                    break
+                except (OSError, websockets.exceptions.WebSocketException) as e:
+                    if attempt == self.reconnect_attempts:
+                        raise ConnectionError(f"Could not connect to {self.node_url}: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 10)
+            self.encoding = await self._negotiate(self.ws) if self.binary else "json"
+            self._reader = asyncio.create_task(self._read_loop(self.ws))
+
+    async def _negotiate(self, ws):
+        """Offer the binary encoding before any other request is sent."""
+        try:
+            await ws.send(json.dumps({"type": "hello", "encodings": [codec.WIRE_ENCODING, "json"]}))
+            response = json.loads(await asyncio.wait_for(ws.recv(), self.request_timeout))
+        except (asyncio.TimeoutError, ValueError, websockets.exceptions.ConnectionClosed):
+            return "json"
+        return response.get("encoding", "json")
 
     async def disconnect(self):
         """Close WebSocket."""
-        if hasattr(self, 'ws'):
-            await self.ws.close()
+        if self.ws is not None:
+            ws, self.ws = self.ws, None
+            await ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+
+    def _resolve(self, request_id, response):
+        future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    async def _read_loop(self, ws):
+        """Route responses to their callers until the connection ends. Any error,
+        including a frame that doesn't decode, closes the socket and fails every
+        pending request so callers retry on a fresh connection instead of hanging."""
+        error = "Connection to node lost"
+        try:
+            async for raw in ws:
+                response = codec.decode_message(raw) if isinstance(raw, bytes) else json.loads(raw)
+                if not isinstance(response, dict):
+                    raise ValueError(f"expected a JSON object, got {type(response).__name__}")
+                request_id = response.get("id")
+                if request_id in self._pending:
+                    self._unmatched.remove(request_id)
+                    self._resolve(request_id, response)
+                elif response.get("type") in self.PUSH_TYPES:
+                    if self.on_push is not None:
+                        self.on_push(response)
+                elif request_id is None and self._unmatched:
+                    self._resolve(self._unmatched.popleft(), response)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            error = f"Connection to node dropped after a bad message: {e}"
+            print(f"❌ {error}")
+        finally:
+            if self.ws is ws:
+                self.ws = None
+            self._unmatched.clear()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(error))
+            self._pending = {}
+            await ws.close()
+
+    async def send_request(self, request, retries=1):
+        """Send JSON request and wait for the matching response.
+        On a dropped connection the request is retried after reconnecting."""
+        for attempt in range(retries + 1):
+            await self.connect()
+            self._next_id += 1
+            request_id = self._next_id
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            self._unmatched.append(request_id)
+            try:
+                if self.ws is None:
+                    raise ConnectionError("Connection to node lost")
+                await self.ws.send(json.dumps({**request, "id": request_id}))
+                return await asyncio.wait_for(future, self.request_timeout)
+            except (ConnectionError, websockets.exceptions.ConnectionClosed):
+                if attempt == retries:
+                    raise ConnectionError("Connection to node lost")
+            finally:
+                if self._pending.pop(request_id, None) is not None and request_id in self._unmatched:
+                    self._unmatched.remove(request_id)
+
+    # --- PHN addresses ---
+    def _save_address_cache(self):
+        if self.address_cache is None:
+            return
+        tmp = self.address_cache + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._addresses, f)
+        os.replace(tmp, self.address_cache)
+
+    def remember_address(self, canonical_address):
+        """Add a canonical address (e.g. your own) to the PHN address cache. Returns its PHN address."""
+        display = get_display_address(canonical_address)
+        if self._addresses.get(display) != canonical_address:
+            self._addresses[display] = canonical_address
+            self._save_address_cache()
+        return display
+
+    async def resolve_addresses(self, addresses):
+        """{address: canonical address or None} for canonical or PHN addresses.
+        PHN addresses come from the local cache or else the node's directory;
+        the node's answers are checked against the PHN hash before being cached.
+        None means the address is malformed or has never appeared on chain."""
+        resolved = {}
+        unknown = []
+        for address in addresses:
+            if is_canonical_address(address):
+                resolved[address] = address
+            elif is_display_address(address):
+                resolved[address] = self._addresses.get(normalize_display_address(address))
+                if resolved[address] is None:
+                    unknown.append(address)
+            else:
+                resolved[address] = None
+        chunks = [unknown[i:i + self.BATCH_SIZE] for i in range(0, len(unknown), self.BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *[self.send_request({"type": "resolve_address", "addresses": chunk}) for chunk in chunks]
+        )
+        learned = False
+        for response in responses:
+            if "resolved" not in response:
+                raise RuntimeError(response.get("error", "Node does not support resolve_address"))
+            for address, canonical in response["resolved"].items():
+                display = normalize_display_address(address)
+                if is_canonical_address(canonical) and get_display_address(canonical) == display:
+                    resolved[address] = self._addresses[display] = canonical
+                    learned = True
+        if learned:
+            self._save_address_cache()
+        return resolved
 
-    async def send_request(self, request):
-        """Send JSON request and wait for response."""
-        await self.ws.send(json.dumps(request))
-        response = await self.ws.recv()
-        return json.loads(response)
+    async def resolve_address(self, address):
+        """Canonical address for a canonical or PHN address, or None."""
+        return (await self.resolve_addresses([address]))[address]
 
     async def get_balance(self, address):
-        """Fetch balance of an address."""
-        await self.connect()
+        """Fetch balance of an address (canonical or PHN)."""
+        if is_display_address(address):
+            canonical = await self.resolve_address(address)
+            if canonical is None:
+                return 0  # Never seen on chain, so nothing was ever sent to it
+            address = canonical
         request = {"type": "get_balance", "address": address}
         response = await self.send_request(request)
-        await self.disconnect()
         return response.get("balance", 0)
 
-    async def send_transaction(self, sk, sender_address, recipient, amount):
-        """Send signed transaction."""
-        await self.connect()
+    async def get_balances(self, addresses):
+        """Fetch balances of many addresses (canonical or PHN), BATCH_SIZE per request.
+        Returns {address as given: balance}."""
+        display = [address for address in addresses if is_display_address(address)]
+        if not display:
+            return await self._get_balances(addresses)
+        resolved = await self.resolve_addresses(display)
+        lookup = [resolved.get(address, address) for address in addresses]
+        balances = await self._get_balances(list(dict.fromkeys(a for a in lookup if a is not None)))
+        return {address: balances.get(canonical, 0) if canonical is not None else 0
+                for address, canonical in zip(addresses, lookup)}
+
+    async def _get_balances(self, addresses):
+        chunks = [addresses[i:i + self.BATCH_SIZE] for i in range(0, len(addresses), self.BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *[self.send_request({"type": "get_balances", "addresses": chunk}) for chunk in chunks]
+        )
+        balances = {}
+        for chunk, response in zip(chunks, responses):
+            if "balances" in response:
+                balances.update(response["balances"])
+            else:
+                # Node without batch support: pipeline single lookups instead
+                values = await asyncio.gather(*[self.get_balance(address) for address in chunk])
+                balances.update(zip(chunk, values))
+        return balances
 
+    async def get_tx_status(self, txids):
+        """Fetch confirmed/pending/unknown status of many txids, BATCH_SIZE per request."""
+        chunks = [txids[i:i + self.BATCH_SIZE] for i in range(0, len(txids), self.BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *[self.send_request({"type": "get_tx_status", "txids": chunk}) for chunk in chunks]
+        )
+        statuses = {}
+        for chunk, response in zip(chunks, responses):
+            if "statuses" not in response:
+                raise RuntimeError(response.get("error", "Node does not support get_tx_status"))
+            statuses.update(response["statuses"])
+        return statuses
+
+    async def get_tx(self, txid):
+        """Look up a transaction by txid (confirmed or pending)."""
+        return await self.send_request({"type": "get_tx", "txid": txid})
+
+    async def get_address_history(self, address, offset=0, limit=50):
+        """One page of an address's transactions, newest first."""
+        return await self.send_request(
+            {"type": "get_address_history", "address": address, "offset": offset, "limit": limit}
+        )
+
+    async def send_transaction(self, private_key, sender_address, recipient, amount):
+        """Send signed transaction. 'private_key' is the sender's private key hex
+        (an ecdsa SigningKey is still accepted)."""
+        if not isinstance(private_key, str):
+            private_key = private_key.to_string().hex()
         # PHN → Canonical conversion if needed
-        if recipient.startswith("PHN"):
-            try:
-                recipient = canonical_from_display(recipient)
-            except NotImplementedError:
-                print("❌ PHN to canonical conversion not implemented. Use canonical hex.")
-                await self.disconnect()
-                return {"status": "error", "error": "Invalid recipient address"}
+        if is_display_address(recipient):
+            canonical = await self.resolve_address(recipient)
+            if canonical is None:
+                return {"status": "error", "error": f"Unknown PHN address {recipient}: it has no transactions on chain yet, use its canonical address"}
+            recipient = canonical
 
         timestamp = time.time()
-        message = f"{sender_address}{recipient}{amount}{timestamp}".encode()
-        signature = sk.sign(message).hex()
-        txid = hashlib.sha256(message).hexdigest()
-
-        tx = {
-            "sender": sender_address,
-            "recipient": recipient,
-            "amount": amount,
-            "timestamp": timestamp,
-            "txid": txid,
-            "signature": signature,
-        }
-
+        signature = crypto.sign(private_key, signing_message(sender_address, recipient, amount, timestamp))
+        tx = make_transaction(sender_address, recipient, amount, timestamp, signature)
         request = {"type": "send_tx", "tx": tx}
         response = await self.send_request(request)
-        await self.disconnect()
         return response
 
+    async def send_transactions(self, txs, window=32, on_result=None):
+        """Submit already-signed transactions over this connection with up to
+        'window' send_tx requests in flight. 'on_result(tx, response)' is called
+        as each answer arrives. Returns the responses in the order of 'txs'."""
+        slots = asyncio.Semaphore(window)
+
+        async def submit(tx):
+            try:
+                response = await self.send_request({"type": "send_tx", "tx": tx})
+            except ConnectionError as e:
+                response = {"status": "error", "error": str(e)}
+            finally:
+                slots.release()
+            if on_result is not None:
+                on_result(tx, response)
+            return response
+
+        tasks = []
+        for tx in txs:
+            await slots.acquire()
+            tasks.append(asyncio.create_task(submit(tx)))
+        return await asyncio.gather(*tasks)
+
     async def get_blockchain_info(self):
         """Get blockchain summary."""
-        await self.connect()
         request = {"type": "get_blockchain"}
         response = await self.send_request(request)
-        await self.disconnect()
         return response
 
+    async def get_blocks(self, from_height, count):
+        """Full blocks from 'from_height'; the node may return fewer than 'count'."""
+        return await self.send_request({"type": "get_blocks", "from_height": from_height, "count": count})
+
+    async def get_headers(self, from_height, count):
+        """Block headers (index, hash, prev_hash, timestamp, nonce) from 'from_height'."""
+        return await self.send_request({"type": "get_headers", "from_height": from_height, "count": count})
+
+    async def _fork_point(self, store):
+        """Height up to which 'store' agrees with the node's chain."""
+        height = len(store)
+        while height > 0:
+            start = max(0, height - self.HEADER_PAGE_SIZE)
+            response = await self.get_headers(start, height - start)
+            if "headers" not in response:
+                return len(store)  # Node without get_headers: trust the cache
+            headers = response["headers"]
+            for h in range(min(height, start + len(headers)) - 1, start - 1, -1):
+                if headers[h - start]["hash"] == store.read_header(h)["hash"]:
+                    return h + 1
+            height = start
+        return 0
+
+    async def sync_blocks(self, store):
+        """Async iterator that brings 'store' (a BlockStore) up to the node's tip,
+        one get_blocks page at a time, yielding each new block. Blocks already in
+        the store are not fetched again; if the node's chain forked below the
+        cached tip, the store is rolled back to the fork point first."""
+        height = await self._fork_point(store)
+        if height < len(store):
+            store.truncate(height)
+        while True:
+            response = await self.get_blocks(height, self.BLOCK_PAGE_SIZE)
+            if "blocks" not in response:
+                # Node without get_blocks: one full download
+                response = await self.get_blockchain_info()
+                response = {"blocks": response.get("blockchain", [])[height:], "length": response.get("length", 0)}
+            blocks = response["blocks"]
+            for block in blocks:
+                store.append(block, sync=False)
+                yield block
+            store.sync()
+            height += len(blocks)
+            if not blocks or height >= response["length"]:
+                break
+
 # -------------------------
 # Interactive CLI
 # -------------------------
 async def interactive_client():
-    client = BlockchainClient()
+    client = BlockchainClient(address_cache=ADDRESS_CACHE_FILE)
 
     # Input private key
     sk_hex = input("🔑 Enter your Private Key (hex): ").strip()
     try:
-        sk = SigningKey.from_string(bytes.fromhex(sk_hex), curve=SECP256k1)
+        sender_canonical = crypto.public_key(sk_hex)
     except Exception:
         print("❌ Invalid private key format!")
         return
 
-    sender_canonical = sk.get_verifying_key().to_string().hex()
-    sender_display = get_display_address(sender_canonical)
+    sender_display = client.remember_address(sender_canonical)
 
     print(f"📱 Your PHN Address: {sender_display}")
 
@@ -129,7 +416,7 @@ async def interactive_client():
 
         try:
             if choice == "1":
-                addr = input("Enter address (Press Enter for your address): ").strip()
+                addr = input("Enter address, PHN or canonical (Press Enter for your address): ").strip()
                 if not addr:
                     addr = sender_canonical
                 bal = await client.get_balance(addr)
@@ -142,20 +429,28 @@ async def interactive_client():
                     print("❌ Amount must be positive!")
                     continue
                 print("🚀 Sending transaction...")
-                response = await client.send_transaction(sk, sender_canonical, recipient, amount)
+                response = await client.send_transaction(sk_hex, sender_canonical, recipient, amount)
                 if response.get("status") == "success":
                     print(f"✅ TX sent! TXID: {response.get('txid')}")
                 else:
                     print(f"❌ TX failed: {response.get('error')}")
 
             elif choice == "3":
-                info = await client.get_blockchain_info()
-                print(f"📊 Blockchain Height: {info.get('length', 0)} blocks")
-                for block in info.get('blockchain', [])[-3:]:
-                    print(f"   Block #{block['index']}: {len(block['transactions'])} TXs")
+                cache = BlockStore(CACHE_DIR)
+                try:
+                    new_blocks = 0
+                    async for _ in client.sync_blocks(cache):
+                        new_blocks += 1
+                    print(f"📊 Blockchain Height: {len(cache)} blocks ({new_blocks} new)")
+                    for height in range(max(0, len(cache) - 3), len(cache)):
+                        block = cache[height]
+                        print(f"   Block #{block['index']}: {len(block['transactions'])} TXs")
+                finally:
+                    cache.close()
 
             elif choice == "4":
                 print("👋 Goodbye!")
+                await client.disconnect()
                 break
 
             else:
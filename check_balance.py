@@ -2,13 +2,28 @@ import asyncio
 import websockets
 import json
 import sys
+import argparse
 from wallet import get_display_address
 from config import NODE_PORT
+from blockchain_client import BlockchainClient, ADDRESS_CACHE_FILE
+from src.directory import is_canonical_address, is_display_address
+from src.queries import MAX_BATCH_SIZE
 
 async def check_balance(node_url, canonical_address):
     """Check balance of an address.
-    'canonical_address' is the raw public key hex."""
+    'canonical_address' is the raw public key hex or a PHN address, which the
+    node resolves to its public key."""
     try:
+        if is_display_address(canonical_address):
+            display_address = canonical_address
+            client = BlockchainClient(node_url, address_cache=ADDRESS_CACHE_FILE)
+            try:
+                canonical_address = await client.resolve_address(display_address)
+            finally:
+                await client.disconnect()
+            if canonical_address is None:
+                print(f"✅ Balance of {display_address}: 0 PHN (address not seen on chain yet)")
+                return 0
         print(f"Checking balance for: {get_display_address(canonical_address)} ({canonical_address[:8]}...)")
         print(f"Connecting to node: {node_url}")
         
@@ -70,20 +85,100 @@ async def get_node_info(node_url):
         print(f"Could not get node info: {e}")
         return False
 
+async def stream_balances(node_url, source, out, batch_size=500, concurrency=4):
+    """Read addresses (one per line) from 'source' and write one JSON line per
+    address to 'out', with at most 'concurrency' batch requests in flight.
+    A batch larger than the node's MAX_BATCH_SIZE still goes out as several
+    requests of at most MAX_BATCH_SIZE addresses."""
+    if batch_size < 1 or concurrency < 1:
+        raise ValueError("batch_size and concurrency must be at least 1")
+    client = BlockchainClient(node_url, address_cache=ADDRESS_CACHE_FILE)
+    client.BATCH_SIZE = min(batch_size, MAX_BATCH_SIZE)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def run_batch(batch):
+        try:
+            valid = [address for address in batch if is_canonical_address(address) or is_display_address(address)]
+            balances = await client.get_balances(valid) if valid else {}
+            for address in batch:
+                if address in balances:
+                    display_address = address if is_display_address(address) else get_display_address(address)
+                    line = {"address": address, "display_address": display_address, "balance": balances[address]}
+                else:
+                    line = {"address": address, "error": "invalid address"}
+                out.write(json.dumps(line) + "\n")
+        except Exception as e:
+            for address in batch:
+                out.write(json.dumps({"address": address, "error": str(e)}) + "\n")
+        finally:
+            out.flush()
+            semaphore.release()
+
+    async def submit(batch):
+        await semaphore.acquire()
+        task = asyncio.create_task(run_batch(batch))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def read_batch():
+        """Up to batch_size addresses; fewer only at end of input."""
+        batch = []
+        while len(batch) < batch_size:
+            line = source.readline()
+            if not line:
+                break
+            address = line.strip()
+            if address:
+                batch.append(address)
+        return batch
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            # Reads block (stdin waits on its writer), so keep them off the event loop
+            batch = await loop.run_in_executor(None, read_batch)
+            if batch:
+                await submit(batch)
+            if len(batch) < batch_size:
+                break
+        await asyncio.gather(*list(tasks))
+    finally:
+        await client.disconnect()
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python check_balance.py <node_ws_url> [canonical_address]")
-        print(f"Example: python check_balance.py ws://localhost:{NODE_PORT} <your_128_char_hex_public_key>")
-        print("If no address provided, will show node info only")
-        sys.exit(1)
-    
-    node_url = sys.argv[1]
-    
-    if len(sys.argv) >= 3:
-        address_input = sys.argv[2]
-        # Basic validation for canonical address format
-        if not (isinstance(address_input, str) and len(address_input) == 128 and all(c in '0123456789abcdefABCDEF' for c in address_input)):
-            print(f"❌ Provided address '{address_input}' is not a valid 128-character hexadecimal public key.")
+    parser = argparse.ArgumentParser(
+        description="Check PHN balances",
+        epilog=f"Example: python check_balance.py ws://localhost:{NODE_PORT} <your_128_char_hex_public_key>"
+    )
+    parser.add_argument("node_url", help="Node WebSocket URL")
+    parser.add_argument("address", nargs="?", help="Canonical or PHN address; if omitted (and no --stream), shows node info only")
+    parser.add_argument("--stream", metavar="FILE", help="Read addresses from FILE ('-' for stdin) and write JSONL results to stdout")
+    parser.add_argument("--batch-size", type=positive_int, default=500,
+                        help=f"Addresses per request in --stream mode (at most {MAX_BATCH_SIZE} go in one request)")
+    parser.add_argument("--concurrency", type=positive_int, default=4, help="Batch requests in flight in --stream mode")
+    args = parser.parse_args()
+
+    node_url = args.node_url
+
+    if args.stream:
+        source = sys.stdin if args.stream == "-" else open(args.stream)
+        try:
+            asyncio.run(stream_balances(node_url, source, sys.stdout, args.batch_size, args.concurrency))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    elif args.address:
+        address_input = args.address
+        # Basic validation for canonical or PHN address format
+        if not is_canonical_address(address_input) and not is_display_address(address_input):
+            print(f"❌ Provided address '{address_input}' is not a valid 128-character hexadecimal public key or PHN address.")
             sys.exit(1)
         asyncio.run(check_balance(node_url, address_input))
     else:
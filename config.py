@@ -1,9 +1,36 @@
 # Blockchain Node Configuration
 NODE_PORT = 8765
 
-BLOCKCHAIN_FILE = "blockchain.json"
+BLOCKCHAIN_FILE = "blockchain.json" # Legacy format, migrated into BLOCKSTORE_DIR on first load
+BLOCKSTORE_DIR = "blocks"
+BLOCKSTORE_SEGMENT_SIZE = 64 * 1024 * 1024 # Bytes per block segment file
+BLOCKSTORE_BINARY = True # Write new block records in the binary codec (False = JSON)
+TXINDEX_FILE = "txindex.sqlite" # txid and address-history index
+DIRECTORY_FILE = "addresses.sqlite" # PHN display address -> canonical public key index
+SNAPSHOT_DIR = "snapshots" # Ledger state snapshots, next to the block store
+SNAPSHOT_INTERVAL = 1000 # Blocks between automatic ledger snapshots
+SNAPSHOT_KEEP = 3 # Snapshots kept when pruning
 
 # Mining Parameters
 DIFFICULTY = 2 # Number of leading zeros required for block hash (e.g., "00")
 BLOCK_REWARD = 1 # PHN per block
+OWNER_ALLOCATION = 1000000 # PHN allocated to the owner in the genesis block
+MAX_BLOCK_TXS = 1000 # Transactions per block, including the coinbase
+HEADER_V2_HEIGHT = None # First height that must use the binary v2 header (None = not scheduled)
+CHECKPOINTS = {} # Trusted {height: block hash}; verify_chain only checks hash linkage up to the highest one
+MAX_REORG_DEPTH = 100 # Most recent blocks the in-memory ledger keeps undo data for (and can roll back)
 
+# Retargeting (see src/difficulty.py); DIFFICULTY sets the starting target
+RETARGET_HEIGHT = None # First height the target may adjust from (None = not scheduled: fixed DIFFICULTY target)
+RETARGET_INTERVAL = 20 # Blocks between target adjustments
+TARGET_BLOCK_TIME = 60 # Seconds per block that adjustments aim for
+MAX_RETARGET_FACTOR = 4 # Most one adjustment can scale the target by, either way
+MEDIAN_TIME_BLOCKS = 11 # Once retargeting: a block's timestamp must be after the median of this many before it
+MAX_FUTURE_BLOCK_TIME = 600 # Once retargeting: seconds a block's timestamp may be ahead of the node's clock
+
+# Mempool
+MEMPOOL_MAX_BYTES = 32 * 1024 * 1024 # Memory budget for pending transactions
+
+# Metrics
+METRICS_ENABLED = True # Record counters and timings (get_metrics); False makes instrumentation a no-op
+METRICS_PORT = None # Serve Prometheus text on http://host:METRICS_PORT/metrics (None = off)
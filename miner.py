@@ -4,32 +4,42 @@ import json
 import time
 import hashlib
 import argparse
-from ecdsa import SigningKey, SECP256k1
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED
+from src.header import HEADER_VERSION, merkle_root, pack_header_prefix, hash_with_nonce
+from src.subscriptions import tip_header
+from src.difficulty import difficulty_to_target, target_from_hex, target_to_hex, target_to_difficulty
+from src import crypto, metrics
+from src.crypto import get_display_address
 
 # Node WebSocket URL (hardcoded or could come from .env or argument)
 NODE_URL = "ws://31.97.229.45:8765"  # replace port if needed
 MINING_INTERVAL = 1  # seconds
+NONCE_SPACE = 2 ** 32  # Nonces split into one contiguous range per worker
+STOP_CHECK_INTERVAL = 10000  # Hashes between checks of the shared stop flag
+HASHRATE_REPORT_INTERVAL = 5  # seconds
+POOL_CHUNK_PER_WORKER = 2 ** 16  # Pool mode: nonces per worker between share reports
+MAX_BLOCK_TXS = 1000  # Including the coinbase; updated from get_node_info
 
 # --- Wallet utilities ---
 def generate_wallet():
-    sk = SigningKey.generate(curve=SECP256k1)
-    vk = sk.get_verifying_key()
-    canonical_pub = vk.to_string().hex()
-    return sk, canonical_pub
-
-def get_display_address(canonical_pub_hex):
-    pub_bytes = bytes.fromhex(canonical_pub_hex)
-    return "PHN" + hashlib.sha256(pub_bytes).hexdigest()[:40]
+    return crypto.generate_keypair()
 
 # --- Blockchain communication ---
 async def get_node_info(ws):
-    """Fetch node info like difficulty and block reward from the node."""
+    """Fetch node info like difficulty, target and block reward from the node."""
     await ws.send(json.dumps({"type": "get_node_info"}))
     data = json.loads(await ws.recv())
-    # Expected response keys: difficulty, block_reward
+    # Expected response keys: difficulty, target, block_reward, header_v2_height, max_block_txs
+    # 'difficulty' is the value for the v2 header's difficulty field (the target in compact form once retargeting)
     difficulty = data.get("difficulty", 4)  # default fallback
     block_reward = data.get("block_reward", 1)  # default fallback
-    return difficulty, block_reward
+    header_v2_height = data.get("header_v2_height")  # None: node only accepts v1 blocks
+    # Nodes from before retargeting only send the leading-zeros difficulty
+    target = target_from_hex(data["target"]) if "target" in data else difficulty_to_target(difficulty)
+    global MAX_BLOCK_TXS
+    MAX_BLOCK_TXS = data.get("max_block_txs", MAX_BLOCK_TXS)
+    return difficulty, block_reward, header_v2_height, target
 
 async def get_pending_transactions(ws):
     await ws.send(json.dumps({"type": "get_pending"}))
@@ -50,108 +60,483 @@ def hash_block(block):
     block_copy = {k: v for k, v in block.items() if k != 'hash'}
     return hashlib.sha256(json.dumps(block_copy, sort_keys=True).encode()).hexdigest()
 
-async def mine(miner_canonical_address):
-    print(f"⛏️ Miner started for address: {get_display_address(miner_canonical_address)}")
-    print(f"   Connecting to node: {NODE_URL}")
+# --- Multi-process nonce search ---
+_stop_event = None
+_hash_counts = None
 
-    try:
-        async with websockets.connect(NODE_URL) as ws:
-            print("✅ Connected to node!")
+def _init_worker(stop_event, hash_counts):
+    global _stop_event, _hash_counts
+    _stop_event = stop_event
+    _hash_counts = hash_counts
 
-            difficulty, block_reward = await get_node_info(ws)
-            print(f"⚙️ Difficulty: {difficulty}, Block Reward: {block_reward}")
-
-            while True:
-                blockchain, chain_length = await get_blockchain_info(ws)
-                if not blockchain:
-                    print("Waiting for blockchain data...")
-                    await asyncio.sleep(MINING_INTERVAL)
-                    continue
-
-                last_block = blockchain[-1]
-                pending = await get_pending_transactions(ws)
-
-                if not pending:
-                    print(f"No pending tx. Waiting {MINING_INTERVAL}s...")
-                    await asyncio.sleep(MINING_INTERVAL)
-                    continue
-
-                print(f"\nFound {len(pending)} pending transactions. Mining...")
-
-                # Coinbase transaction paying miner the block reward
-                coinbase_tx = {
-                    "sender": "coinbase",
-                    "recipient": miner_canonical_address,
-                    "amount": block_reward,
-                    "timestamp": time.time(),
-                    "txid": hashlib.sha256(f"coinbase_{miner_canonical_address}_{time.time()}".encode()).hexdigest(),
-                    "signature": "coinbase_signature"
-                }
-
-                # Prepare block candidate
-                block_candidate = {
-                    "index": chain_length,
-                    "timestamp": time.time(),
-                    "transactions": [coinbase_tx] + pending,
-                    "prev_hash": last_block["hash"],
-                    "nonce": 0
-                }
-
-                target_prefix = '0' * difficulty
-                nonce = 0
-                start_time = time.time()
+def _search_nonce_range(work, target_hex, worker_id, start, end):
+    """Pool worker: try nonces in [start, end) until one hits the target or the stop flag is set.
+    'work' is either a v1 block dict (hashed as JSON) or a packed v2 header prefix.
+    Hashes are compared with the 64-char hex target as strings, which orders
+    them the same as int(hash, 16) <= target without the conversion."""
+    if isinstance(work, bytes):
+        base = hashlib.sha256(work)
+        hash_nonce = lambda nonce: hash_with_nonce(base, nonce)
+    else:
+        def hash_nonce(nonce):
+            work["nonce"] = nonce
+            return hash_block(work)
 
-                while True:
-                    block_candidate["nonce"] = nonce
-                    current_hash = hash_block(block_candidate)
+    batch_start = start
+    while batch_start < end and not _stop_event.is_set():
+        batch_end = min(batch_start + STOP_CHECK_INTERVAL, end)
+        for nonce in range(batch_start, batch_end):
+            current_hash = hash_nonce(nonce)
+            if current_hash <= target_hex:
+                _stop_event.set()
+                _hash_counts[worker_id] += nonce - batch_start + 1
+                return nonce, current_hash
+        _hash_counts[worker_id] += batch_end - batch_start
+        batch_start = batch_end
+    return None
+
+def _collect_shares(work, share_target_hex, block_target_hex, worker_id, start, end):
+    """Pool worker for pool mining: every nonce in [start, end) whose hash meets
+    the share target. Stops early (and stops the other workers) on a block."""
+    if isinstance(work, bytes):
+        base = hashlib.sha256(work)
+        hash_nonce = lambda nonce: hash_with_nonce(base, nonce)
+    else:
+        def hash_nonce(nonce):
+            work["nonce"] = nonce
+            return hash_block(work)
+
+    hits = []
+    batch_start = start
+    while batch_start < end and not _stop_event.is_set():
+        batch_end = min(batch_start + STOP_CHECK_INTERVAL, end)
+        for nonce in range(batch_start, batch_end):
+            current_hash = hash_nonce(nonce)
+            if current_hash <= share_target_hex:
+                hits.append((nonce, current_hash))
+                if current_hash <= block_target_hex:
+                    _stop_event.set()
+                    _hash_counts[worker_id] += nonce - batch_start + 1
+                    return hits
+        _hash_counts[worker_id] += batch_end - batch_start
+        batch_start = batch_end
+    return hits
+
+class MiningPool:
+    """Splits the nonce space of a block candidate across worker processes,
+    keeping the asyncio event loop free while hashing."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.stop_event = multiprocessing.Event()
+        self.hash_counts = multiprocessing.Array('Q', workers, lock=False)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self.stop_event, self.hash_counts)
+        )
+
+    def stop(self):
+        self.stop_event.set()
+
+    def shutdown(self):
+        self.stop_event.set()
+        self.executor.shutdown()
 
-                    if current_hash.startswith(target_prefix):
-                        block_candidate["hash"] = current_hash
-                        print(f"🎉 Block #{block_candidate['index']} mined in {time.time() - start_time:.2f}s!")
-                        print(f"   Hash: {current_hash}")
+    async def _report_hashrate(self, start_time):
+        while True:
+            await asyncio.sleep(HASHRATE_REPORT_INTERVAL)
+            elapsed = time.time() - start_time
+            rates = [count / elapsed for count in self.hash_counts]
+            per_worker = ", ".join(f"w{i}: {rate / 1000:.1f}" for i, rate in enumerate(rates))
+            print(f"   Hashrate: {sum(rates) / 1000:.1f} kH/s ({per_worker})")
+            metrics.gauge("phn_miner_hashrate", "Hashes per second over the current candidate").set(sum(rates))
+
+    async def search_shares(self, block_candidate, share_target_hex, block_target_hex, start, end, abandon=None):
+        """All (nonce, hash) in [start, end) meeting the share target, split across
+        the workers. Cut short by a block-level hit or the 'abandon' event."""
+        self.stop_event.clear()
+        for i in range(self.workers):
+            self.hash_counts[i] = 0
+        if block_candidate.get("version", 1) >= HEADER_VERSION:
+            work = pack_header_prefix(block_candidate)
+        else:
+            work = block_candidate
+        size = -(-(end - start) // self.workers)
+        futures = [
+            asyncio.wrap_future(self.executor.submit(
+                _collect_shares, work, share_target_hex, block_target_hex, i,
+                start + i * size, min(start + (i + 1) * size, end)
+            ))
+            for i in range(self.workers)
+        ]
+        watcher = asyncio.create_task(abandon.wait()) if abandon is not None else None
+        try:
+            waiting = set(futures) | ({watcher} if watcher is not None else set())
+            while futures and not all(future.done() for future in futures):
+                done, waiting = await asyncio.wait(waiting, return_when=FIRST_COMPLETED)
+                if watcher in done:
+                    break
+        finally:
+            self.stop_event.set()
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            if watcher is not None:
+                watcher.cancel()
+            metrics.counter("phn_miner_hashes_total", "Nonces tried").inc(sum(self.hash_counts))
+        return sorted(hit for result in results if isinstance(result, list) for hit in result)
+
+    async def search(self, block_candidate, target_hex, abandon=None):
+        """Return (nonce, hash) for the first worker to find one, or None if the
+        space was exhausted, stop() was called or the 'abandon' event got set."""
+        self.stop_event.clear()
+        for i in range(self.workers):
+            self.hash_counts[i] = 0
+        range_size = NONCE_SPACE // self.workers
+        if block_candidate.get("version", 1) >= HEADER_VERSION:
+            work = pack_header_prefix(block_candidate)
+        else:
+            work = block_candidate
+        futures = [
+            asyncio.wrap_future(self.executor.submit(
+                _search_nonce_range, work, target_hex, i, i * range_size, (i + 1) * range_size
+            ))
+            for i in range(self.workers)
+        ]
+        reporter = asyncio.create_task(self._report_hashrate(time.time()))
+        watcher = asyncio.create_task(abandon.wait()) if abandon is not None else None
+        found = None
+        try:
+            pending = set(futures)
+            while pending and found is None:
+                waiting = pending | {watcher} if watcher is not None else pending
+                done, _ = await asyncio.wait(waiting, return_when=FIRST_COMPLETED)
+                if watcher in done:
+                    break
+                for future in done:
+                    pending.discard(future)
+                    if future.result() is not None:
+                        found = future.result()
                         break
+        finally:
+            self.stop_event.set()
+            await asyncio.gather(*futures, return_exceptions=True)
+            reporter.cancel()
+            metrics.counter("phn_miner_hashes_total", "Nonces tried").inc(sum(self.hash_counts))
+            if watcher is not None:
+                watcher.cancel()
+        return found
+
+def build_block_candidate(miner_canonical_address, block_reward, difficulty, header_v2_height, index, prev_hash, pending):
+    # Coinbase transaction paying miner the block reward
+    coinbase_tx = {
+        "sender": "coinbase",
+        "recipient": miner_canonical_address,
+        "amount": block_reward,
+        "timestamp": time.time(),
+        "txid": hashlib.sha256(f"coinbase_{miner_canonical_address}_{time.time()}".encode()).hexdigest(),
+        "signature": "coinbase_signature"
+    }
+
+    # Prepare block candidate
+    block_candidate = {
+        "index": index,
+        "timestamp": time.time(),
+        "transactions": [coinbase_tx] + pending[:MAX_BLOCK_TXS - 1],
+        "prev_hash": prev_hash,
+        "nonce": 0
+    }
+    if header_v2_height is not None and index >= header_v2_height:
+        # Binary header: hashing cost no longer depends on the transactions
+        block_candidate["version"] = HEADER_VERSION
+        block_candidate["difficulty"] = difficulty
+        block_candidate["merkle_root"] = merkle_root(block_candidate["transactions"])
+    return block_candidate
+
+async def mine_candidate(pool, block_candidate, target, abandon=None):
+    """Search for a nonce whose hash is <= 'target'. Returns False if the candidate was abandoned or the space exhausted."""
+    start_time = time.time()
+    with metrics.timed("phn_miner_candidate_seconds", "Time spent searching one block candidate"):
+        found = await pool.search(block_candidate, target_to_hex(target), abandon)
+    if found is None:
+        if abandon is not None and abandon.is_set():
+            print("🔄 New chain tip, abandoning stale block candidate")
+        else:
+            print("Nonce space exhausted, rebuilding block candidate...")
+        return False
+
+    block_candidate["nonce"], block_candidate["hash"] = found
+    print(f"🎉 Block #{block_candidate['index']} mined in {time.time() - start_time:.2f}s!")
+    print(f"   Hash: {block_candidate['hash']}")
+    return True
+
+def report_submission(resp):
+    accepted = resp.get("status") == "success"
+    metrics.counter("phn_miner_blocks_submitted_total", "Blocks submitted to the node",
+                    result="accepted" if accepted else "rejected").inc()
+    if accepted:
+        print("✅ Block accepted by node!")
+    else:
+        print(f"❌ Block rejected: {resp.get('message', 'Unknown error')}")
+
+class ChainTipState:
+    """Chain tip, next block's target and header difficulty, and pending
+    transactions as pushed by the node's subscribe feed."""
+
+    def __init__(self, tip, length, pending, target, difficulty):
+        self.tip = tip
+        self.length = length
+        self.target = target
+        self.difficulty = difficulty
+        self.pending = {tx["txid"]: tx for tx in pending}
+        self.tip_changed = asyncio.Event()
+        self.work_available = asyncio.Event()
+        if self.pending:
+            self.work_available.set()
+
+    def handle_push(self, message):
+        if message["type"] == "new_tip":
+            target = target_from_hex(message["target"]) if "target" in message else self.target
+            difficulty = message.get("difficulty", self.difficulty)
+            # Our own accepted block moves the tip before the node's push tells us the new target
+            if message["tip"]["hash"] != self.tip["hash"] or (target, difficulty) != (self.target, self.difficulty):
+                self.tip = message["tip"]
+                self.length = message["length"]
+                self.target = target
+                self.difficulty = difficulty
+                self.tip_changed.set()
+                self.work_available.set()
+        elif message["type"] == "mempool_delta":
+            for txid in message.get("removed", []):
+                self.pending.pop(txid, None)
+            for tx in message.get("added", []):
+                self.pending[tx["txid"]] = tx
+            if message.get("added"):
+                self.work_available.set()
 
-                    nonce += 1
-                    if nonce % 100000 == 0:
-                        print(f"   Tried {nonce} nonces... Current hash: {current_hash[:12]}")
+async def _read_messages(ws, state, responses):
+    """Route pushed messages to the tip state and everything else to 'responses'."""
+    async for raw in ws:
+        message = json.loads(raw)
+        if message.get("type") in ("new_tip", "mempool_delta"):
+            state.handle_push(message)
+        else:
+            await responses.put(message)
 
-                print("Submitting block...")
-                resp = await submit_block(ws, block_candidate)
+async def subscribe(ws, target, difficulty):
+    """Ask the node to push chain tips and mempool deltas. Returns None if unsupported.
+    'target' and 'difficulty' (from get_node_info) stand in if the node doesn't send them."""
+    await ws.send(json.dumps({"type": "subscribe", "topics": ["tip", "mempool"]}))
+    data = json.loads(await ws.recv())
+    while data.get("type") in ("new_tip", "mempool_delta"):
+        # Pushes can race ahead of the reply; the reply's snapshot already covers them
+        data = json.loads(await ws.recv())
+    if data.get("type") != "subscribed" or not data.get("tip"):
+        return None
+    if "target" in data:
+        target = target_from_hex(data["target"])
+    difficulty = data.get("difficulty", difficulty)
+    return ChainTipState(data["tip"], data["length"], data.get("pending_transactions", []), target, difficulty)
+
+async def mine_subscribed(ws, pool, state, miner_canonical_address, block_reward, header_v2_height):
+    responses = asyncio.Queue()
+    reader = asyncio.create_task(_read_messages(ws, state, responses))
+    try:
+        while True:
+            if not state.pending:
+                print("No pending tx. Waiting for mempool updates...")
+                state.work_available.clear()
+                waiter = asyncio.create_task(state.work_available.wait())
+                await asyncio.wait([reader, waiter], return_when=FIRST_COMPLETED)
+                waiter.cancel()
+                if reader.done():
+                    reader.result()
+                    raise ConnectionError("Node connection closed")
+                continue
+
+            pending = list(state.pending.values())
+            print(f"\nFound {len(pending)} pending transactions. Mining on tip #{state.tip['index']}...")
+            state.tip_changed.clear()
+            block_candidate = build_block_candidate(
+                miner_canonical_address, block_reward, state.difficulty, header_v2_height,
+                state.length, state.tip["hash"], pending
+            )
+            if not await mine_candidate(pool, block_candidate, state.target, state.tip_changed):
+                continue
+
+            print("Submitting block...")
+            await ws.send(json.dumps({"type": "submit_block", "block": block_candidate}))
+            resp = await responses.get()
+            report_submission(resp)
+            if resp.get("status") == "success":
+                # Move on from our own block right away; the node's push may arrive later
+                state.handle_push({"type": "new_tip", "tip": tip_header(block_candidate), "length": block_candidate["index"] + 1})
+                state.handle_push({"type": "mempool_delta", "removed": [tx["txid"] for tx in block_candidate["transactions"]]})
+    finally:
+        reader.cancel()
+
+async def mine_polling(ws, pool, miner_canonical_address, block_reward, header_v2_height):
+    while True:
+        blockchain, chain_length = await get_blockchain_info(ws)
+        if not blockchain:
+            print("Waiting for blockchain data...")
+            await asyncio.sleep(MINING_INTERVAL)
+            continue
+
+        last_block = blockchain[-1]
+        pending = await get_pending_transactions(ws)
 
-                if resp.get("status") == "success":
-                    print("✅ Block accepted by node!")
-                else:
-                    print(f"❌ Block rejected: {resp.get('message', 'Unknown error')}")
+        if not pending:
+            print(f"No pending tx. Waiting {MINING_INTERVAL}s...")
+            await asyncio.sleep(MINING_INTERVAL)
+            continue
 
-                await asyncio.sleep(1)
+        # The target can change with every block
+        difficulty, _, _, target = await get_node_info(ws)
+        print(f"\nFound {len(pending)} pending transactions. Mining...")
+        block_candidate = build_block_candidate(
+            miner_canonical_address, block_reward, difficulty, header_v2_height,
+            chain_length, last_block["hash"], pending
+        )
+        if not await mine_candidate(pool, block_candidate, target):
+            continue
+
+        print("Submitting block...")
+        report_submission(await submit_block(ws, block_candidate))
+
+        await asyncio.sleep(1)
+
+async def mine(miner_canonical_address, workers=1):
+    print(f"⛏️ Miner started for address: {get_display_address(miner_canonical_address)}")
+    print(f"   Connecting to node: {NODE_URL} ({workers} worker process{'es' if workers > 1 else ''})")
+
+    pool = MiningPool(workers)
+    try:
+        async with websockets.connect(NODE_URL) as ws:
+            print("✅ Connected to node!")
+
+            difficulty, block_reward, header_v2_height, target = await get_node_info(ws)
+            print(f"⚙️ Difficulty: {target_to_difficulty(target):.2f} (target {target_to_hex(target)}), Block Reward: {block_reward}")
+
+            state = await subscribe(ws, target, difficulty)
+            if state is not None:
+                print(f"📡 Subscribed to chain tip #{state.tip['index']} and mempool updates")
+                await mine_subscribed(ws, pool, state, miner_canonical_address, block_reward, header_v2_height)
+            else:
+                print("Node does not support subscriptions, polling instead")
+                await mine_polling(ws, pool, miner_canonical_address, block_reward, header_v2_height)
 
     except Exception as e:
         print(f"❌ Miner error: {e}")
         await asyncio.sleep(MINING_INTERVAL * 2)
+    finally:
+        pool.shutdown()
+
+async def _read_pool_messages(ws, jobs, new_job):
+    """Pool mode: keep the latest job and report share results."""
+    async for raw in ws:
+        message = json.loads(raw)
+        if message.get("type") in ("job", "idle"):
+            jobs["current"] = message if message["type"] == "job" else None
+            new_job.set()
+        elif message.get("type") == "share_result":
+            status = message.get("status")
+            metrics.counter("phn_miner_shares_total", "Shares sent to the pool", status=status).inc()
+            if status == "block":
+                print(f"🎉 Share at nonce {message['nonce']} solved block #{message.get('index')}!")
+            elif status != "accepted":
+                print(f"Share at nonce {message['nonce']} {status}")
+        elif message.get("type") == "login":
+            print(f"✅ Logged in to pool as miner {message['miner_id']}")
+        elif "error" in message:
+            print(f"❌ Pool error: {message['error']}")
+
+async def mine_pool(pool_url, miner_canonical_address, workers=1):
+    """Work on (template, nonce range) jobs handed out by a pool coordinator (pool.py),
+    reporting every hash that meets the pool's share target."""
+    print(f"⛏️ Pool miner started for address: {get_display_address(miner_canonical_address)}")
+    print(f"   Connecting to pool: {pool_url} ({workers} worker process{'es' if workers > 1 else ''})")
+
+    pool = MiningPool(workers)
+    try:
+        async with websockets.connect(pool_url, max_size=16 * 1024 * 1024) as ws:
+            await ws.send(json.dumps({"type": "login", "address": miner_canonical_address}))
+            jobs = {"current": None}
+            new_job = asyncio.Event()
+            reader = asyncio.create_task(_read_pool_messages(ws, jobs, new_job))
+            try:
+                while True:
+                    waiter = asyncio.create_task(new_job.wait())
+                    await asyncio.wait([reader, waiter], return_when=FIRST_COMPLETED)
+                    waiter.cancel()
+                    if reader.done():
+                        reader.result()
+                        raise ConnectionError("Pool connection closed")
+                    new_job.clear()
+                    job = jobs["current"]
+                    if job is None:
+                        print("Pool has no work, waiting for the next job...")
+                        continue
+                    block = job["block"]
+                    share_target_hex, block_target_hex = job["share_target"], job["target"]
+                    print(f"\nJob {job['job_id']}: block #{block['index']}, {len(block['transactions'])} txs, "
+                          f"nonces {job['nonce_start']}-{job['nonce_end']}, "
+                          f"share difficulty {target_to_difficulty(target_from_hex(share_target_hex)):.2f}")
+                    start = job["nonce_start"]
+                    while start < job["nonce_end"] and not new_job.is_set():
+                        end = min(start + POOL_CHUNK_PER_WORKER * workers, job["nonce_end"])
+                        begin = time.time()
+                        hits = await pool.search_shares(block, share_target_hex, block_target_hex, start, end, new_job)
+                        elapsed = time.time() - begin
+                        hashes = sum(pool.hash_counts)
+                        if elapsed > 0:
+                            metrics.gauge("phn_miner_hashrate", "Hashes per second over the current candidate").set(hashes / elapsed)
+                            print(f"   Hashrate: {hashes / elapsed / 1000:.1f} kH/s, {len(hits)} shares")
+                        for nonce, _ in hits:
+                            await ws.send(json.dumps({"type": "share", "job_id": job["job_id"], "nonce": nonce}))
+                        start = end
+                    if not new_job.is_set():
+                        await ws.send(json.dumps({"type": "get_job"}))
+            finally:
+                reader.cancel()
+    except Exception as e:
+        print(f"❌ Pool miner error: {e}")
+        await asyncio.sleep(MINING_INTERVAL * 2)
+    finally:
+        pool.shutdown()
 
 # --- Main entry ---
 async def main():
     parser = argparse.ArgumentParser(description="PHN Miner")
     parser.add_argument('-g', '--generate', action='store_true', help="Generate new wallet for mining")
     parser.add_argument('-p', '--private', type=str, help="Use existing private key (hex)")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of mining processes (default: 1)")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument('--pool', metavar="URL", help="Mine for a pool coordinator (pool.py) at this URL instead of solo")
     args = parser.parse_args()
 
     if args.generate:
-        sk, miner_canonical_address = generate_wallet()
-        print(f"Generated Wallet:\n Private Key: {sk.to_string().hex()}\n Address: {get_display_address(miner_canonical_address)}")
+        private_key, miner_canonical_address = generate_wallet()
+        print(f"Generated Wallet:\n Private Key: {private_key}\n Address: {get_display_address(miner_canonical_address)}")
     elif args.private:
         try:
-            sk = SigningKey.from_string(bytes.fromhex(args.private), curve=SECP256k1)
-            miner_canonical_address = sk.get_verifying_key().to_string().hex()
+            miner_canonical_address = crypto.public_key(args.private)
             print(f"Using provided key. Address: {get_display_address(miner_canonical_address)}")
         except:
             print("❌ Invalid private key")
             return
     else:
-        sk, miner_canonical_address = generate_wallet()
-        print(f"Generated Wallet:\n Private Key: {sk.to_string().hex()}\n Address: {get_display_address(miner_canonical_address)}")
+        private_key, miner_canonical_address = generate_wallet()
+        print(f"Generated Wallet:\n Private Key: {private_key}\n Address: {get_display_address(miner_canonical_address)}")
 
-    await mine(miner_canonical_address)
+    if args.workers < 1:
+        print("❌ --workers must be at least 1")
+        return
+
+    if args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port)
+
+    if args.pool:
+        await mine_pool(args.pool, miner_canonical_address, args.workers)
+    else:
+        await mine(miner_canonical_address, args.workers)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,422 @@
+import asyncio
+import websockets
+import json
+import os
+import struct
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from config import NODE_PORT, BLOCK_REWARD, HEADER_V2_HEIGHT, MAX_BLOCK_TXS, MEMPOOL_MAX_BYTES, SNAPSHOT_INTERVAL, TXINDEX_FILE, DIRECTORY_FILE, METRICS_PORT
+from wallet import get_display_address
+from src.genesis import load_blockchain, get_block_store, create_genesis_block
+from src.lazychain import LazyChain
+from src.snapshot import restore_ledger, write_snapshot, prune_snapshots
+from src.mempool import Mempool
+from src.pow import validate_block, verify_chain
+from src.transactions import validate_transaction
+from src.subscriptions import SubscriptionHub, tip_header
+from src.txindex import TxIndex
+from src.directory import AddressDirectory, is_display_address
+from src.difficulty import target_at, target_to_hex, header_difficulty
+from src.queries import get_balances, get_tx_status, get_tx, get_address_history, MAX_BATCH_SIZE, MAX_HISTORY_PAGE
+from src import codec, metrics
+
+MAX_MESSAGE_SIZE = 4 * 1024 * 1024  # Largest request accepted from a client (bytes)
+MAX_IN_FLIGHT = 32  # Requests processed concurrently per connection before we stop reading
+MAX_QUEUED_MESSAGES = 16  # Frames buffered by websockets per connection
+MAX_BLOCKS_PAGE = 500  # Blocks per get_blocks response
+MAX_BLOCKS_PAGE_BYTES = 1024 * 1024  # Stored bytes per get_blocks response (at least one block is always sent)
+MAX_HEADERS_PAGE = 2000  # Headers per get_headers response
+ENCODINGS = [codec.WIRE_ENCODING, "json"]  # Preferred first
+BLOCK_KEYS = ("blockchain", "blocks", "block")  # Response fields sent in binary once a connection negotiates it
+
+
+class Node:
+    """Serves the PHN websocket protocol on top of src.genesis / src.pow.
+
+    Validation and every change to chain, ledger and mempool state run on a
+    single worker thread, which keeps CPU-heavy work off the event loop and
+    applies blocks and transactions in a well-defined order."""
+
+    def __init__(self, blockchain, owner_address, ledger=None):
+        self.blockchain = blockchain
+        self.owner_address = owner_address
+        self.ledger = ledger if ledger is not None else restore_ledger(blockchain)
+        self.mempool = Mempool(MEMPOOL_MAX_BYTES)
+        self.txindex = TxIndex(TXINDEX_FILE)
+        self.txindex.sync(blockchain)
+        self.directory = AddressDirectory(DIRECTORY_FILE)
+        self.directory.sync(blockchain)
+        self.tip = tip_header(blockchain[-1])  # Replaced (never mutated) so the event loop can read it safely
+        self.work = self._next_work()  # Target and header difficulty for the next block; replaced like self.tip
+        self.hub = SubscriptionHub()
+        self.encodings = {}  # ws -> negotiated encoding, JSON unless a hello says otherwise
+        self.state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phn-state")
+        self.handlers = {
+            "hello": self.hello,
+            "get_node_info": self.get_node_info,
+            "get_pending": self.get_pending,
+            "get_blockchain": self.get_blockchain,
+            "get_blocks": self.get_blocks,
+            "get_headers": self.get_headers,
+            "submit_block": self.submit_block,
+            "send_tx": self.send_tx,
+            "get_balance": self.get_balance,
+            "get_balances": self.get_balances,
+            "get_tx_status": self.get_tx_status,
+            "get_tx": self.get_tx,
+            "get_address_history": self.get_address_history,
+            "subscribe": self.subscribe,
+            "get_metrics": self.get_metrics,
+            "resolve_address": self.resolve_address,
+        }
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.state_executor, func, *args)
+
+    # --- Protocol handlers ---
+    async def hello(self, ws, request):
+        """Encoding negotiation: the first of our ENCODINGS the client also offers."""
+        offered = request.get("encodings", [])
+        encoding = next((e for e in ENCODINGS if isinstance(offered, list) and e in offered), "json")
+        self.encodings[ws] = encoding
+        return {"type": "hello", "encoding": encoding, "encodings": ENCODINGS}
+
+    async def get_node_info(self, ws, request):
+        return {
+            **self.work,
+            "block_reward": BLOCK_REWARD,
+            "header_v2_height": HEADER_V2_HEIGHT,
+            "max_block_txs": MAX_BLOCK_TXS,
+            "length": self.tip["index"] + 1,
+            "tip": self.tip,
+            "pending": len(self.mempool),
+        }
+
+    async def get_pending(self, ws, request):
+        """A block template: up to 'limit' pending transactions in mempool order."""
+        limit = request.get("limit", MAX_BLOCK_TXS - 1)
+        if not isinstance(limit, int) or limit < 0:
+            return {"error": "'limit' must be a non-negative integer"}
+        pending = await self._run(self.mempool.template, min(limit, MAX_BLOCK_TXS - 1))
+        return {"pending_transactions": pending, "count": len(self.mempool)}
+
+    async def get_blockchain(self, ws, request):
+        blocks = await self._run(lambda: list(self.blockchain))
+        return {"blockchain": blocks, "length": len(blocks)}
+
+    def _read_blocks(self, start, count):
+        blocks = []
+        size = 0
+        for height in range(start, min(start + count, len(self.blockchain))):
+            size += self.blockchain.record_size(height)
+            if blocks and size > MAX_BLOCKS_PAGE_BYTES:
+                break
+            blocks.append(self.blockchain[height])
+        return blocks, len(self.blockchain)
+
+    def _page_args(self, request, max_count):
+        start = request.get("from_height", 0)
+        count = request.get("count", max_count)
+        if not isinstance(start, int) or not isinstance(count, int) or start < 0 or count < 1:
+            return None
+        return start, min(count, max_count)
+
+    async def get_blocks(self, ws, request):
+        """Up to 'count' full blocks starting at 'from_height'. Fewer may come back
+        to keep the message small; callers continue from from_height + len(blocks)."""
+        page = self._page_args(request, MAX_BLOCKS_PAGE)
+        if page is None:
+            return {"error": "'from_height' must be >= 0 and 'count' >= 1"}
+        blocks, length = await self._run(self._read_blocks, *page)
+        return {"from_height": page[0], "blocks": blocks, "length": length}
+
+    async def get_headers(self, ws, request):
+        """Block headers (no transactions) starting at 'from_height'."""
+        page = self._page_args(request, MAX_HEADERS_PAGE)
+        if page is None:
+            return {"error": "'from_height' must be >= 0 and 'count' >= 1"}
+        start, count = page
+        headers = self.blockchain.headers[start:start + count]
+        return {"from_height": start, "headers": headers, "length": len(self.blockchain)}
+
+    def _next_work(self):
+        height = len(self.blockchain)
+        target = target_at(self.blockchain, height)
+        return {"difficulty": header_difficulty(height, target), "target": target_to_hex(target)}
+
+    def _apply_block(self, block):
+        valid, message = validate_block(block, self.blockchain, self.owner_address, self.ledger, self.txindex)
+        if not valid:
+            return False, message, []
+        with metrics.timed("phn_block_store_seconds", "Time to write and index an accepted block"):
+            # State and indexes first, the store last: if any step raises, the
+            # earlier ones are undone and the node stays at its current tip
+            height = block["index"]
+            undo = []
+            try:
+                self.ledger.apply_block(block)
+                undo.append(lambda: self.ledger.rollback_block(block))
+                self.txindex.add_block(block)
+                undo.append(lambda: self.txindex.truncate(height))
+                self.directory.add_block(block)
+                undo.append(lambda: self.directory.truncate(height))
+                self.blockchain.append(block)
+            except Exception as e:
+                for step in reversed(undo):
+                    step()
+                print(f"Error applying block #{height}: {e}")
+                return False, f"Block could not be applied: {e}", []
+        self.tip = tip_header(block)
+        self.work = self._next_work()
+        if self.ledger.height % SNAPSHOT_INTERVAL == 0:
+            try:
+                path = write_snapshot(self.ledger, block["hash"])
+                prune_snapshots()
+                print(f"Ledger snapshot written to {path}")
+            except OSError as e:
+                print(f"Error writing ledger snapshot: {e}")
+        removed = self.mempool.remove_block(block, self.ledger.get_balance)
+        return True, message, removed
+
+    async def submit_block(self, ws, request):
+        block = request.get("block")
+        if not isinstance(block, dict):
+            return {"status": "error", "message": "Missing block"}
+        valid, message, removed = await self._run(self._apply_block, block)
+        if not valid:
+            return {"status": "error", "message": message}
+        print(f"Block #{block['index']} accepted ({len(block['transactions'])} txs)")
+        self.hub.publish_tip(block, self.work)
+        self.hub.publish_mempool(removed=removed)
+        return {"status": "success", "message": message, "hash": block["hash"]}
+
+    def _add_transaction(self, tx):
+        if tx.get("sender") == "coinbase":
+            return False, "Coinbase transactions can't be submitted"
+        if "txid" not in tx:
+            return False, "Transaction missing txid"
+        if not isinstance(tx["txid"], str):
+            return False, "Transaction txid must be a string"
+        if tx["txid"] in self.mempool or tx["txid"] in self.txindex:
+            return False, "Duplicate transaction"
+        sender = tx.get("sender")
+        valid, message = validate_transaction(
+            tx, self.blockchain, self.ledger, {sender: self.mempool.pending_spend(sender)}
+        )
+        if not valid:
+            return False, message
+        return self.mempool.add(tx, self.ledger.get_balance(sender))
+
+    async def send_tx(self, ws, request):
+        tx = request.get("tx")
+        if not isinstance(tx, dict):
+            return {"status": "error", "error": "Missing tx"}
+        valid, message = await self._run(self._add_transaction, tx)
+        if not valid:
+            return {"status": "error", "error": message}
+        self.hub.publish_mempool(added=[tx])
+        return {"status": "success", "txid": tx["txid"]}
+
+    async def get_balance(self, ws, request):
+        address = request.get("address")
+        if not isinstance(address, str):
+            return {"error": "Missing address"}
+        response = {"address": address, "balance": self.ledger.get_balance(address)}
+        try:
+            response["display_address"] = get_display_address(address)
+        except ValueError:
+            pass
+        return response
+
+    async def get_balances(self, ws, request):
+        addresses = request.get("addresses")
+        if not isinstance(addresses, list) or len(addresses) > MAX_BATCH_SIZE or not all(isinstance(a, str) for a in addresses):
+            return {"error": f"'addresses' must be a list of at most {MAX_BATCH_SIZE} addresses"}
+        return {"balances": get_balances(addresses, self.blockchain, self.ledger)}
+
+    def _resolve_addresses(self, addresses):
+        return {address: self.directory.resolve("PHN" + address[3:].lower()) for address in addresses}
+
+    async def resolve_address(self, ws, request):
+        """Canonical public key(s) for PHN display address(es) seen on chain;
+        unknown addresses resolve to None."""
+        if "addresses" in request:
+            addresses = request["addresses"]
+            if not isinstance(addresses, list) or len(addresses) > MAX_BATCH_SIZE or not all(map(is_display_address, addresses)):
+                return {"error": f"'addresses' must be a list of at most {MAX_BATCH_SIZE} PHN addresses"}
+            return {"resolved": await self._run(self._resolve_addresses, addresses)}
+        address = request.get("address")
+        if not is_display_address(address):
+            return {"error": "'address' must be a PHN address"}
+        canonical = (await self._run(self._resolve_addresses, [address]))[address]
+        if canonical is None:
+            return {"address": address, "error": "Address not seen on chain"}
+        return {"address": address, "canonical": canonical}
+
+    async def get_tx_status(self, ws, request):
+        txids = request.get("txids")
+        if not isinstance(txids, list) or len(txids) > MAX_BATCH_SIZE or not all(isinstance(t, str) for t in txids):
+            return {"error": f"'txids' must be a list of at most {MAX_BATCH_SIZE} txids"}
+        statuses = await self._run(get_tx_status, txids, self.blockchain, self.mempool, self.txindex)
+        return {"statuses": statuses}
+
+    async def get_tx(self, ws, request):
+        txid = request.get("txid")
+        if not isinstance(txid, str):
+            return {"error": "Missing txid"}
+        found = await self._run(get_tx, txid, self.blockchain, self.txindex)
+        if found is not None:
+            return {"status": "confirmed", **found}
+        pending = self.mempool.get(txid)
+        if pending is not None:
+            return {"status": "pending", "tx": pending}
+        return {"status": "unknown", "error": "Transaction not found"}
+
+    async def get_address_history(self, ws, request):
+        address = request.get("address")
+        offset = request.get("offset", 0)
+        limit = request.get("limit", 50)
+        if not isinstance(address, str):
+            return {"error": "Missing address"}
+        if not isinstance(offset, int) or not isinstance(limit, int) or offset < 0 or not 0 < limit <= MAX_HISTORY_PAGE:
+            return {"error": f"'offset' must be >= 0 and 'limit' between 1 and {MAX_HISTORY_PAGE}"}
+        return await self._run(get_address_history, address, self.blockchain, self.txindex, offset, limit)
+
+    async def subscribe(self, ws, request):
+        topics = request.get("topics", ["tip", "mempool"])
+        if not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics):
+            return {"error": "'topics' must be a list of topic names"}
+        topics = self.hub.subscribe(ws, topics)
+        pending = await self._run(self.mempool.template, MAX_BLOCK_TXS - 1)
+        return {
+            "type": "subscribed",
+            "topics": topics,
+            "tip": self.tip,
+            **self.work,
+            "length": self.tip["index"] + 1,
+            "pending_transactions": pending,
+        }
+
+    async def get_metrics(self, ws, request):
+        metrics.gauge("phn_chain_height", "Blocks in the chain").set(self.tip["index"] + 1)
+        metrics.gauge("phn_mempool_transactions", "Pending transactions").set(len(self.mempool))
+        metrics.gauge("phn_subscribers", "Open subscriptions").set(len(self.hub.subscribers))
+        return {"enabled": metrics.is_enabled(), "metrics": metrics.snapshot()}
+
+    # --- Connection handling ---
+    async def _handle_request(self, ws, raw, slots):
+        try:
+            try:
+                request = codec.decode_message(raw) if isinstance(raw, bytes) else json.loads(raw)
+                if not isinstance(request, dict):
+                    raise ValueError("request is not an object")
+            except (ValueError, TypeError, AttributeError, KeyError, struct.error):
+                request = {}
+            request_type = request.get("type")
+            handler = self.handlers.get(request_type) if isinstance(request_type, str) else None
+            if not request:
+                response = {"error": "Invalid JSON request"}
+            elif handler is None:
+                response = {"error": f"Unknown request type: {request_type}"}
+            else:
+                metrics.counter("phn_requests_total", "Requests handled", type=request_type).inc()
+                try:
+                    with metrics.timed("phn_request_seconds", "Time to answer a request", type=request_type):
+                        response = await handler(ws, request)
+                except Exception as e:
+                    print(f"Error handling {request_type}: {e}")
+                    response = {"error": f"Internal error: {e}"}
+            if "id" in request:
+                response["id"] = request["id"]
+            await ws.send(self._encode_response(ws, response))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            slots.release()
+
+    def _encode_response(self, ws, response):
+        if self.encodings.get(ws) == codec.WIRE_ENCODING:
+            for key in BLOCK_KEYS:
+                if key in response:
+                    try:
+                        return codec.encode_message(response, key)
+                    except (ValueError, KeyError, struct.error):
+                        break  # Something the codec can't represent; JSON always works
+        return json.dumps(response)
+
+    async def handle_connection(self, ws):
+        # Backpressure: once MAX_IN_FLIGHT requests are being processed we stop
+        # reading, so a fast client fills its own TCP window instead of our memory.
+        slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+        tasks = set()
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    raw = await ws.recv()
+                except websockets.exceptions.ConnectionClosed:
+                    slots.release()
+                    break
+                task = asyncio.create_task(self._handle_request(ws, raw, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self.hub.unsubscribe(ws)
+            self.encodings.pop(ws, None)
+            for task in list(tasks):
+                task.cancel()
+
+    async def serve(self, host, port):
+        async with websockets.serve(
+            self.handle_connection, host, port,
+            max_size=MAX_MESSAGE_SIZE,
+            max_queue=MAX_QUEUED_MESSAGES,
+        ):
+            print(f"🌐 PHN node listening on ws://{host}:{port} (height {self.tip['index'] + 1})")
+            await asyncio.Future()
+
+
+def open_chain(owner_address):
+    blockchain = load_blockchain(lazy=True)
+    if not isinstance(blockchain, LazyChain):
+        blockchain = LazyChain(get_block_store())
+    if len(blockchain) == 0:
+        if not owner_address:
+            raise SystemExit("❌ No chain found. Pass --owner <canonical address> to create the genesis block.")
+        blockchain.append(create_genesis_block(owner_address))
+        print("Created genesis block")
+    return blockchain
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="PHN Node")
+    parser.add_argument('--host', default="0.0.0.0", help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=NODE_PORT, help=f"Port to listen on (default: {NODE_PORT})")
+    parser.add_argument('--owner', default=os.environ.get("OWNER_ADDRESS"),
+                        help="Owner canonical address (genesis recipient); defaults to $OWNER_ADDRESS")
+    parser.add_argument('--verify', action='store_true', help="Fully verify the stored chain before serving")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="Serve Prometheus metrics on this port (default: off)")
+    parser.add_argument('--no-metrics', action='store_true', help="Disable metrics collection")
+    args = parser.parse_args()
+    if args.no_metrics:
+        metrics.enable(False)
+    elif args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port, args.host)
+
+    blockchain = open_chain(args.owner)
+    owner_address = args.owner or blockchain[0]["transactions"][0]["recipient"]
+    ledger = None
+    if args.verify:
+        valid, message, ledger = verify_chain(blockchain, owner_address)
+        if not valid:
+            raise SystemExit(f"❌ Stored chain failed verification: {message}")
+        print(f"✅ {message}")
+    node = Node(blockchain, owner_address, ledger)
+    await node.serve(args.host, args.port)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Node stopped.")
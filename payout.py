@@ -0,0 +1,241 @@
+"""
+Bulk Payouts
+Send many payments from one wallet: rows of (recipient, amount) from a CSV or
+JSONL file are checked against the wallet's balance, signed in a worker pool
+and submitted over a single connection with a window of requests in flight.
+
+Every signed transaction is written to a journal before it is submitted. A
+rerun with the same input and journal resends the journaled transactions
+(same txid, so the node can't accept them twice) instead of signing new
+ones, and skips rows already pending or confirmed.
+
+Usage: python payout.py <node_url> <payouts.csv|payouts.jsonl> [--key HEX]
+                        [--results FILE] [--journal FILE] [--window N] [--dry-run]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from blockchain_client import BlockchainClient, ADDRESS_CACHE_FILE, signing_message, make_transaction, normalize_display_address
+from src.directory import is_canonical_address, is_display_address
+from src import crypto
+
+DEFAULT_WINDOW = 32  # send_tx requests in flight
+
+
+def _parse_amount(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = str(value).strip()
+    return int(text) if text.lstrip("-").isdigit() else float(text)
+
+
+def read_rows(path):
+    """[(row number, recipient, amount or None, error or None)] from a CSV
+    (recipient,amount; header optional) or JSONL ({"recipient", "amount"}) file.
+    Recipients are canonical or PHN addresses."""
+    rows = []
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            records = []
+            for line in f:
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                        records.append((record.get("recipient"), record.get("amount")))
+                    except (ValueError, AttributeError):
+                        records.append((None, None))
+        else:
+            records = [tuple(row[:2]) + (None,) * (2 - len(row[:2])) for row in csv.reader(f) if row]
+            if records and records[0][0] and records[0][0].strip().lower() == "recipient":
+                records = records[1:]
+    for number, (recipient, amount) in enumerate(records, start=1):
+        recipient = recipient.strip() if isinstance(recipient, str) else recipient
+        if not isinstance(recipient, str) or not (is_canonical_address(recipient) or is_display_address(recipient)):
+            rows.append((number, recipient, None, "invalid recipient"))
+            continue
+        try:
+            amount = _parse_amount(amount)
+        except (TypeError, ValueError):
+            rows.append((number, recipient, None, "invalid amount"))
+            continue
+        if not amount > 0:
+            rows.append((number, recipient, None, "amount must be positive"))
+            continue
+        if is_display_address(recipient):
+            recipient = normalize_display_address(recipient)
+        else:
+            recipient = recipient.lower()
+        rows.append((number, recipient, amount, None))
+    return rows
+
+
+async def resolve_rows(client, rows):
+    """Rows with PHN recipients replaced by their canonical addresses; PHN
+    addresses the node has never seen on chain become invalid rows."""
+    display = [recipient for _, recipient, _, error in rows if error is None and is_display_address(recipient)]
+    if not display:
+        return rows
+    resolved = await client.resolve_addresses(display)
+    result = []
+    for number, recipient, amount, error in rows:
+        if error is None and is_display_address(recipient):
+            if resolved.get(recipient) is None:
+                result.append((number, recipient, None, "unknown PHN address"))
+                continue
+            recipient = resolved[recipient]
+        result.append((number, recipient, amount, error))
+    return result
+
+
+def read_journal(path):
+    """{row number: signed tx} from an earlier run."""
+    journal = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    journal[entry["row"]] = entry["tx"]
+                except (ValueError, KeyError):
+                    continue  # Torn last line from a crash; that row was never submitted
+    return journal
+
+
+def append_journal(path, entries):
+    """Write signed txs durably before any of them is submitted."""
+    with open(path, "a") as f:
+        for row, tx in entries:
+            f.write(json.dumps({"row": row, "tx": tx}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def sign_rows(private_key, sender, rows):
+    """Signed txs for [(row, recipient, amount)]; each gets its own timestamp
+    so identical rows still get distinct txids."""
+    base = time.time()
+    timestamps = [base + i / 1e6 for i in range(len(rows))]
+    messages = [signing_message(sender, recipient, amount, ts) for (_, recipient, amount), ts in zip(rows, timestamps)]
+    signatures = crypto.sign_many([(private_key, message) for message in messages])
+    return [
+        (row, make_transaction(sender, recipient, amount, ts, signature))
+        for (row, recipient, amount), ts, signature in zip(rows, timestamps, signatures)
+    ]
+
+
+async def run_payout(node_url, private_key, input_path, results_path, journal_path, window=DEFAULT_WINDOW, dry_run=False):
+    sender = crypto.public_key(private_key)
+    rows = read_rows(input_path)
+    journal = read_journal(journal_path)
+    results = {}
+
+    client = BlockchainClient(node_url, address_cache=ADDRESS_CACHE_FILE)
+    try:
+        rows = await resolve_rows(client, rows)
+        by_number = {number: (recipient, amount) for number, recipient, amount, _ in rows}
+        for number, tx in journal.items():
+            if by_number.get(number) != (tx["recipient"], tx["amount"]):
+                raise SystemExit(f"❌ Row {number} differs from the journal {journal_path}; refusing to resume with a changed input")
+        for number, recipient, amount, error in rows:
+            if error is not None:
+                results[number] = {"row": number, "recipient": recipient, "status": "invalid", "error": error}
+
+        # Journaled rows: skip those the node already has, resend the rest as-is
+        statuses = await client.get_tx_status([tx["txid"] for tx in journal.values()]) if journal else {}
+        resend = []
+        pending_amount = 0
+        for number, tx in sorted(journal.items()):
+            status = statuses.get(tx["txid"], {}).get("status", "unknown")
+            if status in ("pending", "confirmed"):
+                results[number] = {"row": number, "recipient": tx["recipient"], "amount": tx["amount"],
+                                   "txid": tx["txid"], "status": f"already_{status}"}
+                if status == "pending":
+                    pending_amount += tx["amount"]
+            else:
+                resend.append((number, tx))
+
+        new_rows = [(number, recipient, amount) for number, recipient, amount, error in rows
+                    if error is None and number not in journal]
+        total = sum(tx["amount"] for _, tx in resend) + sum(amount for _, _, amount in new_rows)
+        balance = await client.get_balance(sender)
+        print(f"💸 {len(new_rows)} new and {len(resend)} resumed payments, {total} PHN "
+              f"(balance {balance} PHN, {pending_amount} PHN already pending)")
+        if total + pending_amount > balance:
+            raise SystemExit(f"❌ Insufficient balance: need {total + pending_amount} PHN, have {balance} PHN")
+        if dry_run:
+            print("Dry run, nothing sent")
+            return results
+
+        signed = sign_rows(private_key, sender, new_rows) if new_rows else []
+        if signed:
+            append_journal(journal_path, signed)
+        to_send = resend + signed
+        row_of = {tx["txid"]: number for number, tx in to_send}
+
+        with open(results_path, "a") as out:
+            for result in sorted(results.values(), key=lambda r: r["row"]):
+                out.write(json.dumps(result) + "\n")
+
+            def on_result(tx, response):
+                number = row_of[tx["txid"]]
+                result = {"row": number, "recipient": tx["recipient"], "amount": tx["amount"], "txid": tx["txid"]}
+                if response.get("status") == "success":
+                    result["status"] = "sent"
+                elif response.get("error") == "Duplicate transaction":
+                    result["status"] = "already_sent"
+                else:
+                    result["status"] = "failed"
+                    result["error"] = response.get("error", "unknown error")
+                results[number] = result
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+
+            start = time.time()
+            await client.send_transactions([tx for _, tx in to_send], window, on_result)
+        elapsed = time.time() - start
+        counts = {}
+        for result in results.values():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        print(f"✅ Done in {elapsed:.1f}s: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+        return results
+    finally:
+        await client.disconnect()
+        crypto.shutdown_sign_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send many PHN payments from one wallet")
+    parser.add_argument("node_url", help="Node WebSocket URL")
+    parser.add_argument("input", help="CSV (recipient,amount) or JSONL ({\"recipient\", \"amount\"}) file; recipients canonical or PHN")
+    parser.add_argument("--key", default=os.environ.get("PHN_PRIVATE_KEY"),
+                        help="Sender private key hex; defaults to $PHN_PRIVATE_KEY")
+    parser.add_argument("--results", help="Per-row results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--journal", help="Signed-transaction journal for resuming (default: <input>.journal)")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help=f"Requests in flight (default: {DEFAULT_WINDOW})")
+    parser.add_argument("--dry-run", action="store_true", help="Check rows and balance without sending")
+    args = parser.parse_args()
+
+    if not args.key:
+        parser.error("a private key is required (--key or $PHN_PRIVATE_KEY)")
+    if args.window < 1:
+        parser.error("--window must be at least 1")
+    try:
+        crypto.public_key(args.key)
+    except Exception:
+        print("❌ Invalid private key")
+        sys.exit(1)
+
+    asyncio.run(run_payout(
+        args.node_url, args.key, args.input,
+        args.results or args.input + ".results.jsonl",
+        args.journal or args.input + ".journal",
+        args.window, args.dry_run,
+    ))
+
+
+if __name__ == "__main__":
+    main()
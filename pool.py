@@ -0,0 +1,349 @@
+"""
+Mining Pool Coordinator
+Holds one connection to the node, builds block templates (paying the pool's
+address) and hands each connected miner (miner.py --pool) a disjoint nonce
+range of the current template. Miners report every hash that meets the
+easier share target; shares are checked here and counted per miner, and
+a share that also meets the block target is submitted to the node.
+When the chain tip changes every miner gets a fresh job right away.
+
+Protocol (JSON over websocket), miner -> pool:
+    {"type": "login", "address": ...}
+    {"type": "get_job"}                       current range exhausted
+    {"type": "share", "job_id": ..., "nonce": ...}
+    {"type": "get_stats"}
+pool -> miner:
+    {"type": "login", "miner_id", "share_target"}
+    {"type": "idle"}                          tip moved, nothing to mine yet
+    {"type": "job", "job_id", "block", "nonce_start", "nonce_end", "target", "share_target", "clean"}
+    {"type": "share_result", "job_id", "nonce", "status": accepted|block|stale|duplicate|invalid}
+Targets are 64-char hex; a hash meets one when int(hash, 16) <= target.
+
+Usage: python pool.py --node ws://localhost:8765 --address <pool canonical address> [--port 8766]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import websockets
+import miner
+from config import NODE_PORT
+from src.compact import to_plain
+from src.genesis import hash_block
+from src.header import HEADER_VERSION, prefix_hasher, hash_with_nonce
+from src.subscriptions import tip_header
+from src.difficulty import MAX_TARGET, difficulty_to_target, hash_meets_target, target_to_difficulty, target_to_hex
+
+POOL_PORT = 8766
+JOB_NONCE_RANGE = 2 ** 22  # Nonces handed to a miner per job request
+TEMPLATE_REFRESH_INTERVAL = 5  # Seconds between template rebuilds for new mempool transactions
+STATS_INTERVAL = 30  # Seconds between pool hashrate reports
+RECENT_TEMPLATES = 4  # Older templates whose shares still count as stale rather than invalid
+SHARE_TARGET_FACTOR = 16  # Default share target: this many times easier than the block target
+
+
+def share_hasher(template):
+    """nonce -> block hash of 'template' with that nonce, without copying the
+    template: v2 copies the SHA-256 state of the header prefix, v1 hashes the
+    template's JSON with only the nonce digits spliced in."""
+    if template.get("version", 1) >= HEADER_VERSION:
+        base = prefix_hasher(template)
+        return lambda nonce: hash_with_nonce(base, nonce)
+    fields = {k: v for k, v in template.items() if k != "hash"}
+    fields["nonce"] = 0
+    # Sorted keys put the top-level "nonce" ahead of every nested field
+    head, sep, tail = json.dumps(fields, sort_keys=True, default=to_plain).partition('"nonce": 0')
+    head, tail = (head + '"nonce": ').encode(), tail.encode()
+
+    def hash_nonce(nonce):
+        return hashlib.sha256(head + str(nonce).encode() + tail).hexdigest()
+
+    if not sep or hash_nonce(1) != hash_block(dict(fields, nonce=1)):
+        return lambda nonce: hash_block(dict(fields, nonce=nonce))
+    return hash_nonce
+
+
+class MinerSession:
+    def __init__(self, miner_id, ws):
+        self.miner_id = miner_id
+        self.ws = ws
+        self.address = None
+        self.connected_at = time.time()
+        self.ranges = {}  # job_id -> [(start, end)]
+        self.shares = {"accepted": 0, "block": 0, "stale": 0, "duplicate": 0, "invalid": 0}
+        self.work = 0  # Expected hashes behind the accepted shares
+
+    def hashrate(self):
+        """Estimated hashes per second from accepted shares."""
+        elapsed = max(time.time() - self.connected_at, 1)
+        return self.work / elapsed
+
+
+class PoolCoordinator:
+    def __init__(self, node_url, address, share_difficulty=None):
+        self.node_url = node_url
+        self.address = address
+        self.share_difficulty = share_difficulty
+        self.target = None  # Block target of the current template
+        self.share_target = None
+        self.miners = {}  # ws -> MinerSession
+        self.templates = {}  # job_id -> block candidate, most recent RECENT_TEMPLATES
+        self.hashers = {}  # job_id -> share_hasher of its template
+        self.job_id = 0
+        self.next_nonce = 0
+        self.seen_shares = set()  # (job_id, nonce)
+        self.node_ws = None
+        self.state = None
+        self.submit_lock = asyncio.Lock()
+        self.responses = None
+        self._next_miner_id = 0
+
+    # --- Templates and jobs ---
+    def _set_target(self, target):
+        self.target = target
+        if self.share_difficulty is not None:
+            share_target = difficulty_to_target(self.share_difficulty)
+        else:
+            share_target = (target + 1) * SHARE_TARGET_FACTOR - 1
+        # A share target harder than the block target would hide solved blocks
+        self.share_target = min(max(share_target, target), MAX_TARGET)
+
+    def _new_template(self):
+        state = self.state
+        self._set_target(state.target)
+        template = miner.build_block_candidate(
+            self.address, self.block_reward, state.difficulty, self.header_v2_height,
+            state.length, state.tip["hash"], list(state.pending.values())
+        )
+        self.job_id += 1
+        self.templates[self.job_id] = template
+        for old in sorted(self.templates)[:-RECENT_TEMPLATES]:
+            del self.templates[old]
+        self.hashers = {j: h for j, h in self.hashers.items() if j in self.templates}
+        self.hashers[self.job_id] = share_hasher(template)
+        self.seen_shares = {share for share in self.seen_shares if share[0] in self.templates}
+        self.next_nonce = 0
+        return template
+
+    def _assign_range(self, session):
+        if self.next_nonce >= miner.NONCE_SPACE:
+            # Nonce space used up: same transactions, fresh timestamp. Jobs
+            # already handed out on this tip keep counting (see _handle_share)
+            self._new_template()
+        start = self.next_nonce
+        end = min(start + JOB_NONCE_RANGE, miner.NONCE_SPACE)
+        self.next_nonce = end
+        session.ranges.setdefault(self.job_id, []).append((start, end))
+        for job_id in [j for j in session.ranges if j not in self.templates]:
+            del session.ranges[job_id]
+        return start, end
+
+    async def _send_job(self, session, clean):
+        if not self.templates:
+            return
+        start, end = self._assign_range(session)
+        try:
+            await session.ws.send(json.dumps({
+                "type": "job",
+                "job_id": self.job_id,
+                "block": self.templates[self.job_id],
+                "nonce_start": start,
+                "nonce_end": end,
+                "target": target_to_hex(self.target),
+                "share_target": target_to_hex(self.share_target),
+                "clean": clean,
+            }))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def broadcast_jobs(self):
+        await asyncio.gather(*[self._send_job(session, True) for session in list(self.miners.values())])
+
+    async def broadcast_idle(self):
+        """Tell miners to drop their job: the tip moved and there is nothing to mine."""
+        message = json.dumps({"type": "idle"})
+        for session in list(self.miners.values()):
+            try:
+                await session.ws.send(message)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+    # --- Node side ---
+    async def _refresh_templates(self):
+        """Rebuild the template on a new tip (at once) or new transactions (at most every TEMPLATE_REFRESH_INTERVAL)."""
+        state = self.state
+        while True:
+            await state.work_available.wait()
+            state.work_available.clear()
+            tip_changed = state.tip_changed.is_set()
+            state.tip_changed.clear()
+            if state.pending:
+                self._new_template()
+                print(f"📦 Job {self.job_id}: block #{state.length} with {len(state.pending)} pending txs"
+                      f"{' (new tip)' if tip_changed else ''}")
+                await self.broadcast_jobs()
+            elif tip_changed:
+                self.templates.clear()
+                await self.broadcast_idle()
+            if not self.templates:
+                continue  # Idle: the first transaction gets a job out at once
+            try:
+                await asyncio.wait_for(state.tip_changed.wait(), TEMPLATE_REFRESH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _submit_block(self, block):
+        async with self.submit_lock:
+            if block["index"] < self.state.length:
+                return None  # Another share solved this height while we waited
+            await self.node_ws.send(json.dumps({"type": "submit_block", "block": block}))
+            response = await self.responses.get()
+        miner.report_submission(response)
+        if response.get("status") == "success":
+            # Shares still in flight for this height are stale from here on
+            self.templates.clear()
+            self.state.handle_push({"type": "new_tip", "tip": tip_header(block), "length": block["index"] + 1})
+            self.state.handle_push({"type": "mempool_delta", "removed": [tx["txid"] for tx in block["transactions"]]})
+        return response
+
+    async def run_node(self):
+        async with websockets.connect(self.node_url, max_size=16 * 1024 * 1024) as ws:
+            self.node_ws = ws
+            difficulty, self.block_reward, self.header_v2_height, target = await miner.get_node_info(ws)
+            self.state = await miner.subscribe(ws, target, difficulty)
+            if self.state is None:
+                raise SystemExit("❌ The node does not support subscriptions, which the pool needs")
+            self._set_target(self.state.target)
+            print(f"✅ Connected to node {self.node_url} at tip #{self.state.tip['index']} "
+                  f"(difficulty {target_to_difficulty(self.target):.2f}, "
+                  f"share difficulty {target_to_difficulty(self.share_target):.2f})")
+            self.responses = asyncio.Queue()
+            self.state.work_available.set()
+            reader = asyncio.create_task(miner._read_messages(ws, self.state, self.responses))
+            refresher = asyncio.create_task(self._refresh_templates())
+            try:
+                await reader
+            finally:
+                refresher.cancel()
+        raise ConnectionError("Node connection closed")
+
+    # --- Miner side ---
+    async def _handle_share(self, session, message):
+        job_id, nonce = message.get("job_id"), message.get("nonce")
+        template = self.templates.get(job_id) if isinstance(job_id, int) else None
+        status = None
+        if not isinstance(nonce, int) or isinstance(nonce, bool):
+            status = "invalid"
+        elif template is None:
+            status = "stale"
+        elif not any(start <= nonce < end for start, end in session.ranges.get(job_id, [])):
+            status = "invalid"
+        elif template["prev_hash"] != self.state.tip["hash"]:
+            status = "stale"
+        elif (job_id, nonce) in self.seen_shares:
+            status = "duplicate"
+        if status is None:
+            block_hash = self.hashers[job_id](nonce)
+            if not hash_meets_target(block_hash, self.share_target):
+                status = "invalid"
+            else:
+                self.seen_shares.add((job_id, nonce))
+                session.work += 2 ** 256 / (self.share_target + 1)
+                status = "accepted"
+                if hash_meets_target(block_hash, self.target):
+                    block = dict(template, nonce=nonce, hash=block_hash)
+                    response = await self._submit_block(block)
+                    if response is not None and response.get("status") == "success":
+                        status = "block"
+        session.shares[status] += 1
+        reply = {"type": "share_result", "job_id": job_id, "nonce": nonce, "status": status}
+        if status == "block":
+            reply["index"] = template["index"]
+        return reply
+
+    async def handle_miner(self, ws):
+        self._next_miner_id += 1
+        session = MinerSession(self._next_miner_id, ws)
+        self.miners[ws] = session
+        try:
+            async for raw in ws:
+                try:
+                    message = json.loads(raw)
+                    kind = message.get("type")
+                except (ValueError, AttributeError):
+                    await ws.send(json.dumps({"error": "Invalid JSON request"}))
+                    continue
+                if kind == "login":
+                    session.address = message.get("address")
+                    await ws.send(json.dumps({"type": "login", "miner_id": session.miner_id,
+                                              "share_target": target_to_hex(self.share_target)
+                                              if self.share_target is not None else None}))
+                    print(f"👷 Miner {session.miner_id} connected ({len(self.miners)} online)")
+                    await self._send_job(session, True)
+                elif kind == "get_job":
+                    await self._send_job(session, False)
+                elif kind == "share":
+                    await ws.send(json.dumps(await self._handle_share(session, message)))
+                elif kind == "get_stats":
+                    await ws.send(json.dumps({"type": "stats", **self.stats()}))
+                else:
+                    await ws.send(json.dumps({"error": f"Unknown request type: {kind}"}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            del self.miners[ws]
+            print(f"👷 Miner {session.miner_id} disconnected ({len(self.miners)} online)")
+
+    def stats(self):
+        miners = []
+        for session in self.miners.values():
+            miners.append({
+                "miner_id": session.miner_id,
+                "address": session.address,
+                "shares": dict(session.shares),
+                "hashrate": session.hashrate(),
+            })
+        return {
+            "job_id": self.job_id,
+            "share_target": target_to_hex(self.share_target) if self.share_target is not None else None,
+            "hashrate": sum(m["hashrate"] for m in miners),
+            "miners": miners,
+        }
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            stats = self.stats()
+            print(f"📊 Pool: {len(stats['miners'])} miners, ~{stats['hashrate'] / 1000:.1f} kH/s")
+
+    async def serve(self, host, port):
+        async with websockets.serve(self.handle_miner, host, port):
+            print(f"🏊 Pool listening on ws://{host}:{port}")
+            reporter = asyncio.create_task(self._report_stats())
+            try:
+                await self.run_node()
+            finally:
+                reporter.cancel()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="PHN mining pool coordinator")
+    parser.add_argument('--node', default=f"ws://localhost:{NODE_PORT}", help="Node WebSocket URL")
+    parser.add_argument('--address', required=True, help="Canonical address that receives block rewards")
+    parser.add_argument('--host', default="0.0.0.0", help="Interface to listen on for miners")
+    parser.add_argument('--port', type=int, default=POOL_PORT, help=f"Port for miners (default: {POOL_PORT})")
+    parser.add_argument('--share-difficulty', type=int,
+                        help=f"Leading zeros per share (default: a target {SHARE_TARGET_FACTOR}x easier than the block's)")
+    args = parser.parse_args()
+
+    coordinator = PoolCoordinator(args.node, args.address, args.share_difficulty)
+    await coordinator.serve(args.host, args.port)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Pool stopped.")
+    except (ConnectionError, OSError, websockets.exceptions.ConnectionClosed) as e:
+        print(f"❌ Pool stopped: {e}")
@@ -0,0 +1,301 @@
+"""
+Block Store
+Append-only, segmented storage for blocks. Each block is written once as a
+checksummed record at the end of the current segment file and fsynced, and a
+fixed-size height -> (segment, offset) index is kept next to the segments.
+A torn record at the tail (crash mid-write) is truncated on open.
+Records are written in the binary codec by default; JSON records from older
+stores stay readable, since every record carries its own format byte.
+"""
+import json
+import os
+import struct
+import weakref
+import zlib
+from . import codec
+
+# Record: payload length, crc32 of everything after the crc field, format, header length
+RECORD_HEADER = struct.Struct("<IIBI")
+# Index entry: segment number, offset of the record inside the segment
+INDEX_ENTRY = struct.Struct("<IQ")
+
+FORMAT_JSON = 0
+FORMAT_BINARY = 1
+INDEX_FILE = "index.dat"
+
+
+def _segment_name(segment):
+    return f"blk{segment:05d}.dat"
+
+
+def _encode_parts_json(block):
+    header = {k: v for k, v in block.items() if k != "transactions"}
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    body_bytes = json.dumps(block["transactions"], separators=(",", ":")).encode()
+    return header_bytes, body_bytes
+
+
+def encode_record(block, fmt=FORMAT_BINARY):
+    """Split a block into a header part and a transactions part and frame them.
+    Blocks the binary codec can't represent are stored as JSON instead."""
+    if fmt == FORMAT_BINARY:
+        try:
+            header_bytes = codec.encode_header(block)
+            body_bytes = codec.encode_transactions(block["transactions"])
+        except (ValueError, KeyError, struct.error):
+            fmt = FORMAT_JSON
+    if fmt == FORMAT_JSON:
+        header_bytes, body_bytes = _encode_parts_json(block)
+    meta = struct.pack("<BI", fmt, len(header_bytes))
+    crc = zlib.crc32(meta + header_bytes + body_bytes)
+    return struct.pack("<II", len(header_bytes) + len(body_bytes), crc) + meta + header_bytes + body_bytes
+
+
+def decode_header(data, offset=0):
+    """Decode only the header part of the record starting at 'offset'."""
+    length, _, fmt, header_len = RECORD_HEADER.unpack_from(data, offset)
+    start = offset + RECORD_HEADER.size
+    if fmt == FORMAT_BINARY:
+        return codec.decode_header(data, start)[0]
+    return json.loads(bytes(data[start:start + header_len]))
+
+
+def decode_transactions(data, offset=0):
+    """Decode only the transactions part of the record starting at 'offset'."""
+    length, _, fmt, header_len = RECORD_HEADER.unpack_from(data, offset)
+    start = offset + RECORD_HEADER.size
+    if fmt == FORMAT_BINARY:
+        return codec.decode_transactions(data, start + header_len)[0]
+    return json.loads(bytes(data[start + header_len:start + length]))
+
+
+def decode_record(data, offset=0):
+    block = decode_header(data, offset)
+    block["transactions"] = decode_transactions(data, offset)
+    return block
+
+
+def _read_record(f, offset):
+    """Read and check the record at 'offset'. Returns its total size or None if torn/corrupt."""
+    f.seek(offset)
+    head = f.read(RECORD_HEADER.size)
+    if len(head) < RECORD_HEADER.size:
+        return None
+    length, crc, fmt, header_len = RECORD_HEADER.unpack(head)
+    payload = f.read(length)
+    if len(payload) < length or header_len > length:
+        return None
+    if zlib.crc32(head[8:] + payload) != crc:
+        return None
+    return RECORD_HEADER.size + length
+
+
+class BlockStore:
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, record_format=FORMAT_BINARY):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.record_format = record_format
+        os.makedirs(directory, exist_ok=True)
+        self.index = []  # height -> (segment, offset)
+        self._readers = {}
+        self._writer = None
+        self._index_file = None
+        self._views = weakref.WeakSet()  # Objects with block_appended/blocks_truncated hooks, e.g. LazyChain
+        self._recover()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def watch(self, view):
+        """Keep 'view' in step with the store: it hears about every append and
+        truncate, whoever makes them."""
+        self._views.add(view)
+
+    def _segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("blk") and name.endswith(".dat"):
+                segments.append(int(name[3:-4]))
+        return sorted(segments)
+
+    def _recover(self):
+        index_path = self._path(INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                raw = f.read()
+            for pos in range(0, len(raw) - len(raw) % INDEX_ENTRY.size, INDEX_ENTRY.size):
+                self.index.append(INDEX_ENTRY.unpack_from(raw, pos))
+            # Records only ever go after the previous one; anything else is a damaged index
+            if any(later <= earlier for earlier, later in zip(self.index, self.index[1:])):
+                print(f"Block index {index_path} is corrupt; rebuilding it from the segments")
+                self.index = []
+
+        # Drop index entries whose record did not make it to disk intact
+        while self.index:
+            segment, offset = self.index[-1]
+            path = self._path(_segment_name(segment))
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    if _read_record(f, offset) is not None:
+                        break
+            self.index.pop()
+
+        # Pick up records written after the last index entry, truncate a torn tail
+        segments = self._segments()
+        if self.index:
+            segment, offset = self.index[-1]
+            with open(self._path(_segment_name(segment)), "rb") as f:
+                offset += _read_record(f, offset)
+        else:
+            segment, offset = (segments[0] if segments else 0), 0
+        for seg in [s for s in segments if s >= segment]:
+            path = self._path(_segment_name(seg))
+            pos = offset if seg == segment else 0
+            with open(path, "rb") as f:
+                while True:
+                    size = _read_record(f, pos)
+                    if size is None:
+                        break
+                    self.index.append((seg, pos))
+                    pos += size
+            if pos < os.path.getsize(path):
+                print(f"Truncating torn block record in {path} at offset {pos}")
+                with open(path, "r+b") as f:
+                    f.truncate(pos)
+                    os.fsync(f.fileno())
+                # Anything after a corrupt record is unreachable
+                for later in [s for s in segments if s > seg]:
+                    os.remove(self._path(_segment_name(later)))
+                break
+
+        with open(index_path, "wb") as f:
+            f.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in self.index))
+            os.fsync(f.fileno())
+
+    def __len__(self):
+        return len(self.index)
+
+    def _open_writer(self):
+        if self._writer is None:
+            if self.index:
+                segment = self.index[-1][0]
+            else:
+                segments = self._segments()
+                segment = segments[-1] if segments else 0
+            self._writer = open(self._path(_segment_name(segment)), "ab")
+            self._writer_segment = segment
+        if self._index_file is None:
+            self._index_file = open(self._path(INDEX_FILE), "ab")
+        return self._writer
+
+    def append(self, block, sync=True):
+        """Append a block at height len(self). Returns the new height."""
+        if block["index"] != len(self.index):
+            raise ValueError(f"Expected block #{len(self.index)}, got #{block['index']}")
+        record = encode_record(block, self.record_format)
+        writer = self._open_writer()
+        if writer.tell() > 0 and writer.tell() + len(record) > self.segment_size:
+            # Unsynced index entries may still point into this segment;
+            # sync() only reaches the current writer
+            writer.flush()
+            os.fsync(writer.fileno())
+            writer.close()
+            self._writer = None
+            self._writer_segment += 1
+            self._writer = open(self._path(_segment_name(self._writer_segment)), "ab")
+            writer = self._writer
+        offset = writer.tell()
+        writer.write(record)
+        self._index_file.write(INDEX_ENTRY.pack(self._writer_segment, offset))
+        self.index.append((self._writer_segment, offset))
+        if sync:
+            self.sync()
+        for view in list(self._views):
+            view.block_appended(block)
+        return len(self.index)
+
+    def sync(self):
+        """Flush and fsync the segment before the index, so the index never points past the data."""
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        if self._index_file is not None:
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+
+    def _reader(self, segment):
+        f = self._readers.get(segment)
+        if f is None:
+            f = self._readers[segment] = open(self._path(_segment_name(segment)), "rb")
+        return f
+
+    def _read_raw(self, height):
+        segment, offset = self.index[height]
+        if self._writer is not None and segment == self._writer_segment:
+            self._writer.flush()
+        f = self._reader(segment)
+        f.seek(offset)
+        head = f.read(RECORD_HEADER.size)
+        length = RECORD_HEADER.unpack(head)[0]
+        return head + f.read(length)
+
+    def read(self, height):
+        return decode_record(self._read_raw(height))
+
+    def read_header(self, height):
+        return decode_header(self._read_raw(height))
+
+    def __getitem__(self, height):
+        if height < 0:
+            height += len(self.index)
+        if not 0 <= height < len(self.index):
+            raise IndexError("block height out of range")
+        return self.read(height)
+
+    def __iter__(self):
+        for height in range(len(self.index)):
+            yield self.read(height)
+
+    def truncate(self, height):
+        """Drop all blocks at 'height' and above."""
+        if height >= len(self.index):
+            return
+        # Before the files shrink: touching a mapping past the end of a file is fatal
+        for view in list(self._views):
+            view.blocks_truncated(height)
+        self.close()
+        segment, offset = self.index[height]
+        del self.index[height:]
+        for later in [s for s in self._segments() if s > segment]:
+            os.remove(self._path(_segment_name(later)))
+        with open(self._path(_segment_name(segment)), "r+b") as f:
+            f.truncate(offset)
+            os.fsync(f.fileno())
+        with open(self._path(INDEX_FILE), "r+b") as f:
+            f.truncate(height * INDEX_ENTRY.size)
+            os.fsync(f.fileno())
+
+    def close(self):
+        for f in self._readers.values():
+            f.close()
+        self._readers = {}
+        if self._writer is not None:
+            self.sync()
+            self._writer.close()
+            self._writer = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def migrate_from_json(self, json_file):
+        """One-time import of a legacy blockchain.json into an empty store.
+        The JSON file is renamed afterwards so it is not imported twice."""
+        if len(self.index) > 0:
+            raise ValueError("Block store is not empty")
+        with open(json_file, "r") as f:
+            blocks = json.load(f)
+        for block in blocks:
+            self.append(block, sync=False)
+        self.sync()
+        os.replace(json_file, json_file + ".migrated")
+        return len(blocks)
@@ -0,0 +1,192 @@
+"""
+Binary Codec
+Versioned compact encoding for transactions and blocks, used on disk by the
+block store and on the wire once a connection negotiates "bin1".
+
+Hex strings (public keys, signatures, txids, hashes) are stored as raw bytes
+and numbers as 8-byte ints or floats, keeping their type so a decoded block
+is identical to the original and hash_block gives the same result. Fields
+the codec doesn't know are carried along as a small JSON extension.
+"""
+import json
+import struct
+
+CODEC_VERSION = 1
+WIRE_ENCODING = "bin1"
+MESSAGE_MAGIC = b"PHNB"
+
+_STR_UTF8 = 0
+_STR_HEX = 1
+_NUM_INT = 0
+_NUM_FLOAT = 1
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+TX_FIELDS = ("sender", "recipient", "amount", "timestamp", "txid", "signature")
+_TX_STR_FIELDS = {"sender", "recipient", "txid", "signature"}
+HEADER_FIELDS = ("index", "timestamp", "prev_hash", "nonce", "hash")
+_HEADER_STR_FIELDS = {"prev_hash", "hash"}
+OPTIONAL_HEADER_FIELDS = ("version", "difficulty", "merkle_root")
+_OPTIONAL_STR_FIELDS = {"merkle_root"}
+
+
+def _pack_str(value):
+    # Lowercase even-length hex (what .hex() produces) round-trips exactly as raw bytes
+    if len(value) % 2 == 0 and len(value) <= 510 and _HEX_DIGITS.issuperset(value):
+        raw = bytes.fromhex(value)
+        return struct.pack("<BB", _STR_HEX, len(raw)) + raw
+    raw = value.encode()
+    return struct.pack("<BH", _STR_UTF8, len(raw)) + raw
+
+
+def _unpack_str(data, pos):
+    kind = data[pos]
+    if kind == _STR_HEX:
+        length = data[pos + 1]
+        return bytes(data[pos + 2:pos + 2 + length]).hex(), pos + 2 + length
+    (length,) = struct.unpack_from("<H", data, pos + 1)
+    return bytes(data[pos + 3:pos + 3 + length]).decode(), pos + 3 + length
+
+
+def _pack_num(value):
+    if isinstance(value, float):
+        return struct.pack("<Bd", _NUM_FLOAT, value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return struct.pack("<Bq", _NUM_INT, value)
+    raise ValueError(f"Unsupported number {value!r}")
+
+
+def _unpack_num(data, pos):
+    fmt = "<d" if data[pos] == _NUM_FLOAT else "<q"
+    return struct.unpack_from(fmt, data, pos + 1)[0], pos + 9
+
+
+def _pack_field(value, is_str):
+    if is_str:
+        if not isinstance(value, str):
+            raise ValueError(f"Expected a string, got {value!r}")
+        return _pack_str(value)
+    return _pack_num(value)
+
+
+def _pack_extra(extra):
+    raw = json.dumps(extra, separators=(",", ":")).encode() if extra else b""
+    return struct.pack("<I", len(raw)) + raw
+
+
+def _unpack_extra(data, pos):
+    (length,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    if not length:
+        return {}, pos
+    return json.loads(bytes(data[pos:pos + length])), pos + length
+
+
+def encode_tx(tx):
+    """Encode one transaction. Raises ValueError for values the codec can't represent."""
+    parts = [_pack_field(tx[field], field in _TX_STR_FIELDS) for field in TX_FIELDS]
+    parts.append(_pack_extra({k: v for k, v in tx.items() if k not in TX_FIELDS}))
+    return b"".join(parts)
+
+
+def decode_tx(data, pos=0):
+    """Returns (tx, next position)."""
+    tx = {}
+    for field in TX_FIELDS:
+        if field in _TX_STR_FIELDS:
+            tx[field], pos = _unpack_str(data, pos)
+        else:
+            tx[field], pos = _unpack_num(data, pos)
+    extra, pos = _unpack_extra(data, pos)
+    tx.update(extra)
+    return tx, pos
+
+
+def encode_header(block):
+    """Everything in a block except its transactions."""
+    present = 0
+    parts = []
+    for field in HEADER_FIELDS:
+        parts.append(_pack_field(block[field], field in _HEADER_STR_FIELDS))
+    for bit, field in enumerate(OPTIONAL_HEADER_FIELDS):
+        if field in block:
+            present |= 1 << bit
+            parts.append(_pack_field(block[field], field in _OPTIONAL_STR_FIELDS))
+    known = set(HEADER_FIELDS) | set(OPTIONAL_HEADER_FIELDS) | {"transactions"}
+    parts.append(_pack_extra({k: v for k, v in block.items() if k not in known}))
+    return struct.pack("<BB", CODEC_VERSION, present) + b"".join(parts)
+
+
+def decode_header(data, pos=0):
+    version, present = struct.unpack_from("<BB", data, pos)
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported codec version {version}")
+    pos += 2
+    block = {}
+    for field in HEADER_FIELDS:
+        if field in _HEADER_STR_FIELDS:
+            block[field], pos = _unpack_str(data, pos)
+        else:
+            block[field], pos = _unpack_num(data, pos)
+    for bit, field in enumerate(OPTIONAL_HEADER_FIELDS):
+        if present & (1 << bit):
+            if field in _OPTIONAL_STR_FIELDS:
+                block[field], pos = _unpack_str(data, pos)
+            else:
+                block[field], pos = _unpack_num(data, pos)
+    extra, pos = _unpack_extra(data, pos)
+    block.update(extra)
+    return block, pos
+
+
+def encode_transactions(transactions):
+    return struct.pack("<I", len(transactions)) + b"".join(encode_tx(tx) for tx in transactions)
+
+
+def decode_transactions(data, pos=0):
+    (count,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    transactions = []
+    for _ in range(count):
+        tx, pos = decode_tx(data, pos)
+        transactions.append(tx)
+    return transactions, pos
+
+
+def encode_block(block):
+    return encode_header(block) + encode_transactions(block["transactions"])
+
+
+def decode_block(data, pos=0):
+    """Returns (block, next position)."""
+    block, pos = decode_header(data, pos)
+    block["transactions"], pos = decode_transactions(data, pos)
+    return block, pos
+
+
+def encode_message(message, blocks_key):
+    """Binary websocket frame: a JSON envelope plus the blocks under 'blocks_key'
+    (a list of blocks or a single block) in binary form."""
+    value = message[blocks_key]
+    blocks = value if isinstance(value, list) else [value]
+    envelope = {k: v for k, v in message.items() if k != blocks_key}
+    envelope["_blocks"] = {"key": blocks_key, "single": not isinstance(value, list)}
+    raw_envelope = json.dumps(envelope, separators=(",", ":")).encode()
+    parts = [MESSAGE_MAGIC, struct.pack("<II", len(raw_envelope), len(blocks)), raw_envelope]
+    parts.extend(encode_block(block) for block in blocks)
+    return b"".join(parts)
+
+
+def decode_message(data):
+    if bytes(data[:4]) != MESSAGE_MAGIC:
+        raise ValueError("Not a binary PHN message")
+    envelope_len, count = struct.unpack_from("<II", data, 4)
+    pos = 12
+    message = json.loads(bytes(data[pos:pos + envelope_len]))
+    pos += envelope_len
+    blocks = []
+    for _ in range(count):
+        block, pos = decode_block(data, pos)
+        blocks.append(block)
+    layout = message.pop("_blocks")
+    message[layout["key"]] = blocks[0] if layout["single"] else blocks
+    return message
@@ -0,0 +1,264 @@
+"""
+Compact Blocks
+Memory-lean, read-only stand-ins for loaded blocks. A block's transactions
+are stored column by column: senders and recipients as integer ids into a
+shared AddressTable (each distinct address is kept once however often it
+appears), txids and signatures packed as raw bytes, timestamps in a float
+array. Blocks and transactions still read like the dicts they came from
+(block["transactions"][0]["sender"], get(), in, items(), ==), so
+validate_block, get_balance, LedgerState and hash_block take them as is.
+
+    table = AddressTable()
+    chain = [compact_block(block, table) for block in store]
+
+Blocks that don't fit the layout (missing or oddly typed fields) are
+returned unchanged. Compact blocks can't be modified: to_dict() gives a
+plain copy, and they pickle (e.g. to verify_chain workers) as plain dicts.
+"""
+from array import array
+from collections.abc import Mapping, Sequence
+from .codec import TX_FIELDS
+
+BLOCK_FIELDS = ("index", "timestamp", "transactions", "prev_hash", "nonce", "hash")
+TXID_SIZE = 32
+SIGNATURE_SIZE = 64
+
+
+class AddressTable:
+    """Interns addresses to integer ids; shared by every block of a chain."""
+
+    def __init__(self):
+        self.ids = {}
+        self.addresses = []
+
+    def intern(self, address):
+        address_id = self.ids.get(address)
+        if address_id is None:
+            address_id = self.ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return address_id
+
+    def __len__(self):
+        return len(self.addresses)
+
+
+def _hex_bytes(value, size):
+    # Only lowercase hex of the exact width round-trips through bytes.hex()
+    if not isinstance(value, str) or len(value) != 2 * size or value != value.lower():
+        return None
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        return None
+    return raw if len(raw) == size else None
+
+
+class _HexColumn:
+    """Fixed-size hex strings packed into one bytes object. Values that aren't
+    (e.g. "coinbase_signature") are kept as they are on the side."""
+    __slots__ = ("size", "data", "other")
+
+    def __init__(self, values, size):
+        self.size = size
+        self.other = None
+        packed = bytearray()
+        for i, value in enumerate(values):
+            raw = _hex_bytes(value, size)
+            if raw is None:
+                if self.other is None:
+                    self.other = {}
+                self.other[i] = value
+                raw = bytes(size)
+            packed += raw
+        self.data = bytes(packed)
+
+    def __getitem__(self, i):
+        if self.other is not None and i in self.other:
+            return self.other[i]
+        return self.data[i * self.size:(i + 1) * self.size].hex()
+
+
+def _number_column(values):
+    if all(type(value) is float for value in values):
+        return array("d", values)
+    return list(values)
+
+
+def to_plain(obj):
+    """json.dumps default= hook: compact blocks and transactions as dicts and lists."""
+    if isinstance(obj, (CompactBlock, TransactionView)):
+        return obj.to_dict()
+    if isinstance(obj, CompactTransactions):
+        return obj.to_list()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class TransactionView(Mapping):
+    """One transaction of a CompactTransactions, read like a dict."""
+    __slots__ = ("_txs", "_i")
+
+    def __init__(self, txs, i):
+        self._txs = txs
+        self._i = i
+
+    def __getitem__(self, key):
+        txs, i = self._txs, self._i
+        if key == "sender":
+            return txs.table.addresses[txs.senders[i]]
+        if key == "recipient":
+            return txs.table.addresses[txs.recipients[i]]
+        if key == "amount":
+            return txs.amounts[i]
+        if key == "timestamp":
+            return txs.timestamps[i]
+        if key == "txid":
+            return txs.txids[i]
+        if key == "signature":
+            return txs.signatures[i]
+        if txs.extras is not None and i in txs.extras:
+            return txs.extras[i][key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in TX_FIELDS:
+            return True
+        extras = self._txs.extras
+        return extras is not None and key in extras.get(self._i, ())
+
+    def _extra(self):
+        extras = self._txs.extras
+        return extras.get(self._i, {}) if extras is not None else {}
+
+    def __iter__(self):
+        yield from TX_FIELDS
+        yield from self._extra()
+
+    def __len__(self):
+        return len(TX_FIELDS) + len(self._extra())
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class CompactTransactions(Sequence):
+    """A block's transactions in columns."""
+    __slots__ = ("table", "senders", "recipients", "amounts", "timestamps", "txids", "signatures", "extras")
+
+    def __init__(self, transactions, table):
+        self.table = table
+        self.senders = array("I", [table.intern(tx["sender"]) for tx in transactions])
+        self.recipients = array("I", [table.intern(tx["recipient"]) for tx in transactions])
+        self.amounts = [tx["amount"] for tx in transactions]
+        self.timestamps = _number_column([tx["timestamp"] for tx in transactions])
+        self.txids = _HexColumn([tx["txid"] for tx in transactions], TXID_SIZE)
+        self.signatures = _HexColumn([tx["signature"] for tx in transactions], SIGNATURE_SIZE)
+        self.extras = None  # index -> {field: value} for fields beyond TX_FIELDS
+        for i, tx in enumerate(transactions):
+            if len(tx) > len(TX_FIELDS):
+                if self.extras is None:
+                    self.extras = {}
+                self.extras[i] = {k: v for k, v in tx.items() if k not in TX_FIELDS}
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [TransactionView(self, i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("transaction index out of range")
+        return TransactionView(self, item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield TransactionView(self, i)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, CompactTransactions)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def to_list(self):
+        return [tx.to_dict() for tx in self]
+
+    def __reduce__(self):
+        return list, (self.to_list(),)
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+
+class CompactBlock(Mapping):
+    """A block whose transactions are a CompactTransactions, read like a dict."""
+    __slots__ = BLOCK_FIELDS + ("extra",)
+
+    def __init__(self, block, table):
+        self.index = block["index"]
+        self.timestamp = block["timestamp"]
+        self.transactions = CompactTransactions(block["transactions"], table)
+        self.prev_hash = block["prev_hash"]
+        self.nonce = block["nonce"]
+        self.hash = block["hash"]
+        extra = {k: v for k, v in block.items() if k not in BLOCK_FIELDS}
+        self.extra = extra or None
+
+    def __getitem__(self, key):
+        if key in BLOCK_FIELDS:
+            return getattr(self, key)
+        if self.extra is not None:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in BLOCK_FIELDS or (self.extra is not None and key in self.extra)
+
+    def __iter__(self):
+        yield from BLOCK_FIELDS
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return len(BLOCK_FIELDS) + (len(self.extra) if self.extra is not None else 0)
+
+    def to_dict(self):
+        block = {key: self[key] for key in self}
+        block["transactions"] = self.transactions.to_list()
+        return block
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def _fits(block):
+    if any(field not in block for field in BLOCK_FIELDS) or not isinstance(block["transactions"], list):
+        return False
+    for tx in block["transactions"]:
+        if not isinstance(tx, dict) or any(field not in tx for field in TX_FIELDS):
+            return False
+        if not isinstance(tx["sender"], str) or not isinstance(tx["recipient"], str):
+            return False
+    return True
+
+
+def compact_block(block, table):
+    """A CompactBlock for 'block', or 'block' itself if it doesn't fit the layout."""
+    if isinstance(block, CompactBlock) or not isinstance(block, dict) or not _fits(block):
+        return block
+    return CompactBlock(block, table)
+
+
+def compact_chain(blocks, table=None):
+    """[compact_block] for an iterable of blocks, sharing one AddressTable."""
+    table = table if table is not None else AddressTable()
+    return [compact_block(block, table) for block in blocks]
@@ -0,0 +1,169 @@
+"""
+Crypto
+Key generation, signing, verification and address derivation for PHN, in
+one place. Uses coincurve (libsecp256k1) when it is installed and the
+pure-Python ecdsa package otherwise; both produce and accept the same
+signatures, so wallets, nodes and miners can run different backends.
+
+Signatures are raw 64-byte r||s (hex) over SHA-1 of the message, which is
+what ecdsa's SigningKey.sign() has always produced here. For libsecp256k1
+the SHA-1 digest is left-padded to 32 bytes, which gives the same integer,
+and high-s signatures are normalized to low-s before verifying.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from ecdsa import SigningKey, VerifyingKey, SECP256k1, BadSignatureError
+from ecdsa.ellipticcurve import PointJacobi
+
+try:
+    import coincurve
+    from coincurve.ecdsa import cdata_to_der, der_to_cdata, deserialize_compact, serialize_compact
+except ImportError:
+    coincurve = None
+
+BACKEND = "coincurve" if coincurve is not None else "ecdsa"
+KEY_CACHE_SIZE = 4096  # Parsed keys kept per process
+PRECOMPUTE_AFTER = 4  # ecdsa: build a key's multiplication table once it has been used this often
+PARALLEL_SIGN_MIN = 64  # sign_many: fewer messages than this are signed in-process
+SIGN_CHUNK_SIZE = 64  # Messages per task sent to a pool worker
+
+_ORDER = SECP256k1.order
+_public_keys = OrderedDict()  # public hex -> [key object, uses]
+_private_keys = OrderedDict()  # private hex -> key object
+_sign_pool = None
+
+
+def get_display_address(canonical_public_key_hex):
+    """Convert a canonical public key hex to a PHN address."""
+    public_key_bytes = bytes.fromhex(canonical_public_key_hex)
+    address_hash = hashlib.sha256(public_key_bytes).hexdigest()[:40]
+    return f"PHN{address_hash}"
+
+
+def _digest32(message):
+    return bytes(12) + hashlib.sha1(message).digest()
+
+
+def _cached(cache, key):
+    entry = cache.get(key)
+    if entry is not None:
+        cache.move_to_end(key)
+    return entry
+
+
+def _store(cache, key, value, limit):
+    cache[key] = value
+    if len(cache) > limit:
+        cache.popitem(last=False)
+    return value
+
+
+def _private_key(private_key_hex):
+    key = _cached(_private_keys, private_key_hex)
+    if key is None:
+        raw = bytes.fromhex(private_key_hex)
+        if coincurve is not None:
+            key = coincurve.PrivateKey(raw)
+        else:
+            key = SigningKey.from_string(raw, curve=SECP256k1)
+        _store(_private_keys, private_key_hex, key, KEY_CACHE_SIZE)
+    return key
+
+
+def _public_key(public_key_hex):
+    entry = _cached(_public_keys, public_key_hex)
+    if entry is None:
+        raw = bytes.fromhex(public_key_hex)
+        if coincurve is not None:
+            key = coincurve.PublicKey(b"\x04" + raw)
+        else:
+            # VerifyingKey.from_string leaves the point without its order, which precompute() needs
+            point = PointJacobi.from_bytes(SECP256k1.curve, raw, order=_ORDER)
+            key = VerifyingKey.from_public_point(point, curve=SECP256k1)
+        entry = _store(_public_keys, public_key_hex, [key, 0], KEY_CACHE_SIZE)
+    entry[1] += 1
+    if coincurve is None and entry[1] == PRECOMPUTE_AFTER:
+        entry[0].precompute()
+    return entry[0]
+
+
+def public_key(private_key_hex):
+    """Canonical (128-char hex) public key of a private key."""
+    key = _private_key(private_key_hex)
+    if coincurve is not None:
+        return key.public_key.format(compressed=False)[1:].hex()
+    return key.get_verifying_key().to_string().hex()
+
+
+def generate_keypair():
+    """(private key hex, canonical public key hex)."""
+    if coincurve is not None:
+        key = coincurve.PrivateKey()
+        return key.secret.hex(), key.public_key.format(compressed=False)[1:].hex()
+    sk = SigningKey.generate(curve=SECP256k1)
+    return sk.to_string().hex(), sk.get_verifying_key().to_string().hex()
+
+
+def generate_keypairs(count):
+    """'count' fresh (private key hex, canonical public key hex) pairs."""
+    return [generate_keypair() for _ in range(count)]
+
+
+def sign(private_key_hex, message):
+    """Signature (hex) of 'message' (bytes)."""
+    key = _private_key(private_key_hex)
+    if coincurve is not None:
+        der = key.sign(_digest32(message), hasher=None)
+        return serialize_compact(der_to_cdata(der)).hex()
+    return key.sign(message).hex()
+
+
+def _sign_chunk(items):
+    """Pool worker: sign a list of (private key hex, message) pairs."""
+    return [sign(private_key_hex, message) for private_key_hex, message in items]
+
+
+def _get_sign_pool():
+    global _sign_pool
+    if _sign_pool is None:
+        _sign_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _sign_pool
+
+
+def shutdown_sign_pool():
+    global _sign_pool
+    if _sign_pool is not None:
+        _sign_pool.shutdown()
+        _sign_pool = None
+
+
+def sign_many(items, parallel=True):
+    """Sign many (private key hex, message) pairs. Each key is parsed once, and
+    large batches are spread over a process pool. Returns signatures in order."""
+    items = list(items)
+    if parallel and len(items) >= PARALLEL_SIGN_MIN and (os.cpu_count() or 1) > 1:
+        chunks = [items[i:i + SIGN_CHUNK_SIZE] for i in range(0, len(items), SIGN_CHUNK_SIZE)]
+        return [signature for chunk in _get_sign_pool().map(_sign_chunk, chunks) for signature in chunk]
+    return _sign_chunk(items)
+
+
+def verify(public_key_hex, signature_hex, message):
+    """True if 'signature_hex' is a valid signature of 'message' by the key.
+    Raises ValueError for keys or signatures that aren't well-formed."""
+    key = _public_key(public_key_hex)
+    signature = bytes.fromhex(signature_hex)
+    if len(signature) != 64:
+        raise ValueError(f"Signature must be 64 bytes, got {len(signature)}")
+    if coincurve is not None:
+        r, s = int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big")
+        if not (0 < r < _ORDER and 0 < s < _ORDER):
+            return False
+        if s > _ORDER // 2:
+            signature = signature[:32] + (_ORDER - s).to_bytes(32, "big")
+        return key.verify(cdata_to_der(deserialize_compact(signature)), _digest32(message), hasher=None)
+    try:
+        return key.verify(signature, message)
+    except BadSignatureError:
+        return False
@@ -0,0 +1,171 @@
+"""
+Difficulty
+Proof of work as a 256-bit integer target: a block is valid when
+int(hash, 16) <= target. The legacy DIFFICULTY of D leading hex zeros is the
+target 2**(256 - 4*D) - 1, which accepts exactly the same hashes, so chains
+mined before retargeting validate unchanged.
+
+From RETARGET_HEIGHT on, the target is recomputed every RETARGET_INTERVAL
+blocks from how long the last RETARGET_INTERVAL blocks took, pulling the
+block interval back towards TARGET_BLOCK_TIME as hashrate changes. One
+adjustment moves the target by at most MAX_RETARGET_FACTOR either way.
+Targets follow from block timestamps, so every node derives the same
+schedule; v2 headers from RETARGET_HEIGHT on carry the target in compact
+form in their difficulty field, so a header commits to the target it was
+mined against. Retargeting therefore needs HEADER_V2_HEIGHT <= RETARGET_HEIGHT.
+
+Since miners pick their timestamps, retargeting also brings timestamp rules:
+a block must be stamped after the median of the MEDIAN_TIME_BLOCKS before it
+and at most MAX_FUTURE_BLOCK_TIME ahead of the validating node's clock.
+Windows overlap by one block (each starts at the block that closed the last
+one), so a timestamp pushed forward to ease one window hardens the next by
+the same amount; the future bound keeps the push from running ahead.
+"""
+import math
+from config import (DIFFICULTY, TARGET_BLOCK_TIME, RETARGET_INTERVAL, MAX_RETARGET_FACTOR, RETARGET_HEIGHT,
+                    MEDIAN_TIME_BLOCKS, MAX_FUTURE_BLOCK_TIME, HEADER_V2_HEIGHT)
+
+MAX_TARGET = 2 ** 256 - 1
+
+
+def difficulty_to_target(difficulty):
+    """Target that accepts exactly the hashes with 'difficulty' leading hex zeros."""
+    return 2 ** (256 - 4 * difficulty) - 1
+
+
+def target_to_difficulty(target):
+    """Equivalent number of leading hex zeros (fractional), for display."""
+    return (256 - math.log2(target + 1)) / 4
+
+
+def target_to_hex(target):
+    """64-char hex, the form targets take on the wire. Hex hashes compare
+    against it as strings: for equal-length lowercase hex, string order is
+    numeric order."""
+    return f"{target:064x}"
+
+
+def target_from_hex(target_hex):
+    target = int(target_hex, 16)
+    if not 0 < target <= MAX_TARGET:
+        raise ValueError(f"Target out of range: {target_hex}")
+    return target
+
+
+def hash_meets_target(block_hash, target):
+    return int(block_hash, 16) <= target
+
+
+def target_to_bits(target):
+    """Compact form for the 32-bit header field: a byte length and the top 23 bits."""
+    size = (target.bit_length() + 7) // 8
+    mantissa = target << 8 * (3 - size) if size <= 3 else target >> 8 * (size - 3)
+    if mantissa & 0x800000:  # Keep the sign bit of the mantissa clear
+        mantissa >>= 8
+        size += 1
+    return size << 24 | mantissa
+
+
+def bits_to_target(bits):
+    size, mantissa = bits >> 24, bits & 0x7FFFFF
+    return mantissa >> 8 * (3 - size) if size <= 3 else mantissa << 8 * (size - 3)
+
+
+def retarget(target, actual_timespan, expected_timespan, max_factor=MAX_RETARGET_FACTOR):
+    """Scale 'target' by actual/expected time, clamped to 'max_factor' either way."""
+    actual = min(max(actual_timespan, expected_timespan / max_factor), expected_timespan * max_factor)
+    # Integer milliseconds keep the 256-bit arithmetic exact
+    new_target = target * round(actual * 1000) // round(expected_timespan * 1000)
+    return max(1, min(new_target, MAX_TARGET))
+
+
+def _header(blockchain, height):
+    headers = getattr(blockchain, "headers", None)  # LazyChain: no need to decode whole blocks
+    return headers[height] if headers is not None else blockchain[height]
+
+
+def median_time_past(blockchain, height, count=MEDIAN_TIME_BLOCKS):
+    """Median timestamp of the 'count' blocks below 'height'."""
+    timestamps = sorted(_header(blockchain, h)["timestamp"] for h in range(max(height - count, 0), height))
+    return timestamps[len(timestamps) // 2]
+
+
+class RetargetSchedule:
+    """Targets for a chain under one set of retargeting rules. Adjusted targets
+    are cached per adjustment height and block hash, so looking up the target
+    for the next block is O(1) once the chain has been walked."""
+
+    def __init__(self, initial_target, activation_height, interval, block_time, max_factor,
+                 median_blocks=MEDIAN_TIME_BLOCKS, max_future=MAX_FUTURE_BLOCK_TIME):
+        self.initial_target = initial_target
+        self.activation_height = activation_height  # None: the target never changes
+        self.interval = interval
+        self.block_time = block_time
+        self.max_factor = max_factor
+        self.median_blocks = median_blocks
+        self.max_future = max_future
+        self._adjusted = {}  # (adjustment height, hash of the block before it) -> target
+
+    def active(self, height):
+        return self.activation_height is not None and height >= self.activation_height
+
+    def header_difficulty(self, height, target):
+        """What a v2 header's difficulty field must hold at 'height': the
+        leading-zeros DIFFICULTY until activation, then the compact target."""
+        return target_to_bits(target) if self.active(height) else DIFFICULTY
+
+    def check_timestamp(self, blockchain, height, timestamp, now=None):
+        """Timestamp rules for a block at 'height' once retargeting is active.
+        'now' is the node's clock; leave it out when re-checking stored blocks."""
+        if not self.active(height) or height == 0:
+            return True, "Block timestamp valid"
+        earliest = median_time_past(blockchain, height, self.median_blocks)
+        if timestamp <= earliest:
+            return False, f"Block timestamp must be after {earliest}, the median of the last {self.median_blocks} blocks"
+        if now is not None and timestamp > now + self.max_future:
+            return False, f"Block timestamp more than {self.max_future}s in the future"
+        return True, "Block timestamp valid"
+
+    def target_at(self, blockchain, height):
+        """Target a block at 'height' must meet; 'blockchain' holds at least the blocks below it."""
+        if self.activation_height is None or height < self.activation_height + self.interval:
+            return self.initial_target
+        first = self.activation_height + self.interval
+        boundary = first + (height - first) // self.interval * self.interval
+        # Walk back to the newest adjustment already known, then forward from there
+        missing = []
+        target = self.initial_target
+        while boundary >= first:
+            key = (boundary, _header(blockchain, boundary - 1)["hash"])
+            if key in self._adjusted:
+                target = self._adjusted[key]
+                break
+            missing.append((boundary, key))
+            boundary -= self.interval
+        for boundary, key in reversed(missing):
+            start = max(boundary - 1 - self.interval, 0)
+            actual = _header(blockchain, boundary - 1)["timestamp"] - _header(blockchain, start)["timestamp"]
+            target = retarget(target, actual, self.block_time * (boundary - 1 - start), self.max_factor)
+            self._adjusted[key] = target
+        return target
+
+
+if RETARGET_HEIGHT is not None and (HEADER_V2_HEIGHT is None or HEADER_V2_HEIGHT > RETARGET_HEIGHT):
+    raise ValueError("RETARGET_HEIGHT needs HEADER_V2_HEIGHT <= RETARGET_HEIGHT, so headers commit to their target")
+
+LEGACY_TARGET = difficulty_to_target(DIFFICULTY)
+SCHEDULE = RetargetSchedule(LEGACY_TARGET, RETARGET_HEIGHT, RETARGET_INTERVAL, TARGET_BLOCK_TIME, MAX_RETARGET_FACTOR)
+
+
+def target_at(blockchain, height):
+    """Target for a block at 'height' under the rules in config.py."""
+    return SCHEDULE.target_at(blockchain, height)
+
+
+def header_difficulty(height, target):
+    """Difficulty field for a v2 header at 'height' mined against 'target'."""
+    return SCHEDULE.header_difficulty(height, target)
+
+
+def check_timestamp(blockchain, height, timestamp, now=None):
+    return SCHEDULE.check_timestamp(blockchain, height, timestamp, now)
@@ -0,0 +1,88 @@
+"""
+Address Directory
+On-disk (SQLite) map from PHN display addresses to the canonical public keys
+they were derived from, for every sender and recipient seen in a block. A
+display address is a hash of the key, so it can't be turned back into one;
+this index gives the resolve_address protocol call a single-row lookup
+instead of a scan of the chain. Kept up to date as blocks are appended.
+"""
+import sqlite3
+from .crypto import get_display_address
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS addresses (
+    display TEXT PRIMARY KEY,
+    canonical TEXT NOT NULL,
+    height INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS addresses_height ON addresses (height);
+CREATE TABLE IF NOT EXISTS blocks (
+    height INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+def is_canonical_address(address):
+    return isinstance(address, str) and len(address) == 128 and _HEX_DIGITS.issuperset(address)
+
+
+def is_display_address(address):
+    return isinstance(address, str) and len(address) == 43 and address.startswith("PHN") and _HEX_DIGITS.issuperset(address[3:])
+
+
+class AddressDirectory:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.height = self.db.execute("SELECT COALESCE(MAX(height) + 1, 0) FROM blocks").fetchone()[0]
+
+    def block_hash(self, height):
+        row = self.db.execute("SELECT hash FROM blocks WHERE height = ?", (height,)).fetchone()
+        return row[0] if row else None
+
+    def resolve(self, display_address):
+        """Canonical address for a PHN display address, or None if never seen in a block."""
+        row = self.db.execute("SELECT canonical FROM addresses WHERE display = ?", (display_address,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def add_block(self, block):
+        height = block["index"]
+        if height != self.height:
+            raise ValueError(f"Directory at height {self.height} can't take block #{height}")
+        rows = {}
+        for tx in block["transactions"]:
+            for address in (tx["sender"], tx["recipient"]):
+                if address not in rows and is_canonical_address(address):
+                    rows[address] = (get_display_address(address), address, height)
+        with self.db:
+            # OR IGNORE keeps the height an address was first seen at
+            self.db.executemany("INSERT OR IGNORE INTO addresses (display, canonical, height) VALUES (?, ?, ?)", rows.values())
+            self.db.execute("INSERT INTO blocks (height, hash) VALUES (?, ?)", (height, block["hash"]))
+        self.height = height + 1
+
+    def truncate(self, height):
+        """Forget blocks at 'height' and above, and addresses first seen there."""
+        with self.db:
+            for table in ("addresses", "blocks"):
+                self.db.execute(f"DELETE FROM {table} WHERE height >= ?", (height,))
+        self.height = min(self.height, height)
+
+    def sync(self, blockchain):
+        """Bring the directory in line with 'blockchain', rolling back past a fork if needed."""
+        height = min(self.height, len(blockchain))
+        while height > 0 and self.block_hash(height - 1) != blockchain[height - 1]["hash"]:
+            height -= 1
+        self.truncate(height)
+        for h in range(self.height, len(blockchain)):
+            self.add_block(blockchain[h])
+
+    def close(self):
+        self.db.close()
@@ -2,45 +2,75 @@ import json
 import os
 import time
 import hashlib
-from wallet import get_display_address
-from config import OWNER_ALLOCATION, BLOCKCHAIN_FILE
+from .crypto import get_display_address
+from config import OWNER_ALLOCATION, BLOCKCHAIN_FILE, BLOCKSTORE_DIR, BLOCKSTORE_SEGMENT_SIZE, BLOCKSTORE_BINARY
+from .blockstore import BlockStore, FORMAT_BINARY, FORMAT_JSON
+from .lazychain import LazyChain
+from .compact import compact_chain, to_plain
+from .header import HEADER_VERSION, hash_header
+from .metrics import timed
 
 blockchain = []  # Will be imported in main to access global chain
+_block_store = None
 
+def get_block_store():
+    global _block_store
+    if _block_store is None:
+        record_format = FORMAT_BINARY if BLOCKSTORE_BINARY else FORMAT_JSON
+        _block_store = BlockStore(BLOCKSTORE_DIR, BLOCKSTORE_SEGMENT_SIZE, record_format)
+    return _block_store
+
+@timed("phn_save_blockchain_seconds", "Time to persist new blocks")
 def save_blockchain(blockchain_data):
+    """Persist the chain by appending only the blocks the store doesn't have yet.
+    If the stored tip is not part of 'blockchain_data' (a reorg), the store is
+    truncated back to the fork point first."""
     try:
-        with open(BLOCKCHAIN_FILE, "w") as f:
-            json.dump(blockchain_data, f, indent=4)
-        print(f"Blockchain saved to {BLOCKCHAIN_FILE}")
+        store = get_block_store()
+        height = min(len(store), len(blockchain_data))
+        while height > 0 and store.read_header(height - 1)["hash"] != blockchain_data[height - 1]["hash"]:
+            height -= 1
+        store.truncate(height)
+        for block in blockchain_data[height:]:
+            store.append(block, sync=False)
+        store.sync()
+        print(f"Blockchain saved to {BLOCKSTORE_DIR} ({len(blockchain_data) - height} new blocks)")
     except Exception as e:
         print(f"Error saving blockchain: {e}")
 
-def load_blockchain():
+@timed("phn_load_blockchain_seconds", "Time to open the stored chain")
+def load_blockchain(lazy=False, compact=False):
+    """Load the stored chain. With lazy=True a memory-mapped LazyChain is returned
+    that only decodes block headers up front; with compact=True a list of
+    read-only CompactBlocks that take a fraction of the memory of dicts."""
     global blockchain
-    if os.path.exists(BLOCKCHAIN_FILE):
-        try:
-            with open(BLOCKCHAIN_FILE, "r") as f:
-                loaded = json.load(f)
-                if isinstance(loaded, list) and len(loaded) > 0:
-                    blockchain = loaded
-                    print(f"Blockchain loaded. Length: {len(blockchain)}")
-                    return blockchain
-                else:
-                    print("Invalid blockchain data, starting fresh.")
-                    blockchain = []
-                    return []
-        except Exception as e:
-            print(f"Error loading blockchain: {e}, starting fresh.")
+    try:
+        store = get_block_store()
+        if len(store) == 0 and os.path.exists(BLOCKCHAIN_FILE):
+            migrated = store.migrate_from_json(BLOCKCHAIN_FILE)
+            print(f"Migrated {migrated} blocks from {BLOCKCHAIN_FILE} to {BLOCKSTORE_DIR}")
+        if len(store) == 0:
+            print("No blockchain found, starting fresh.")
             blockchain = []
             return []
-    else:
-        print("No blockchain file found, starting fresh.")
+        if lazy:
+            blockchain = LazyChain(store)
+        elif compact:
+            blockchain = compact_chain(store)
+        else:
+            blockchain = list(store)
+        print(f"Blockchain loaded. Length: {len(blockchain)}")
+        return blockchain
+    except Exception as e:
+        print(f"Error loading blockchain: {e}, starting fresh.")
         blockchain = []
         return []
 
 def hash_block(block):
+    if block.get("version", 1) >= HEADER_VERSION:
+        return hash_header(block)
     block_copy = {k: v for k, v in block.items() if k != "hash"}
-    block_str = json.dumps(block_copy, sort_keys=True).encode()
+    block_str = json.dumps(block_copy, sort_keys=True, default=to_plain).encode()
     return hashlib.sha256(block_str).hexdigest()
 
 def create_genesis_block(owner_address):
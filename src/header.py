@@ -0,0 +1,71 @@
+"""
+Block Header (version 2)
+A fixed 88-byte binary header: version, prev_hash, Merkle root of the
+transactions, timestamp, difficulty and nonce. Version 2 blocks are hashed
+over this header only, so the cost of a hash no longer depends on how many
+transactions are in the block. The nonce is the last field, which lets
+miners hash the unchanging 80-byte prefix once and reuse its SHA-256 state.
+"""
+import hashlib
+import json
+import struct
+from .compact import to_plain
+
+HEADER_VERSION = 2
+# version, prev_hash, merkle_root, timestamp, difficulty, nonce
+HEADER = struct.Struct(">I32s32sdIQ")
+HEADER_PREFIX_SIZE = HEADER.size - 8
+NONCE = struct.Struct(">Q")
+EMPTY_MERKLE_ROOT = "00" * 32
+
+HEADER_V2_FIELDS = ["version", "merkle_root", "difficulty"]
+
+
+def tx_leaf_hash(tx):
+    # Leaves commit to the whole transaction, not just its txid: txids are
+    # chosen by the sender (and coinbase txids can't be recomputed), so a
+    # txid-only root would let transaction contents change under a valid hash.
+    return hashlib.sha256(json.dumps(tx, sort_keys=True, default=to_plain).encode()).digest()
+
+
+def merkle_root(transactions):
+    level = [tx_leaf_hash(tx) for tx in transactions]
+    if not level:
+        return EMPTY_MERKLE_ROOT
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def pack_header_prefix(block):
+    """Pack every header field except the nonce."""
+    return HEADER.pack(
+        block["version"],
+        bytes.fromhex(block["prev_hash"]),
+        bytes.fromhex(block["merkle_root"]),
+        block["timestamp"],
+        block["difficulty"],
+        0,
+    )[:HEADER_PREFIX_SIZE]
+
+
+def pack_header(block):
+    return pack_header_prefix(block) + NONCE.pack(block["nonce"])
+
+
+def hash_header(block):
+    return hashlib.sha256(pack_header(block)).hexdigest()
+
+
+def prefix_hasher(block):
+    """SHA-256 state after absorbing the header prefix. Copy it and feed the
+    packed nonce to hash a candidate without re-hashing the prefix."""
+    return hashlib.sha256(pack_header_prefix(block))
+
+
+def hash_with_nonce(base, nonce):
+    h = base.copy()
+    h.update(NONCE.pack(nonce))
+    return h.hexdigest()
@@ -0,0 +1,108 @@
+"""
+Lazy Chain
+A read-mostly, list-like view of a BlockStore. Segment files are memory-mapped,
+only block headers are decoded at startup and full blocks (with transactions)
+are decoded on access, so `len(chain)` and `chain[-1]["hash"]` stay cheap.
+The view watches its store, so appends and truncates made on the store
+directly (save_blockchain, client sync) show up here too.
+"""
+import mmap
+from collections import OrderedDict
+from .blockstore import decode_header, decode_record, RECORD_HEADER, _segment_name
+
+HEADER_FIELDS = ("index", "hash", "prev_hash", "timestamp", "nonce")
+BLOCK_CACHE_SIZE = 256  # Fully decoded blocks kept around
+
+
+class LazyChain:
+    def __init__(self, store):
+        self.store = store
+        self._maps = {}  # segment -> (file, mmap)
+        self._cache = OrderedDict()
+        self.headers = []
+        for height in range(len(store)):
+            self.headers.append(self._decode_header(height))
+        store.watch(self)
+
+    def _map(self, segment, end):
+        entry = self._maps.get(segment)
+        if entry is None or len(entry[1]) < end:
+            if entry is not None:
+                entry[1].close()
+                entry[0].close()
+            self.store.sync()
+            f = open(self.store._path(_segment_name(segment)), "rb")
+            entry = self._maps[segment] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return entry[1]
+
+    def _locate(self, height):
+        segment, offset = self.store.index[height]
+        data = self._map(segment, offset + RECORD_HEADER.size)
+        length = RECORD_HEADER.unpack_from(data, offset)[0]
+        return self._map(segment, offset + RECORD_HEADER.size + length), offset
+
+    def _decode_header(self, height):
+        data, offset = self._locate(height)
+        header = decode_header(data, offset)
+        return {field: header[field] for field in HEADER_FIELDS if field in header}
+
+    def header(self, height):
+        return self.headers[height]
+
+    def record_size(self, height):
+        """Stored size of a block in bytes, without decoding it."""
+        data, offset = self._locate(height)
+        return RECORD_HEADER.size + RECORD_HEADER.unpack_from(data, offset)[0]
+
+    def __len__(self):
+        return len(self.headers)
+
+    def _block(self, height):
+        block = self._cache.get(height)
+        if block is not None:
+            self._cache.move_to_end(height)
+            return block
+        data, offset = self._locate(height)
+        block = decode_record(data, offset)
+        self._cache[height] = block
+        if len(self._cache) > BLOCK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return block
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._block(height) for height in range(*item.indices(len(self.headers)))]
+        if item < 0:
+            item += len(self.headers)
+        if not 0 <= item < len(self.headers):
+            raise IndexError("block height out of range")
+        return self._block(item)
+
+    def __iter__(self):
+        for height in range(len(self.headers)):
+            yield self._block(height)
+
+    def __bool__(self):
+        return bool(self.headers)
+
+    def append(self, block):
+        self.store.append(block)
+
+    def truncate(self, height):
+        """Drop all blocks at 'height' and above, in memory and on disk."""
+        self.store.truncate(height)
+
+    # --- BlockStore hooks ---
+    def block_appended(self, block):
+        self.headers.append({field: block[field] for field in HEADER_FIELDS if field in block})
+
+    def blocks_truncated(self, height):
+        self.close()
+        del self.headers[height:]
+
+    def close(self):
+        for f, data in self._maps.values():
+            data.close()
+            f.close()
+        self._maps = {}
+        self._cache.clear()
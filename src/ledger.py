@@ -0,0 +1,83 @@
+"""
+Ledger State
+Keeps per-address balances, nonces (number of spends) and last-seen heights
+so balance lookups don't have to walk the whole chain. Undo data is only kept
+for the last MAX_REORG_DEPTH blocks, so memory doesn't grow with the chain.
+"""
+from collections import deque
+from config import MAX_REORG_DEPTH
+
+
+class LedgerState:
+    def __init__(self, max_undo=MAX_REORG_DEPTH):
+        self.balances = {}
+        self.nonces = {}
+        self.last_seen = {}
+        self.height = 0  # Number of blocks applied
+        self._undo = deque(maxlen=max_undo)  # Previous last_seen values of the most recent blocks, for rollback
+
+    @classmethod
+    def from_chain(cls, blockchain):
+        ledger = cls()
+        for block in blockchain:
+            ledger.apply_block(block)
+        return ledger
+
+    def get_balance(self, address):
+        return self.balances.get(address, 0)
+
+    def get_nonce(self, address):
+        return self.nonces.get(address, 0)
+
+    def get_last_seen(self, address):
+        return self.last_seen.get(address)
+
+    def _credit(self, address, amount):
+        balance = self.balances.get(address, 0) + amount
+        if balance:
+            self.balances[address] = balance
+        else:
+            self.balances.pop(address, None)
+
+    def apply_block(self, block):
+        """Apply a block on top of the current state. A transaction missing a
+        field raises KeyError before anything is changed."""
+        height = block["index"]
+        moves = [(tx["sender"], tx["recipient"], tx["amount"]) for tx in block["transactions"]]
+        previous_seen = {}
+        for sender, recipient, amount in moves:
+            if sender != "coinbase":
+                self._credit(sender, -amount)
+                self.nonces[sender] = self.nonces.get(sender, 0) + 1
+            self._credit(recipient, amount)
+            for address in (sender, recipient):
+                if address not in previous_seen:
+                    previous_seen[address] = self.last_seen.get(address)
+                self.last_seen[address] = height
+        self._undo.append(previous_seen)
+        self.height += 1
+
+    def rollback_block(self, block):
+        """Undo the most recently applied block. Raises ValueError for anything
+        but the tip, or once the undo data (the last MAX_REORG_DEPTH blocks, and
+        nothing below a snapshot it was restored from) runs out."""
+        if block["index"] != self.height - 1:
+            raise ValueError(f"Can only roll back the tip block #{self.height - 1}")
+        if not self._undo:
+            raise ValueError(f"No undo data left to roll back block #{block['index']}")
+        for tx in reversed(block["transactions"]):
+            sender, recipient, amount = tx["sender"], tx["recipient"], tx["amount"]
+            self._credit(recipient, -amount)
+            if sender != "coinbase":
+                self._credit(sender, amount)
+                nonce = self.nonces[sender] - 1
+                if nonce:
+                    self.nonces[sender] = nonce
+                else:
+                    del self.nonces[sender]
+        for address, seen in self._undo.pop().items():
+            if seen is None:
+                self.last_seen.pop(address, None)
+            else:
+                self.last_seen[address] = seen
+        self.height -= 1
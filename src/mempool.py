@@ -0,0 +1,100 @@
+"""
+Mempool
+Pending transactions indexed by txid, with per-sender pending-spend totals so
+a sender can't commit more than their confirmed balance across pending
+transactions. Ordered by arrival, bounded by a memory budget (new
+transactions are turned away once it is used up), and able to hand out a
+block-sized template in O(k).
+
+There is no fee ordering: a transaction's optional "fee" field is neither
+signed nor paid to anyone, so ranking or evicting by it would let any sender
+jump the queue for free.
+"""
+import json
+
+
+class Mempool:
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = {}  # txid -> (tx, size); dict order is arrival order
+        self.sender_spend = {}
+        self.total_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, txid):
+        return txid in self.entries
+
+    def get(self, txid):
+        entry = self.entries.get(txid)
+        return entry[0] if entry is not None else None
+
+    def pending_spend(self, sender):
+        return self.sender_spend.get(sender, 0)
+
+    def add(self, tx, confirmed_balance):
+        """Add a transaction that already passed validate_transaction.
+        'confirmed_balance' is the sender's balance in the ledger. Returns (ok, message)."""
+        txid = tx["txid"]
+        if txid in self.entries:
+            return False, "Duplicate transaction"
+        if confirmed_balance - self.pending_spend(tx["sender"]) < tx["amount"]:
+            return False, "Insufficient balance (including pending transactions)"
+
+        size = len(json.dumps(tx))
+        if size > self.max_bytes:
+            return False, "Transaction too large"
+        if self.total_bytes + size > self.max_bytes:
+            return False, "Mempool full"
+
+        self.entries[txid] = (tx, size)
+        self.total_bytes += size
+        self.sender_spend[tx["sender"]] = self.pending_spend(tx["sender"]) + tx["amount"]
+        return True, "Added to mempool"
+
+    def remove(self, txid):
+        """Remove a transaction (mined or evicted). Returns it, or None if unknown."""
+        entry = self.entries.pop(txid, None)
+        if entry is None:
+            return None
+        tx, size = entry
+        self.total_bytes -= size
+        remaining = self.sender_spend[tx["sender"]] - tx["amount"]
+        if remaining > 0:
+            self.sender_spend[tx["sender"]] = remaining
+        else:
+            del self.sender_spend[tx["sender"]]
+        return tx
+
+    def remove_block(self, block, get_balance):
+        """Drop a newly applied block's transactions, then any pending transactions
+        whose sender can no longer cover them. Returns the removed txids."""
+        removed = []
+        senders = set()
+        for tx in block["transactions"]:
+            if self.remove(tx["txid"]) is not None:
+                removed.append(tx["txid"])
+            senders.add(tx["sender"])
+        for sender in senders:
+            if self.pending_spend(sender) > get_balance(sender):
+                # Confirmed balance dropped below what is pending (e.g. a conflicting
+                # spend mined elsewhere); drop this sender's pending transactions.
+                for txid in [txid for txid, (tx, _) in self.entries.items() if tx["sender"] == sender]:
+                    self.remove(txid)
+                    removed.append(txid)
+        return removed
+
+    def template(self, max_txs, max_bytes=None):
+        """The first 'max_txs' transactions in arrival order (and at most
+        'max_bytes' of them). Costs O(k), not O(mempool size)."""
+        batch = []
+        total = 0
+        for tx, size in self.entries.values():
+            if len(batch) >= max_txs:
+                break
+            if max_bytes is not None and total + size > max_bytes:
+                break
+            batch.append(tx)
+            total += size
+        return batch
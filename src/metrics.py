@@ -0,0 +1,238 @@
+"""
+Metrics
+Counters, gauges and histograms for the node and miner hot paths, readable
+as a dict (get_metrics protocol message) or in the Prometheus text format
+(optional HTTP endpoint).
+
+    with timed("phn_validate_block_seconds", stage="header"):
+        ...
+
+    @timed("phn_verify_signature_seconds")
+    def verify_signature(tx): ...
+
+When disabled, timed() hands back a shared no-op context and decorated
+functions pay for one flag check.
+"""
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)  # Seconds
+
+_enabled = METRICS_ENABLED
+_families = {}  # name -> {"type", "help", "series": {label items: metric}}
+_registry_lock = threading.Lock()
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if _enabled:
+            with self._lock:
+                self.value += amount
+
+    def sample(self):
+        return {"value": self.value}
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        if _enabled:
+            self.value = value
+
+    def sample(self):
+        return {"value": self.value}
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)  # Per bucket, not cumulative
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if not _enabled:
+            return
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def sample(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+def _get(kind, cls, name, help_text, labels, *args):
+    key = tuple(sorted(labels.items()))
+    family = _families.get(name)
+    if family is not None:
+        metric = family["series"].get(key)
+        if metric is not None:
+            return metric
+    with _registry_lock:
+        family = _families.setdefault(name, {"type": kind, "help": help_text, "series": {}})
+        if family["type"] != kind:
+            raise ValueError(f"Metric {name} is a {family['type']}, not a {kind}")
+        if help_text and not family["help"]:
+            family["help"] = help_text
+        return family["series"].setdefault(key, cls(*args))
+
+
+def counter(name, help_text="", **labels):
+    return _get("counter", Counter, name, help_text, labels)
+
+
+def gauge(name, help_text="", **labels):
+    return _get("gauge", Gauge, name, help_text, labels)
+
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+    return _get("histogram", Histogram, name, help_text, labels, buckets)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metric):
+        self.metric = metric
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.start)
+        return False
+
+
+class timed:
+    """Record the duration of a block of code or of every call to a function
+    in the histogram 'name' (with optional labels)."""
+
+    def __init__(self, name, help_text="", **labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._timer = None
+
+    def __enter__(self):
+        if not _enabled:
+            self._timer = _NULL_TIMER
+        else:
+            self._timer = _Timer(histogram(self.name, self.help_text, **self.labels))
+        return self._timer.__enter__()
+
+    def __exit__(self, *exc):
+        return self._timer.__exit__(*exc)
+
+    def __call__(self, func):
+        metric = histogram(self.name, self.help_text, **self.labels)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+        return wrapper
+
+
+def snapshot():
+    """All metrics as plain data, for the get_metrics protocol message."""
+    result = {}
+    for name, family in list(_families.items()):
+        series = []
+        for key, metric in list(family["series"].items()):
+            series.append({"labels": dict(key), **metric.sample()})
+        result[name] = {"type": family["type"], "help": family["help"], "series": series}
+    return result
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, family in snapshot().items():
+        if family["help"]:
+            lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for series in family["series"]:
+            labels = series["labels"]
+            if family["type"] == "histogram":
+                for bound, count in series["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {series['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {series['value']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_prometheus(port, host="0.0.0.0"):
+    """Serve /metrics on a background thread. Returns the HTTP server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="phn-metrics", daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{port}/metrics")
+    return server
@@ -1,38 +1,115 @@
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from .genesis import hash_block
-from .transactions import validate_transaction
-from config import DIFFICULTY, BLOCK_REWARD, OWNER_ALLOCATION
-from wallet import get_display_address
+from .transactions import check_transaction_fields, check_coinbase_fields, verify_signatures, is_finite_number
+from .ledger import LedgerState
+from .header import HEADER_VERSION, HEADER_V2_FIELDS, merkle_root
+from .compact import CompactTransactions, TransactionView
+from config import DIFFICULTY, BLOCK_REWARD, OWNER_ALLOCATION, HEADER_V2_HEIGHT, MAX_BLOCK_TXS, CHECKPOINTS
+from .crypto import get_display_address
+from .metrics import counter, timed
+from .difficulty import LEGACY_TARGET, hash_meets_target, target_at, target_to_hex, header_difficulty, check_timestamp
 
-def validate_block(block, blockchain, owner_address):
+VERIFY_RANGE_SIZE = 128  # Blocks per stateless verification task in verify_chain
+STAGE_METRIC = "phn_validate_block_stage_seconds"
+STAGE_HELP = "Time spent in each validate_block stage"
+
+def check_block_header(block, target=LEGACY_TARGET, difficulty=DIFFICULTY):
+    """Stateless header checks: fields, size, version, hash and proof of work
+    against 'target', with 'difficulty' in a v2 header's difficulty field
+    (see src.difficulty.target_at and header_difficulty for a block's values)."""
     required_fields = ["index", "timestamp", "transactions", "prev_hash", "nonce", "hash"]
     for field in required_fields:
         if field not in block:
             return False, f"Block missing field: {field}"
 
-    if hash_block(block) != block["hash"]:
-        return False, "Invalid block hash"
+    if not isinstance(block["index"], int) or not isinstance(block["nonce"], int):
+        return False, "Block index and nonce must be integers"
+    if not isinstance(block["prev_hash"], str) or not isinstance(block["hash"], str):
+        return False, "Block hashes must be strings"
+    # Compact blocks (src.compact) carry their transactions as read-only views
+    transactions = block["transactions"]
+    if not isinstance(transactions, (list, CompactTransactions)) or not all(isinstance(tx, (dict, TransactionView)) for tx in transactions):
+        return False, "Block transactions must be a list of transactions"
+
+    # Retargeting does arithmetic on timestamps of accepted blocks
+    if not is_finite_number(block["timestamp"]):
+        return False, "Invalid block timestamp"
+
+    if len(block["transactions"]) > MAX_BLOCK_TXS:
+        return False, f"Too many transactions in block, max {MAX_BLOCK_TXS}"
+
+    version = block.get("version", 1)
+    header_v2_active = HEADER_V2_HEIGHT is not None and block["index"] >= HEADER_V2_HEIGHT
+    if version != (HEADER_VERSION if header_v2_active else 1):
+        return False, f"Invalid block version {version} at height {block['index']}"
 
-    if not block["hash"].startswith("0" * DIFFICULTY):
-        return False, f"Invalid proof of work, must start with {DIFFICULTY} zeros"
+    if version == HEADER_VERSION:
+        for field in HEADER_V2_FIELDS:
+            if field not in block:
+                return False, f"Block missing field: {field}"
+        if block["difficulty"] != difficulty:
+            return False, f"Invalid block difficulty, expected {difficulty}"
+
+    valid, msg = check_block_hash(block)
+    if not valid:
+        return False, msg
+
+    if not hash_meets_target(block["hash"], target):
+        return False, f"Invalid proof of work, hash must be <= target {target_to_hex(target)}"
+
+    return True, "Block header valid"
+
+def check_block_hash(block):
+    """Stateless: the stored hash (and a v2 header's Merkle root) matches the block's contents."""
+    if block.get("version", 1) == HEADER_VERSION and block.get("merkle_root") != merkle_root(block["transactions"]):
+        return False, "Invalid Merkle root"
+    try:
+        block_hash = hash_block(block)
+    except (ValueError, TypeError, OverflowError, struct.error) as e:
+        return False, f"Malformed block header: {e}"
+    if block_hash != block["hash"]:
+        return False, "Invalid block hash"
+    return True, "Block hash valid"
 
-    if block["index"] != len(blockchain):
-        return False, f"Invalid block index. Expected {len(blockchain)}, got {block['index']}"
+def check_block_linkage(block, height, prev_hash):
+    """Stateful: the block extends a chain of 'height' blocks whose tip hash is 'prev_hash'."""
+    if block["index"] != height:
+        return False, f"Invalid block index. Expected {height}, got {block['index']}"
 
-    if block["index"] > 0 and block["prev_hash"] != blockchain[-1]["hash"]:
+    if block["index"] > 0 and block["prev_hash"] != prev_hash:
         return False, "Invalid previous hash"
 
+    return True, "Block linkage valid"
+
+def check_block_transactions(block, owner_address, parallel=True, check_signatures=True):
+    """Stateless transaction checks: txids, coinbase rules, fields and (unless
+    check_signatures is False) signatures. Everything the ledger reads from a
+    transaction is checked here, so a block that passes can be applied."""
     coinbase_tx_count = 0
     block_reward_sum = 0
     seen_txids = set()
+    if check_signatures:
+        signatures_ok = verify_signatures(block["transactions"], parallel)
+    else:
+        signatures_ok = [True] * len(block["transactions"])
 
-    for tx in block["transactions"]:
+    for tx, signature_ok in zip(block["transactions"], signatures_ok):
         if "txid" not in tx:
             return False, "Transaction missing txid"
+        if not isinstance(tx["txid"], str):
+            return False, "Transaction txid must be a string"
         if tx["txid"] in seen_txids:
             return False, "Duplicate txid in block"
         seen_txids.add(tx["txid"])
 
-        if tx["sender"] == "coinbase":
+        if tx.get("sender") == "coinbase":
+            valid, msg = check_coinbase_fields(tx)
+            if not valid:
+                return False, f"Invalid coinbase transaction: {msg}"
             coinbase_tx_count += 1
             block_reward_sum += tx["amount"]
             if block["index"] == 0:
@@ -44,7 +121,9 @@ def validate_block(block, blockchain, owner_address):
             if coinbase_tx_count > 1:
                 return False, "Multiple coinbase txs in block"
         else:
-            valid, msg = validate_transaction(tx, blockchain)
+            valid, msg = check_transaction_fields(tx)
+            if valid and not signature_ok:
+                valid, msg = False, "Invalid signature"
             if not valid:
                 return False, f"Invalid transaction in block: {msg}"
 
@@ -55,4 +134,167 @@ def validate_block(block, blockchain, owner_address):
     if block_reward_sum != expected_reward:
         return False, "Block reward sum mismatch"
 
+    return True, "Block transactions valid"
+
+def check_block_balances(block, ledger):
+    """Stateful: every sender can cover their spends, including earlier spends in the same block."""
+    spent = {}
+    for tx in block["transactions"]:
+        if tx["sender"] == "coinbase":
+            continue
+        if ledger.get_balance(tx["sender"]) - spent.get(tx["sender"], 0) < tx["amount"]:
+            return False, "Invalid transaction in block: Insufficient balance"
+        spent[tx["sender"]] = spent.get(tx["sender"], 0) + tx["amount"]
+    return True, "Block balances valid"
+
+def check_confirmed_txids(block, confirmed_txids):
+    """Stateful: no txid in the block was already confirmed in an earlier block."""
+    for tx in block["transactions"]:
+        if tx.get("txid") in confirmed_txids:
+            return False, "Duplicate txid already confirmed in an earlier block"
+    return True, "No replayed txids"
+
+def validate_block(block, blockchain, owner_address, ledger=None, txindex=None):
+    """Validate 'block' as the next block of 'blockchain'. Pass the node's
+    LedgerState and TxIndex to avoid rebuilding state from the chain; without
+    a txindex, txids replayed from earlier blocks are not detected."""
+    with timed("phn_validate_block_seconds", "Time to validate a block"):
+        valid, msg = _validate_block_stages(block, blockchain, owner_address, ledger, txindex)
+    counter("phn_blocks_validated_total", "Blocks validated", result="valid" if valid else "invalid").inc()
+    return valid, msg
+
+def _validate_block_stages(block, blockchain, owner_address, ledger, txindex):
+    with timed(STAGE_METRIC, STAGE_HELP, stage="header"):
+        height = len(blockchain)
+        target = target_at(blockchain, height)
+        valid, msg = check_block_header(block, target, header_difficulty(height, target))
+        if valid:
+            valid, msg = check_timestamp(blockchain, height, block["timestamp"], now=time.time())
+    if not valid:
+        return False, msg
+
+    prev_hash = blockchain[-1]["hash"] if len(blockchain) > 0 else None
+    valid, msg = check_block_linkage(block, len(blockchain), prev_hash)
+    if not valid:
+        return False, msg
+
+    if txindex is not None:
+        with timed(STAGE_METRIC, STAGE_HELP, stage="txindex"):
+            valid, msg = check_confirmed_txids(block, txindex)
+        if not valid:
+            return False, msg
+
+    if ledger is None:
+        with timed(STAGE_METRIC, STAGE_HELP, stage="ledger"):
+            ledger = LedgerState.from_chain(blockchain)
+    elif ledger.height != len(blockchain):
+        return False, f"Ledger state at height {ledger.height} does not match chain length {len(blockchain)}"
+
+    with timed(STAGE_METRIC, STAGE_HELP, stage="transactions"):
+        valid, msg = check_block_transactions(block, owner_address)
+    if not valid:
+        return False, msg
+
+    with timed(STAGE_METRIC, STAGE_HELP, stage="balances"):
+        valid, msg = check_block_balances(block, ledger)
+    if not valid:
+        return False, msg
+
     return True, "Block valid"
+
+def _verify_range_stateless(blocks, owner_address, targets):
+    """Pool worker: stateless checks over a range of blocks, each against its
+    (target, header difficulty). Returns (position, message) of the first failure or None."""
+    for position, (block, (target, difficulty)) in enumerate(zip(blocks, targets)):
+        valid, msg = check_block_header(block, target, difficulty)
+        if valid:
+            valid, msg = check_block_transactions(block, owner_address, parallel=False)
+        if not valid:
+            return position, msg
+    return None
+
+def verify_chain(blockchain, owner_address, checkpoints=None, workers=None):
+    """Verify a whole loaded chain and build its ledger state.
+
+    Stateless checks (fields, hash recomputation, proof of work, signatures) run
+    in parallel over block ranges; index/prev_hash linkage and balances are
+    applied in one sequential pass. Blocks up to the highest trusted checkpoint
+    height skip proof of work and signatures but still get their hashes
+    recomputed and their transaction fields and coinbase rules checked, so a
+    checkpoint pins the contents of every block below it; the genesis block,
+    which is not mined, is always trusted that way.
+    Returns (valid, message, ledger) where the ledger covers the valid prefix."""
+    checkpoints = CHECKPOINTS if checkpoints is None else checkpoints
+    workers = workers or os.cpu_count() or 1
+    length = len(blockchain)
+    trusted_height = min(max(checkpoints) + 1 if checkpoints else 1, length)
+    ledger = LedgerState()
+    prev_hash = None
+    confirmed_txids = set()
+
+    for height in range(trusted_height):
+        block = blockchain[height]
+        valid, msg = check_block_linkage(block, height, prev_hash)
+        if valid:
+            valid, msg = check_block_hash(block)
+        if valid and height in checkpoints and block["hash"] != checkpoints[height]:
+            valid, msg = False, "Block hash does not match checkpoint"
+        if valid:
+            # Signatures are pinned by the hash, but the ledger still has to be able to apply the block
+            valid, msg = check_block_transactions(block, owner_address, parallel=False, check_signatures=False)
+        if not valid:
+            return False, f"Block #{height}: {msg}", ledger
+        ledger.apply_block(block)
+        confirmed_txids.update(tx["txid"] for tx in block["transactions"])
+        prev_hash = block["hash"]
+
+    ranges = deque((start, min(start + VERIFY_RANGE_SIZE, length)) for start in range(trusted_height, length, VERIFY_RANGE_SIZE))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(ranges) > 1 else None
+    in_flight = deque()
+
+    def submit_next():
+        start, end = ranges.popleft()
+        blocks = blockchain[start:end]
+        targets = []
+        for height in range(start, end):
+            try:
+                target = target_at(blockchain, height)
+                targets.append((target, header_difficulty(height, target)))
+            except (TypeError, ValueError, KeyError):
+                # Targets come from earlier timestamps; the malformed block they came from fails first
+                targets.append((0, None))
+        if pool is not None:
+            in_flight.append((blocks, pool.submit(_verify_range_stateless, blocks, owner_address, targets)))
+        else:
+            in_flight.append((blocks, targets))
+
+    try:
+        while ranges or in_flight:
+            # Keep a bounded window of ranges in flight so memory doesn't grow with the chain
+            while ranges and len(in_flight) < 2 * workers:
+                submit_next()
+            blocks, work = in_flight.popleft()
+            if pool is not None:
+                failure = work.result()
+            else:
+                failure = _verify_range_stateless(blocks, owner_address, work)
+            for position, block in enumerate(blocks):
+                if failure is not None and position == failure[0]:
+                    return False, f"Block #{ledger.height}: {failure[1]}", ledger
+                valid, msg = check_block_linkage(block, ledger.height, prev_hash)
+                if valid:
+                    valid, msg = check_timestamp(blockchain, ledger.height, block["timestamp"])
+                if valid:
+                    valid, msg = check_confirmed_txids(block, confirmed_txids)
+                if valid:
+                    valid, msg = check_block_balances(block, ledger)
+                if not valid:
+                    return False, f"Block #{ledger.height}: {msg}", ledger
+                ledger.apply_block(block)
+                confirmed_txids.update(tx["txid"] for tx in block["transactions"])
+                prev_hash = block["hash"]
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return True, f"Chain valid ({length} blocks)", ledger
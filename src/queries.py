@@ -0,0 +1,72 @@
+"""
+Batch Queries
+Handlers for node requests that answer many addresses or txids in one round trip.
+"""
+from .transactions import get_balance
+
+MAX_BATCH_SIZE = 1000  # Addresses or txids accepted per request
+MAX_HISTORY_PAGE = 500  # Transactions per get_address_history page
+
+
+def get_balances(addresses, blockchain, ledger=None):
+    """Balances for a list of addresses. With a ledger every lookup is O(1);
+    without one the chain is scanned once for the whole batch."""
+    if ledger is not None:
+        return {address: get_balance(address, blockchain, ledger) for address in addresses}
+    balances = {address: 0 for address in addresses}
+    for block in blockchain:
+        for tx in block["transactions"]:
+            if tx["sender"] in balances:
+                balances[tx["sender"]] -= tx["amount"]
+            if tx["recipient"] in balances:
+                balances[tx["recipient"]] += tx["amount"]
+    return balances
+
+
+def get_tx_status(txids, blockchain, pending_txids, txindex=None):
+    """Status of a list of txids: confirmed (with height and confirmations),
+    pending, or unknown. With a txindex each lookup is O(1); without one the
+    chain is scanned once for the whole batch."""
+    statuses = {}
+    for txid in txids:
+        statuses[txid] = {"status": "pending" if txid in pending_txids else "unknown"}
+    length = len(blockchain)
+    if txindex is not None:
+        for txid in txids:
+            found = txindex.lookup(txid)
+            if found is not None:
+                statuses[txid] = {"status": "confirmed", "height": found[0], "confirmations": length - found[0]}
+        return statuses
+    remaining = set(txids)
+    for height in range(length - 1, -1, -1):
+        if not remaining:
+            break
+        for tx in blockchain[height]["transactions"]:
+            txid = tx.get("txid")
+            if txid in remaining:
+                remaining.discard(txid)
+                statuses[txid] = {"status": "confirmed", "height": height, "confirmations": length - height}
+    return statuses
+
+
+def get_tx(txid, blockchain, txindex):
+    """A confirmed transaction with its location, or None."""
+    found = txindex.lookup(txid)
+    if found is None:
+        return None
+    height, position = found
+    return {
+        "tx": blockchain[height]["transactions"][position],
+        "height": height,
+        "position": position,
+        "confirmations": len(blockchain) - height,
+    }
+
+
+def get_address_history(address, blockchain, txindex, offset=0, limit=50):
+    """One page of an address's transactions, newest first."""
+    total, refs = txindex.address_history(address, offset, limit)
+    history = []
+    for height, position in refs:
+        history.append({"tx": blockchain[height]["transactions"][position], "height": height, "position": position})
+    return {"address": address, "total": total, "offset": offset, "limit": limit, "history": history}
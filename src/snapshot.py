@@ -0,0 +1,194 @@
+"""
+Ledger Snapshots
+Periodic binary snapshots of the ledger state at a given height, so a
+restarted node only replays the blocks after the latest snapshot.
+
+File layout: magic, format version, height, tip block hash, entry count,
+then one entry per address (address, balance, nonce, last seen height),
+followed by a SHA-256 of everything before it.
+
+Usage: python -m src.snapshot create|verify|prune [--keep N] [--deep]
+"""
+import argparse
+import hashlib
+import os
+import struct
+from .ledger import LedgerState
+from config import SNAPSHOT_DIR, SNAPSHOT_KEEP
+
+MAGIC = b"PHNS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI32sI")  # magic, version, height, tip hash, entry count
+BALANCE_INT = 0
+BALANCE_FLOAT = 1
+
+
+def _snapshot_name(height):
+    return f"ledger-{height:010d}.snap"
+
+
+def encode_snapshot(ledger, tip_hash):
+    addresses = sorted(set(ledger.balances) | set(ledger.nonces) | set(ledger.last_seen))
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, ledger.height, bytes.fromhex(tip_hash), len(addresses))]
+    for address in addresses:
+        raw = address.encode()
+        balance = ledger.balances.get(address, 0)
+        last_seen = ledger.last_seen.get(address)
+        parts.append(struct.pack("<H", len(raw)) + raw)
+        if isinstance(balance, int):
+            parts.append(struct.pack("<Bq", BALANCE_INT, balance))
+        else:
+            parts.append(struct.pack("<Bd", BALANCE_FLOAT, balance))
+        parts.append(struct.pack("<Ii", ledger.nonces.get(address, 0), -1 if last_seen is None else last_seen))
+    body = b"".join(parts)
+    return body + hashlib.sha256(body).digest()
+
+
+def decode_snapshot(data):
+    """Returns (ledger, tip_hash). Raises ValueError if the file is corrupt."""
+    if len(data) < HEADER.size + 32 or hashlib.sha256(data[:-32]).digest() != data[-32:]:
+        raise ValueError("Snapshot checksum mismatch")
+    magic, version, height, tip_hash, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {magic!r} v{version}")
+    ledger = LedgerState()
+    ledger.height = height
+    pos = HEADER.size
+    for _ in range(count):
+        (length,) = struct.unpack_from("<H", data, pos)
+        address = data[pos + 2:pos + 2 + length].decode()
+        pos += 2 + length
+        kind = data[pos]
+        balance = struct.unpack_from("<q" if kind == BALANCE_INT else "<d", data, pos + 1)[0]
+        nonce, last_seen = struct.unpack_from("<Ii", data, pos + 9)
+        pos += 17
+        if balance:
+            ledger.balances[address] = balance
+        if nonce:
+            ledger.nonces[address] = nonce
+        if last_seen >= 0:
+            ledger.last_seen[address] = last_seen
+    if pos != len(data) - 32:
+        raise ValueError("Snapshot has trailing data")
+    return ledger, tip_hash.hex()
+
+
+def write_snapshot(ledger, tip_hash, directory=SNAPSHOT_DIR):
+    """Write atomically (temp file, fsync, rename). Returns the path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _snapshot_name(ledger.height))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_snapshot(ledger, tip_hash))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        return decode_snapshot(f.read())
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """[(height, path)] oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.startswith("ledger-") and name.endswith(".snap"):
+            snapshots.append((int(name[7:-5]), os.path.join(directory, name)))
+    return sorted(snapshots)
+
+
+def prune_snapshots(directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """Delete all but the newest 'keep' snapshots. Returns the removed paths."""
+    snapshots = list_snapshots(directory)
+    removed = [path for _, path in snapshots[:-keep]] if keep > 0 else [path for _, path in snapshots]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def _matches_chain(ledger, tip_hash, blockchain):
+    return 0 < ledger.height <= len(blockchain) and blockchain[ledger.height - 1]["hash"] == tip_hash
+
+
+def load_latest_snapshot(blockchain, directory=SNAPSHOT_DIR):
+    """The newest snapshot that is intact and on 'blockchain', or None."""
+    for height, path in reversed(list_snapshots(directory)):
+        try:
+            ledger, tip_hash = read_snapshot(path)
+        except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+            print(f"Skipping unreadable snapshot {path}: {e}")
+            continue
+        if _matches_chain(ledger, tip_hash, blockchain):
+            return ledger
+        print(f"Skipping snapshot {path}: not on the current chain")
+    return None
+
+
+def restore_ledger(blockchain, directory=SNAPSHOT_DIR):
+    """Ledger state for 'blockchain': latest valid snapshot plus the blocks after it."""
+    ledger = load_latest_snapshot(blockchain, directory)
+    if ledger is None:
+        ledger = LedgerState()
+    else:
+        print(f"Loaded ledger snapshot at height {ledger.height}")
+    for height in range(ledger.height, len(blockchain)):
+        ledger.apply_block(blockchain[height])
+    return ledger
+
+
+def verify_snapshot(path, blockchain, deep=False):
+    """(ok, message) for one snapshot file: intact, on 'blockchain' and, with
+    deep=True, equal to a replay of the chain up to its height."""
+    try:
+        ledger, tip_hash = read_snapshot(path)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+        return False, str(e)
+    if not _matches_chain(ledger, tip_hash, blockchain):
+        return False, f"tip {tip_hash[:16]}... is not on the current chain"
+    if deep:
+        replayed = LedgerState.from_chain(blockchain[h] for h in range(ledger.height))
+        if (replayed.balances, replayed.nonces, replayed.last_seen) != (ledger.balances, ledger.nonces, ledger.last_seen):
+            return False, "state differs from a replay of the chain"
+    return True, f"height {ledger.height}, {len(ledger.balances)} balances"
+
+
+def main():
+    from .genesis import load_blockchain
+
+    parser = argparse.ArgumentParser(description="Create, verify and prune ledger snapshots")
+    parser.add_argument("command", choices=["create", "verify", "prune"])
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP, help="Snapshots to keep when pruning")
+    parser.add_argument("--deep", action="store_true", help="verify: also compare each snapshot against a replay of the chain")
+    args = parser.parse_args()
+
+    if args.command == "prune":
+        for path in prune_snapshots(args.dir, args.keep):
+            print(f"Removed {path}")
+        return
+
+    blockchain = load_blockchain(lazy=True)
+    if args.command == "create":
+        if len(blockchain) == 0:
+            raise SystemExit("❌ No chain to snapshot")
+        ledger = restore_ledger(blockchain, args.dir)
+        path = write_snapshot(ledger, blockchain[-1]["hash"], args.dir)
+        print(f"✅ Snapshot at height {ledger.height} written to {path}")
+        return
+
+    failed = False
+    for height, path in list_snapshots(args.dir):
+        ok, message = verify_snapshot(path, blockchain, args.deep)
+        print(f"{'✅' if ok else '❌'} {path}: {message}")
+        failed |= not ok
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
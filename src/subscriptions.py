@@ -0,0 +1,76 @@
+"""
+Subscriptions
+Push-based notifications for the node protocol. Clients send
+{"type": "subscribe", "topics": ["tip", "mempool"]} and then receive
+"new_tip" messages with the header of each new chain tip and "mempool_delta"
+messages with transactions added to / removed from the pending pool, instead
+of polling get_blockchain / get_pending. Tip pushes also carry the proof of
+work target and header difficulty for the next block.
+"""
+import asyncio
+import json
+
+TOPICS = ("tip", "mempool")
+SUBSCRIBER_QUEUE_SIZE = 256  # Undelivered pushes before a subscriber is dropped as too slow
+TIP_HEADER_FIELDS = ("index", "hash", "prev_hash", "timestamp", "nonce", "version", "difficulty", "merkle_root")
+
+
+def tip_header(block):
+    return {field: block[field] for field in TIP_HEADER_FIELDS if field in block}
+
+
+class _Subscriber:
+    def __init__(self, ws, topics):
+        self.ws = ws
+        self.topics = set(topics)
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.task = asyncio.create_task(self._deliver())
+
+    async def _deliver(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.ws.send(message)
+        except Exception:
+            pass
+
+
+class SubscriptionHub:
+    def __init__(self):
+        self.subscribers = {}
+
+    def subscribe(self, ws, topics):
+        """Register 'ws' for the given topics. Returns the accepted topics."""
+        topics = [topic for topic in topics if topic in TOPICS]
+        existing = self.subscribers.get(ws)
+        if existing is not None:
+            existing.topics.update(topics)
+        else:
+            self.subscribers[ws] = _Subscriber(ws, topics)
+        return sorted(self.subscribers[ws].topics)
+
+    def unsubscribe(self, ws):
+        subscriber = self.subscribers.pop(ws, None)
+        if subscriber is not None:
+            subscriber.task.cancel()
+
+    def _publish(self, topic, payload):
+        message = json.dumps(payload)
+        for ws, subscriber in list(self.subscribers.items()):
+            if topic not in subscriber.topics:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A subscriber that can't keep up would otherwise hold every push in memory
+                print("Dropping slow subscriber")
+                self.unsubscribe(ws)
+                asyncio.create_task(ws.close(code=1013, reason="subscriber too slow"))
+
+    def publish_tip(self, block, work=None):
+        """'work' ({"target", "difficulty"}) is what the next block has to meet."""
+        self._publish("tip", {"type": "new_tip", "tip": tip_header(block), "length": block["index"] + 1, **(work or {})})
+
+    def publish_mempool(self, added=(), removed=()):
+        if added or removed:
+            self._publish("mempool", {"type": "mempool_delta", "added": list(added), "removed": list(removed)})
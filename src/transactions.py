@@ -1,12 +1,28 @@
+import math
+import os
 import time
-from ecdsa import VerifyingKey, SECP256k1, BadSignatureError
-from wallet import get_display_address
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from . import crypto
+from .crypto import get_display_address
+from .directory import is_canonical_address
+from .metrics import counter, timed
 import hashlib
 
+VERIFIED_TX_CACHE_SIZE = 100000  # Transactions whose signature already checked out
+PARALLEL_VERIFY_MIN = 32  # Fewer unverified signatures than this are checked in-process
+VERIFY_CHUNK_SIZE = 64  # Signatures per task sent to a pool worker
+
+_verified_txs = OrderedDict()
+_verify_pool = None
+
 # The blockchain is expected to be passed in or imported to check balances/validation
 # For example, you can import blockchain from genesis.py or pass as parameter
 
-def get_balance(address, blockchain):
+def get_balance(address, blockchain, ledger=None):
+    if ledger is not None:
+        return ledger.get_balance(address)
     balance = 0
     for block in blockchain:
         for tx in block["transactions"]:
@@ -16,33 +32,159 @@ def get_balance(address, blockchain):
                 balance += tx["amount"]
     return balance
 
+def _signed_message(tx):
+    return f"{tx['sender']}{tx['recipient']}{tx['amount']}{tx['timestamp']}".encode()
+
+def _verified_key(tx):
+    # Keyed on the signed content and signature, not the txid alone, since the
+    # txid is supplied by the sender and is not itself checked.
+    return hashlib.sha256(_signed_message(tx) + tx["signature"].encode()).digest()
+
+def _remember_verified(key):
+    _verified_txs[key] = True
+    if len(_verified_txs) > VERIFIED_TX_CACHE_SIZE:
+        _verified_txs.popitem(last=False)
+
+def _check_signature(sender_hex, signature_hex, message):
+    """Verify one signature. Returns None on success or the error message."""
+    try:
+        if crypto.verify(sender_hex, signature_hex, message):
+            return None
+        return "Signature verification failed"
+    except Exception as e:
+        return str(e) or type(e).__name__
+
+def _verify_chunk(items):
+    """Pool worker: verify a list of (sender, signature, message) tuples."""
+    return [_check_signature(*item) for item in items]
+
+def _get_verify_pool():
+    global _verify_pool
+    if _verify_pool is None:
+        _verify_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _verify_pool
+
+def shutdown_verify_pool():
+    global _verify_pool
+    if _verify_pool is not None:
+        _verify_pool.shutdown()
+        _verify_pool = None
+
+@timed("phn_verify_signature_seconds", "Time to check one transaction signature (cache hits included)")
 def verify_signature(tx):
     if tx["sender"] == "coinbase":
         return True
     try:
-        signature = bytes.fromhex(tx["signature"])
-        sender_vk = VerifyingKey.from_string(bytes.fromhex(tx["sender"]), curve=SECP256k1)
-        message = f"{tx['sender']}{tx['recipient']}{tx['amount']}{tx['timestamp']}".encode()
-        return sender_vk.verify(signature, message)
-    except (BadSignatureError, Exception) as e:
-        print(f"Signature verification failed for TX {tx.get('txid', 'N/A')}: {e}")
+        key = _verified_key(tx)
+        if key in _verified_txs:
+            _verified_txs.move_to_end(key)
+            return True
+        error = _check_signature(tx["sender"], tx["signature"], _signed_message(tx))
+    except Exception as e:
+        error = str(e)
+    if error is not None:
+        print(f"Signature verification failed for TX {tx.get('txid', 'N/A')}: {error}")
         return False
+    _remember_verified(key)
+    return True
 
-def validate_transaction(tx, blockchain):
+@timed("phn_verify_signatures_seconds", "Time to check a batch of signatures")
+def verify_signatures(txs, parallel=True):
+    """Verify the signatures of many transactions at once.
+    Transactions already verified (e.g. on mempool entry) are skipped, and the
+    rest are fanned out to a process pool when there are enough of them.
+    Returns a list of booleans in the same order as 'txs'."""
+    results = [True] * len(txs)
+    pending = []  # (position, cache key, (sender, signature, message))
+    cached = 0
+    for i, tx in enumerate(txs):
+        if tx.get("sender") == "coinbase":
+            continue
+        try:
+            key = _verified_key(tx)
+        except Exception as e:
+            print(f"Signature verification failed for TX {tx.get('txid', 'N/A')}: {e}")
+            results[i] = False
+            continue
+        if key in _verified_txs:
+            _verified_txs.move_to_end(key)
+            cached += 1
+            continue
+        pending.append((i, key, (tx["sender"], tx["signature"], _signed_message(tx))))
+
+    items = [item for _, _, item in pending]
+    counter("phn_signatures_cached_total", "Signatures skipped because they were already verified").inc(cached)
+    counter("phn_signatures_checked_total", "Signatures checked in verify_signatures").inc(len(items))
+    errors = None
+    if parallel and len(items) >= PARALLEL_VERIFY_MIN and (os.cpu_count() or 1) > 1:
+        chunks = [items[i:i + VERIFY_CHUNK_SIZE] for i in range(0, len(items), VERIFY_CHUNK_SIZE)]
+        try:
+            errors = [error for chunk in _get_verify_pool().map(_verify_chunk, chunks) for error in chunk]
+        except BrokenProcessPool as e:
+            print(f"Signature pool failed ({e}), verifying serially")
+            shutdown_verify_pool()
+    if errors is None:
+        errors = _verify_chunk(items)
+
+    for (i, key, _), error in zip(pending, errors):
+        if error is None:
+            _remember_verified(key)
+        else:
+            print(f"Signature verification failed for TX {txs[i].get('txid', 'N/A')}: {error}")
+            results[i] = False
+    return results
+
+def is_finite_number(value):
+    """An int or float that isn't a bool, NaN or infinite (JSON lets all of those through)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def check_transaction_fields(tx):
+    """Stateless checks: required fields present, finite numbers and a positive amount."""
     required_fields = ["sender", "recipient", "amount", "timestamp", "signature"]
     for field in required_fields:
         if field not in tx:
             return False, f"Missing field: {field}"
 
+    for field in ("sender", "recipient", "signature"):
+        if not isinstance(tx[field], str):
+            return False, f"'{field}' must be a string"
+
+    # NaN compares False both ways, so it would pass every balance check below
+    if not is_finite_number(tx["amount"]):
+        return False, "Amount must be a finite number"
+    if not is_finite_number(tx["timestamp"]):
+        return False, "Timestamp must be a finite number"
+
     if tx["amount"] <= 0:
         return False, "Amount must be positive"
 
+    return True, "Valid transaction fields"
+
+def check_coinbase_fields(tx):
+    """Stateless checks for a coinbase: the same fields as any transaction, paid to a canonical address."""
+    valid, msg = check_transaction_fields(tx)
+    if not valid:
+        return False, msg
+    if not is_canonical_address(tx["recipient"]):
+        return False, "Coinbase recipient must be a canonical address"
+    return True, "Valid coinbase fields"
+
+def validate_transaction(tx, blockchain, ledger=None, spent=None, check_signature=True):
+    """Validate a single transaction.
+    'spent' maps senders to amounts already spent earlier in the same block.
+    Pass check_signature=False when the signature was already batch-verified."""
+    valid, msg = check_transaction_fields(tx)
+    if not valid:
+        return False, msg
+
     if tx["sender"] != "coinbase":
-        sender_balance = get_balance(tx["sender"], blockchain)
+        sender_balance = get_balance(tx["sender"], blockchain, ledger)
+        if spent:
+            sender_balance -= spent.get(tx["sender"], 0)
         if sender_balance < tx["amount"]:
             return False, "Insufficient balance"
 
-    if not verify_signature(tx):
+    if check_signature and not verify_signature(tx):
         return False, "Invalid signature"
 
     return True, "Valid transaction"
@@ -0,0 +1,96 @@
+"""
+Transaction Index
+On-disk (SQLite) index from txid to (block height, position in block) and
+from address to the transactions that touched it, kept up to date as blocks
+are appended. Backs the get_tx / get_address_history protocol calls and
+lets validate_block reject txids already confirmed in earlier blocks.
+"""
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS txs (
+    txid TEXT PRIMARY KEY,
+    height INTEGER NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS address_txs (
+    address TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (address, height, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS txs_height ON txs (height);
+CREATE INDEX IF NOT EXISTS address_txs_height ON address_txs (height);
+CREATE TABLE IF NOT EXISTS blocks (
+    height INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+
+class TxIndex:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.height = self.db.execute("SELECT COALESCE(MAX(height) + 1, 0) FROM blocks").fetchone()[0]
+
+    def block_hash(self, height):
+        row = self.db.execute("SELECT hash FROM blocks WHERE height = ?", (height,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, txid):
+        return self.db.execute("SELECT 1 FROM txs WHERE txid = ?", (txid,)).fetchone() is not None
+
+    def lookup(self, txid):
+        """(height, position) of a confirmed txid, or None."""
+        return self.db.execute("SELECT height, position FROM txs WHERE txid = ?", (txid,)).fetchone()
+
+    def add_block(self, block):
+        height = block["index"]
+        if height != self.height:
+            raise ValueError(f"Index at height {self.height} can't take block #{height}")
+        with self.db:
+            tx_rows = []
+            address_rows = set()
+            for position, tx in enumerate(block["transactions"]):
+                tx_rows.append((tx["txid"], height, position))
+                for address in (tx["sender"], tx["recipient"]):
+                    if address != "coinbase":
+                        address_rows.add((address, height, position))
+            # OR IGNORE keeps the first occurrence of a txid replayed by an old, unchecked block
+            self.db.executemany("INSERT OR IGNORE INTO txs (txid, height, position) VALUES (?, ?, ?)", tx_rows)
+            self.db.executemany("INSERT INTO address_txs (address, height, position) VALUES (?, ?, ?)", address_rows)
+            self.db.execute("INSERT INTO blocks (height, hash) VALUES (?, ?)", (height, block["hash"]))
+        self.height = height + 1
+
+    def truncate(self, height):
+        """Forget blocks at 'height' and above."""
+        with self.db:
+            for table in ("txs", "address_txs", "blocks"):
+                self.db.execute(f"DELETE FROM {table} WHERE height >= ?", (height,))
+        self.height = min(self.height, height)
+
+    def sync(self, blockchain):
+        """Bring the index in line with 'blockchain', rolling back past a fork if needed."""
+        height = min(self.height, len(blockchain))
+        while height > 0 and self.block_hash(height - 1) != blockchain[height - 1]["hash"]:
+            height -= 1
+        self.truncate(height)
+        for h in range(self.height, len(blockchain)):
+            self.add_block(blockchain[h])
+
+    def address_history(self, address, offset=0, limit=50):
+        """(total, [(height, position)]) for an address, newest first."""
+        total = self.db.execute("SELECT COUNT(*) FROM address_txs WHERE address = ?", (address,)).fetchone()[0]
+        rows = self.db.execute(
+            "SELECT height, position FROM address_txs WHERE address = ? "
+            "ORDER BY height DESC, position DESC LIMIT ? OFFSET ?",
+            (address, limit, offset),
+        ).fetchall()
+        return total, rows
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,61 @@
+"""Helpers for tests that need a real chain: keys, signed transactions and mined blocks."""
+import hashlib
+import itertools
+
+from blockchain_client import make_transaction, signing_message
+from config import BLOCK_REWARD
+from src import crypto
+from src.difficulty import LEGACY_TARGET, hash_meets_target
+from src.genesis import create_genesis_block, hash_block
+
+_txids = itertools.count()
+
+
+def make_wallet():
+    """(private key hex, canonical address)"""
+    return crypto.generate_keypair()
+
+
+def signed_tx(private_key, sender, recipient, amount, timestamp=1700000000.0):
+    signature = crypto.sign(private_key, signing_message(sender, recipient, amount, timestamp))
+    return make_transaction(sender, recipient, amount, timestamp, signature)
+
+
+def coinbase_tx(recipient, amount=BLOCK_REWARD):
+    return {
+        "sender": "coinbase",
+        "recipient": recipient,
+        "amount": amount,
+        "timestamp": 1700000000.0,
+        "txid": hashlib.sha256(f"coinbase_{next(_txids)}".encode()).hexdigest(),
+        "signature": "coinbase_signature",
+    }
+
+
+def mine(block, target=LEGACY_TARGET):
+    """Set a nonce (and hash) meeting 'target'. Returns the block."""
+    block.pop("hash", None)
+    for nonce in itertools.count():
+        block["nonce"] = nonce
+        block_hash = hash_block(block)
+        if hash_meets_target(block_hash, target):
+            block["hash"] = block_hash
+            return block
+
+
+def next_block(prev, miner_address, txs=(), coinbase=None):
+    """A mined block on top of 'prev' paying 'miner_address'."""
+    return mine({
+        "index": prev["index"] + 1,
+        "timestamp": prev["timestamp"] + 60,
+        "transactions": [coinbase or coinbase_tx(miner_address)] + list(txs),
+        "prev_hash": prev["hash"],
+    })
+
+
+def make_chain(owner, length, miner_address=None):
+    """Genesis paying 'owner' plus length-1 coinbase-only blocks."""
+    chain = [create_genesis_block(owner)]
+    while len(chain) < length:
+        chain.append(next_block(chain[-1], miner_address or owner))
+    return chain
@@ -0,0 +1,167 @@
+import json
+import os
+
+import pytest
+
+from chainutil import make_chain, make_wallet, next_block
+from src.blockstore import FORMAT_BINARY, FORMAT_JSON, INDEX_ENTRY, INDEX_FILE, BlockStore, _segment_name
+
+
+@pytest.fixture(scope="module")
+def chain():
+    owner = make_wallet()[1]
+    return make_chain(owner, 12)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "blocks")
+
+
+def fill(directory, blocks, **kwargs):
+    store = BlockStore(directory, **kwargs)
+    for block in blocks:
+        store.append(block)
+    store.close()
+
+
+def segment_path(directory, segment):
+    return os.path.join(directory, _segment_name(segment))
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_FILE)
+
+
+def assert_holds(directory, blocks, **kwargs):
+    store = BlockStore(directory, **kwargs)
+    assert len(store) == len(blocks)
+    assert list(store) == blocks
+    store.close()
+
+
+@pytest.mark.parametrize("record_format", [FORMAT_BINARY, FORMAT_JSON])
+def test_round_trip(directory, chain, record_format):
+    fill(directory, chain, record_format=record_format)
+    store = BlockStore(directory)
+    assert store[0] == chain[0] and store[-1] == chain[-1]
+    assert store.read_header(5)["hash"] == chain[5]["hash"]
+    with pytest.raises(ValueError):
+        store.append(chain[3])
+    store.close()
+
+
+def test_mixed_formats_stay_readable(directory, chain):
+    fill(directory, chain[:6], record_format=FORMAT_JSON)
+    store = BlockStore(directory, record_format=FORMAT_BINARY)
+    for block in chain[6:]:
+        store.append(block)
+    store.close()
+    assert_holds(directory, chain)
+
+
+@pytest.mark.parametrize("cut", [1, 10, "header"])
+def test_torn_last_record_is_truncated(directory, chain, cut):
+    fill(directory, chain[:5])
+    path = segment_path(directory, 0)
+    store = BlockStore(directory)
+    last_offset = store.index[4][1]
+    store.close()
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(last_offset + 3 if cut == "header" else size - cut)
+
+    store = BlockStore(directory)
+    assert len(store) == 4
+    assert os.path.getsize(path) == last_offset
+    assert os.path.getsize(index_path(directory)) == 4 * INDEX_ENTRY.size
+    store.append(chain[4])
+    store.append(chain[5])
+    store.close()
+    assert_holds(directory, chain[:6])
+
+
+def test_corrupt_last_record_is_truncated(directory, chain):
+    fill(directory, chain[:5])
+    path = segment_path(directory, 0)
+    with open(path, "r+b") as f:
+        f.seek(-5, os.SEEK_END)
+        f.write(b"\xff" * 5)
+    assert_holds(directory, chain[:4])
+
+
+def test_records_missing_from_index_are_picked_up(directory, chain):
+    # A crash after the record was written but before its index entry was
+    fill(directory, chain[:5])
+    with open(index_path(directory), "r+b") as f:
+        f.truncate(2 * INDEX_ENTRY.size + 5)
+    assert_holds(directory, chain[:5])
+
+
+def test_index_past_the_data_is_dropped(directory, chain):
+    fill(directory, chain[:5])
+    store = BlockStore(directory)
+    offset = store.index[3][1]
+    store.close()
+    with open(segment_path(directory, 0), "r+b") as f:
+        f.truncate(offset)
+    assert_holds(directory, chain[:3])
+
+
+def test_missing_index_is_rebuilt(directory, chain):
+    fill(directory, chain, segment_size=800)
+    os.remove(index_path(directory))
+    assert_holds(directory, chain)
+    assert os.path.getsize(index_path(directory)) == len(chain) * INDEX_ENTRY.size
+
+
+def test_corrupt_index_is_rebuilt(directory, chain):
+    fill(directory, chain, segment_size=800)
+    with open(index_path(directory), "r+b") as f:
+        f.seek(3 * INDEX_ENTRY.size)
+        f.write(INDEX_ENTRY.pack(0, 0))
+    assert_holds(directory, chain)
+
+
+def test_rollover_after_truncate(directory, chain):
+    fill(directory, chain, segment_size=800)
+    store = BlockStore(directory, segment_size=800)
+    segments = sorted({segment for segment, _ in store.index})
+    assert len(segments) > 2
+    height = next(h for h, (segment, _) in enumerate(store.index) if segment == segments[1]) + 1
+    store.truncate(height)
+    assert len(store) == height
+    assert store._segments() == segments[:2]
+
+    # Re-append a fork: it has to fill segment 1 and roll over into fresh segments again
+    fork = chain[:height]
+    while len(fork) < len(chain):
+        fork.append(next_block(fork[-1], make_wallet()[1]))
+    for block in fork[height:]:
+        store.append(block)
+    assert store._segments() == segments
+    assert store[-1] == fork[-1]
+    store.close()
+    assert_holds(directory, fork, segment_size=800)
+
+
+def test_truncate_to_zero(directory, chain):
+    fill(directory, chain[:4])
+    store = BlockStore(directory)
+    store.truncate(0)
+    store.append(chain[0])
+    store.close()
+    assert_holds(directory, chain[:1])
+
+
+def test_migrate_from_json(directory, chain, tmp_path):
+    json_file = str(tmp_path / "blockchain.json")
+    with open(json_file, "w") as f:
+        json.dump(chain, f)
+    store = BlockStore(directory)
+    assert store.migrate_from_json(json_file) == len(chain)
+    assert not os.path.exists(json_file) and os.path.exists(json_file + ".migrated")
+    with pytest.raises(ValueError):
+        store.migrate_from_json(json_file + ".migrated")
+    store.close()
+    assert_holds(directory, chain)
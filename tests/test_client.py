@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import websockets
+
+from blockchain_client import BlockchainClient
+
+
+def run_against(replies, scenario):
+    """Run 'scenario(client, connections)' against a local server answering request number n
+    (per connection) with replies[n](request); a reply of None is not sent."""
+    connections = []
+
+    async def handler(ws):
+        connections.append(ws)
+        count = 0
+        async for raw in ws:
+            request = json.loads(raw)
+            if request.get("type") == "hello":
+                await ws.send(json.dumps({"type": "hello", "encoding": "json"}))
+                continue
+            reply = replies[min(count, len(replies) - 1)](request)
+            count += 1
+            if reply is not None:
+                await ws.send(reply)
+
+    async def main():
+        async with websockets.serve(handler, "localhost", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            client = BlockchainClient(f"ws://localhost:{port}", request_timeout=5, reconnect_attempts=1)
+            try:
+                return await scenario(client, connections)
+            finally:
+                await client.disconnect()
+
+    return asyncio.run(main())
+
+
+def ok(request):
+    return json.dumps({"id": request["id"], "status": "ok"})
+
+
+def test_bad_frame_fails_pending_requests_and_reconnects():
+    async def scenario(client, connections):
+        first = await client.send_request({"type": "ping"})
+        second = await client.send_request({"type": "ping"})
+        # The client closed the connection the garbage came in on
+        await asyncio.wait_for(connections[0].wait_closed(), 2)
+        return first, second, len(connections)
+
+    first, second, connection_count = run_against([ok, lambda request: "not json", ok], scenario)
+    assert first["status"] == "ok"
+    # The retry went out on a new connection
+    assert second["status"] == "ok"
+    assert connection_count == 2
+
+
+def test_non_object_frame_is_a_bad_frame():
+    async def scenario(client, connections):
+        try:
+            await client.send_request({"type": "ping"}, retries=0)
+        except ConnectionError as e:
+            return str(e), client.ws
+        return None, client.ws
+
+    error, ws = run_against([lambda request: "[1, 2]"], scenario)
+    assert error == "Connection to node lost"
+    assert ws is None
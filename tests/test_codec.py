@@ -0,0 +1,75 @@
+import hashlib
+
+import pytest
+
+from src import codec
+from src.genesis import hash_block
+from src.header import HEADER_VERSION, merkle_root
+
+
+def make_tx(sender, recipient, amount, timestamp):
+    return {
+        "sender": sender,
+        "recipient": recipient,
+        "amount": amount,
+        "timestamp": timestamp,
+        "txid": hashlib.sha256(f"{sender}{recipient}{amount}{timestamp}".encode()).hexdigest(),
+        "signature": "ab" * 64,
+    }
+
+
+def make_block(transactions, version=1):
+    block = {
+        "index": 7,
+        "timestamp": 1700000123.456789,
+        "transactions": transactions,
+        "prev_hash": "00" + "3f" * 31,
+        "nonce": 123456,
+    }
+    if version == HEADER_VERSION:
+        block["version"] = HEADER_VERSION
+        block["difficulty"] = 2
+        block["merkle_root"] = merkle_root(transactions)
+    block["hash"] = hash_block(block)
+    return block
+
+
+TRANSACTIONS = [
+    make_tx("coinbase", "cd" * 64, 1, 1700000000.25),
+    make_tx("ef" * 64, "12" * 64, 0.1 + 0.2, 1700000001.1),  # Float amounts keep every bit
+    make_tx("ef" * 64, "Ünïcødé-wallet-✓", 3, 1700000002),  # Non-hex address, int timestamp
+    make_tx("ABCDEF", "abc", 5, 1e-7),  # Uppercase and odd-length strings aren't packed as hex
+]
+
+
+@pytest.mark.parametrize("version", [1, HEADER_VERSION])
+@pytest.mark.parametrize("transactions", [TRANSACTIONS, []], ids=["txs", "empty"])
+def test_block_round_trip_keeps_hash(version, transactions):
+    block = make_block(transactions, version)
+    decoded, end = codec.decode_block(codec.encode_block(block))
+    assert end == len(codec.encode_block(block))
+    assert decoded == block
+    assert hash_block(decoded) == block["hash"]
+    assert [type(tx["amount"]) for tx in decoded["transactions"]] == [type(tx["amount"]) for tx in transactions]
+
+
+def test_unknown_fields_round_trip():
+    block = make_block([{**TRANSACTIONS[1], "fee": 0.5, "memo": "née"}])
+    block["extra"] = {"note": "ünïcode"}
+    block["hash"] = hash_block(block)
+    decoded, _ = codec.decode_block(codec.encode_block(block))
+    assert decoded == block
+    assert hash_block(decoded) == block["hash"]
+
+
+def test_message_round_trip():
+    blocks = [make_block(TRANSACTIONS), make_block([], HEADER_VERSION)]
+    message = {"from_height": 3, "blocks": blocks, "length": 10, "id": "ä"}
+    assert codec.decode_message(codec.encode_message(message, "blocks")) == message
+    single = {"block": blocks[0], "status": "ok"}
+    assert codec.decode_message(codec.encode_message(single, "block")) == single
+
+
+def test_decode_message_rejects_other_data():
+    with pytest.raises(ValueError):
+        codec.decode_message(b"{}")
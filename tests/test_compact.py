@@ -0,0 +1,105 @@
+import json
+import pickle
+
+import pytest
+
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from src.blockstore import BlockStore
+from src.compact import AddressTable, CompactBlock, compact_block, compact_chain, to_plain
+from src.genesis import hash_block
+from src.ledger import LedgerState
+from src import pow
+from src.pow import verify_chain
+
+
+@pytest.fixture(scope="module")
+def wallets():
+    return make_wallet(), make_wallet()
+
+
+@pytest.fixture(scope="module")
+def chain(wallets):
+    owner, alice = wallets
+    chain = make_chain(owner[1], 3)
+    for i in range(4):
+        txs = [signed_tx(owner[0], owner[1], alice[1], 2 if i % 2 else 1.5, timestamp=1700000000.0 + i)]
+        chain.append(next_block(chain[-1], alice[1], txs))
+    return chain
+
+
+def test_round_trip(chain):
+    compact = compact_chain(chain)
+    assert all(isinstance(block, CompactBlock) for block in compact)
+    assert compact == chain
+    assert [block.to_dict() for block in compact] == chain
+    for block, original in zip(compact, chain):
+        assert hash_block(block) == original["hash"]
+        assert block["transactions"][-1]["txid"] == original["transactions"][-1]["txid"]
+        assert block["transactions"][-1:] == original["transactions"][-1:]
+    # Amounts keep their type
+    assert [type(tx["amount"]) for tx in compact[4]["transactions"]] == [type(tx["amount"]) for tx in chain[4]["transactions"]]
+
+    assert json.loads(json.dumps(compact, default=to_plain)) == chain
+    unpickled = pickle.loads(pickle.dumps(compact))
+    assert unpickled == chain and type(unpickled[0]) is dict
+
+
+def test_addresses_are_interned_once(chain, wallets):
+    table = AddressTable()
+    compact_chain(chain, table)
+    assert sorted(table.addresses) == sorted(["coinbase", wallets[0][1], wallets[1][1]])
+    compact = compact_chain(chain, table)
+    assert len(table) == 3
+    assert compact[5]["transactions"][1]["sender"] is compact[6]["transactions"][1]["sender"]
+
+
+@pytest.mark.parametrize("workers", [1, 2], ids=["sequential", "pool"])
+def test_chain_checks_take_compact_blocks(chain, wallets, workers, monkeypatch):
+    monkeypatch.setattr(pow, "VERIFY_RANGE_SIZE", 2)
+    compact = compact_chain(chain)
+    assert verify_chain(compact, wallets[0][1], workers=workers)[:2] == (True, f"Chain valid ({len(chain)} blocks)")
+    ledger = LedgerState.from_chain(compact)
+    assert ledger.balances == LedgerState.from_chain(chain).balances
+    with pytest.raises(TypeError):
+        compact[3]["transactions"][0]["amount"] = 1
+
+
+def test_blocks_that_do_not_fit_stay_dicts(chain):
+    table = AddressTable()
+    odd = dict(chain[3], transactions=[dict(chain[3]["transactions"][0], recipient=None)])
+    assert compact_block(odd, table) is odd
+    extra = dict(chain[3], version=1)
+    extra["transactions"] = [dict(tx, memo="hi") for tx in chain[3]["transactions"]]
+    block = compact_block(extra, table)
+    assert isinstance(block, CompactBlock)
+    assert block["version"] == 1 and block["transactions"][0]["memo"] == "hi"
+    assert block.to_dict() == extra
+    signature = dict(chain[4]["transactions"][1], signature="ABCD")
+    assert compact_block(dict(chain[4], transactions=[signature]), table)["transactions"][0]["signature"] == "ABCD"
+
+
+def test_fork_on_a_compact_chain(chain, wallets, tmp_path):
+    store = BlockStore(str(tmp_path / "blocks"))
+    for block in chain:
+        store.append(block)
+    table = AddressTable()
+    compact = compact_chain(store, table)
+    assert compact == chain
+
+    # Reorg at height 5 onto a fork mined by a new address
+    carol = make_wallet()
+    fork = chain[:5]
+    fork.append(next_block(fork[-1], carol[1], [signed_tx(wallets[1][0], wallets[1][1], carol[1], 1)]))
+    fork.append(next_block(fork[-1], carol[1]))
+    store.truncate(5)
+    del compact[5:]
+    for block in fork[5:]:
+        store.append(block)
+        compact.append(compact_block(block, table))
+
+    assert compact == fork
+    assert compact == compact_chain(store, table)
+    assert compact[-1]["transactions"][0]["recipient"] == carol[1]
+    assert verify_chain(compact, wallets[0][1], workers=1)[0]
+    assert LedgerState.from_chain(compact).balances == LedgerState.from_chain(fork).balances
+    store.close()
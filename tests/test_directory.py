@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import node as node_module
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from src.crypto import get_display_address
+from src.directory import AddressDirectory, is_canonical_address, is_display_address
+from src.ledger import LedgerState
+
+
+@pytest.fixture(scope="module")
+def wallets():
+    return make_wallet(), make_wallet(), make_wallet()
+
+
+@pytest.fixture(scope="module")
+def chain(wallets):
+    owner, alice, bob = wallets
+    chain = make_chain(owner[1], 3)
+    chain.append(next_block(chain[-1], owner[1], [signed_tx(owner[0], owner[1], alice[1], 5)]))
+    chain.append(next_block(chain[-1], bob[1], [signed_tx(alice[0], alice[1], owner[1], 1)]))
+    return chain
+
+
+@pytest.fixture
+def directory(tmp_path):
+    directory = AddressDirectory(str(tmp_path / "addresses.db"))
+    yield directory
+    directory.close()
+
+
+def first_seen(directory, canonical):
+    return directory.db.execute("SELECT height FROM addresses WHERE canonical = ?", (canonical,)).fetchone()[0]
+
+
+def test_address_shapes(wallets):
+    canonical = wallets[0][1]
+    display = get_display_address(canonical)
+    assert is_canonical_address(canonical) and not is_canonical_address(display)
+    assert is_display_address(display) and not is_display_address(canonical)
+    assert not is_display_address(None) and not is_canonical_address(42)
+
+
+def test_round_trip(directory, chain, wallets, tmp_path):
+    for block in chain:
+        directory.add_block(block)
+    assert len(directory) == 3
+    for _, canonical in wallets:
+        assert directory.resolve(get_display_address(canonical)) == canonical
+    assert directory.resolve("PHN" + "0" * 40) is None
+    # The height an address was first seen at is kept
+    assert [first_seen(directory, canonical) for _, canonical in wallets] == [0, 3, 4]
+    with pytest.raises(ValueError):
+        directory.add_block(chain[1])
+
+    directory.close()
+    reopened = AddressDirectory(str(tmp_path / "addresses.db"))
+    assert reopened.height == len(chain) and len(reopened) == 3
+    reopened.close()
+
+
+def test_truncate_forgets_addresses_first_seen_above(directory, chain, wallets):
+    owner, alice, bob = wallets
+    directory.sync(chain)
+    directory.truncate(4)
+    assert directory.height == 4
+    assert directory.resolve(get_display_address(bob[1])) is None
+    assert directory.resolve(get_display_address(alice[1])) == alice[1]
+    # Alice is seen again at height 4 but keeps height 3
+    directory.sync(chain)
+    assert first_seen(directory, alice[1]) == 3 and len(directory) == 3
+
+
+def test_sync_rolls_back_past_a_fork(directory, chain, wallets):
+    owner, alice, bob = wallets
+    carol = make_wallet()
+    directory.sync(chain)
+    fork = chain[:3]
+    fork.append(next_block(fork[-1], carol[1]))
+    fork.append(next_block(fork[-1], carol[1]))
+
+    directory.sync(fork)
+    assert directory.height == len(fork)
+    assert directory.block_hash(3) == fork[3]["hash"]
+    assert directory.resolve(get_display_address(carol[1])) == carol[1]
+    for _, canonical in (alice, bob):
+        assert directory.resolve(get_display_address(canonical)) is None
+    assert len(directory) == 2
+
+
+def test_resolve_address_handler(tmp_path, monkeypatch, chain, wallets):
+    monkeypatch.setattr(node_module, "TXINDEX_FILE", str(tmp_path / "txindex.sqlite"))
+    monkeypatch.setattr(node_module, "DIRECTORY_FILE", str(tmp_path / "addresses.sqlite"))
+    n = node_module.Node(list(chain), wallets[0][1], LedgerState.from_chain(chain))
+    alice = get_display_address(wallets[1][1])
+    unknown = "PHN" + "0" * 40
+
+    async def calls():
+        return (
+            # The hex part of a display address is case-insensitive
+            await n.resolve_address(None, {"address": alice.upper()}),
+            await n.resolve_address(None, {"address": unknown}),
+            await n.resolve_address(None, {"addresses": [alice, unknown]}),
+            await n.resolve_address(None, {"address": wallets[1][1]}),
+        )
+
+    try:
+        single, missing, batch, bad = asyncio.run(calls())
+    finally:
+        n.txindex.close()
+        n.directory.close()
+    assert single["canonical"] == wallets[1][1]
+    assert missing == {"address": unknown, "error": "Address not seen on chain"}
+    assert batch == {"resolved": {alice: wallets[1][1], unknown: None}}
+    assert "error" in bad
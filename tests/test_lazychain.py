@@ -0,0 +1,84 @@
+import pytest
+
+from chainutil import make_chain, make_wallet, next_block
+from src import genesis
+from src.blockstore import BlockStore, encode_record
+from src.lazychain import HEADER_FIELDS, LazyChain
+
+
+@pytest.fixture(scope="module")
+def chain():
+    return make_chain(make_wallet()[1], 10)
+
+
+@pytest.fixture
+def store(tmp_path, chain):
+    store = BlockStore(str(tmp_path / "blocks"), segment_size=1000)
+    for block in chain:
+        store.append(block)
+    yield store
+    store.close()
+
+
+def fork_of(chain, height, length):
+    fork = chain[:height]
+    while len(fork) < length:
+        fork.append(next_block(fork[-1], make_wallet()[1]))
+    return fork
+
+
+def headers(blocks):
+    return [{field: block[field] for field in HEADER_FIELDS if field in block} for block in blocks]
+
+
+def test_round_trip(store, chain):
+    lazy = LazyChain(store)
+    assert len(lazy) == len(chain) and bool(lazy)
+    assert lazy.headers == headers(chain)
+    assert lazy[0] == chain[0] and lazy[-1] == chain[-1]
+    assert lazy[2:5] == chain[2:5]
+    assert list(lazy) == chain
+    assert lazy.record_size(3) == len(encode_record(chain[3]))
+    with pytest.raises(IndexError):
+        lazy[len(chain)]
+    lazy.close()
+
+
+def test_truncate_and_fork_through_the_view(store, chain):
+    lazy = LazyChain(store)
+    lazy[-1]  # Map the segments before they shrink
+    fork = fork_of(chain, 6, 12)
+    lazy.truncate(6)
+    assert len(lazy) == 6 and len(store) == 6
+    for block in fork[6:]:
+        lazy.append(block)
+    assert lazy.headers == headers(fork)
+    assert list(lazy) == fork
+    assert list(LazyChain(store)) == fork
+    lazy.close()
+
+
+def test_store_truncate_updates_the_view(store, chain):
+    lazy = LazyChain(store)
+    assert lazy[-1] == chain[-1]
+    store.truncate(4)
+    assert len(lazy) == 4
+    assert lazy[-1] == chain[3]
+    fork = fork_of(chain, 4, 11)
+    for block in fork[4:]:
+        store.append(block)
+    assert lazy.headers == headers(fork)
+    assert lazy[-1] == fork[-1] and lazy[5] == fork[5]
+    lazy.close()
+
+
+def test_save_blockchain_reorg_updates_the_view(store, chain, monkeypatch):
+    monkeypatch.setattr(genesis, "_block_store", store)
+    lazy = LazyChain(store)
+    assert lazy[-1] == chain[-1]
+    fork = fork_of(chain, 7, 12)
+    genesis.save_blockchain(fork)
+    assert len(store) == 12
+    assert lazy.headers == headers(fork)
+    assert list(lazy) == fork
+    lazy.close()
@@ -0,0 +1,88 @@
+import copy
+
+import pytest
+
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from src.ledger import LedgerState
+from src.pow import check_block_balances, validate_block
+
+
+def state(ledger):
+    return copy.deepcopy((ledger.balances, ledger.nonces, ledger.last_seen, ledger.height))
+
+
+@pytest.fixture
+def owner():
+    return make_wallet()
+
+
+def test_apply_rollback_symmetry(owner):
+    alice, bob = make_wallet(), make_wallet()
+    chain = make_chain(owner[1], 2)
+    chain.append(next_block(chain[-1], owner[1], [
+        signed_tx(owner[0], owner[1], alice[1], 50),
+        signed_tx(owner[0], owner[1], bob[1], 20, timestamp=1700000001.0),
+    ]))
+    chain.append(next_block(chain[-1], alice[1], [
+        signed_tx(alice[0], alice[1], bob[1], 30),
+        signed_tx(alice[0], alice[1], owner[1], 10),
+        signed_tx(bob[0], bob[1], alice[1], 5),
+    ]))
+    ledger = LedgerState()
+    states = [state(ledger)]
+    for block in chain:
+        ledger.apply_block(block)
+        states.append(state(ledger))
+
+    assert ledger.get_balance(alice[1]) == 50 - 30 - 10 + 5 + 1
+    assert ledger.get_balance(bob[1]) == 20 + 30 - 5
+    assert ledger.get_nonce(alice[1]) == 2 and ledger.get_nonce(owner[1]) == 2
+    assert ledger.get_last_seen(bob[1]) == 3
+
+    for block in reversed(chain):
+        states.pop()
+        ledger.rollback_block(block)
+        assert state(ledger) == states[-1]
+    assert state(ledger) == state(LedgerState())
+
+
+def test_rollback_only_the_tip(owner):
+    chain = make_chain(owner[1], 3)
+    ledger = LedgerState.from_chain(chain)
+    with pytest.raises(ValueError):
+        ledger.rollback_block(chain[1])
+
+
+def test_undo_log_is_bounded(owner):
+    chain = make_chain(owner[1], 6)
+    ledger = LedgerState(max_undo=2)
+    for block in chain:
+        ledger.apply_block(block)
+    assert len(ledger._undo) == 2
+    ledger.rollback_block(chain[5])
+    ledger.rollback_block(chain[4])
+    before = state(ledger)
+    with pytest.raises(ValueError, match="No undo data"):
+        ledger.rollback_block(chain[3])
+    assert state(ledger) == before
+
+
+def test_spends_within_one_block_add_up(owner):
+    alice = make_wallet()
+    chain = make_chain(owner[1], 2)
+    chain.append(next_block(chain[-1], owner[1], [signed_tx(owner[0], owner[1], alice[1], 10)]))
+    ledger = LedgerState.from_chain(chain)
+
+    # Each spend alone is covered, together they are not
+    overspend = next_block(chain[-1], owner[1], [
+        signed_tx(alice[0], alice[1], owner[1], 6),
+        signed_tx(alice[0], alice[1], owner[1], 6, timestamp=1700000001.0),
+    ])
+    assert check_block_balances(overspend, ledger) == (False, "Invalid transaction in block: Insufficient balance")
+    assert validate_block(overspend, chain, owner[1], ledger) == (False, "Invalid transaction in block: Insufficient balance")
+
+    exact = next_block(chain[-1], owner[1], [
+        signed_tx(alice[0], alice[1], owner[1], 6),
+        signed_tx(alice[0], alice[1], owner[1], 4, timestamp=1700000001.0),
+    ])
+    assert validate_block(exact, chain, owner[1], ledger) == (True, "Block valid")
@@ -0,0 +1,74 @@
+import json
+
+from src.mempool import Mempool
+
+ALICE, BOB, CAROL = "a" * 128, "b" * 128, "c" * 128
+
+
+def make_tx(txid, sender=ALICE, amount=1, recipient=CAROL):
+    return {"txid": txid, "sender": sender, "recipient": recipient, "amount": amount,
+            "timestamp": 1.0, "signature": "ab" * 64}
+
+
+def size_of(tx):
+    return len(json.dumps(tx))
+
+
+def test_duplicate_txid_rejected():
+    mempool = Mempool()
+    assert mempool.add(make_tx("t1"), 100) == (True, "Added to mempool")
+    assert mempool.add(make_tx("t1", sender=BOB), 100) == (False, "Duplicate transaction")
+    assert len(mempool) == 1
+    assert "t1" in mempool and mempool.get("t1")["sender"] == ALICE
+
+
+def test_pending_spends_count_against_balance():
+    mempool = Mempool()
+    assert mempool.add(make_tx("t1", amount=6), 10)[0]
+    assert mempool.add(make_tx("t2", amount=5), 10) == (False, "Insufficient balance (including pending transactions)")
+    assert mempool.add(make_tx("t3", amount=4), 10)[0]
+    assert mempool.pending_spend(ALICE) == 10
+    # Other senders are accounted separately
+    assert mempool.add(make_tx("t4", sender=BOB, amount=10), 10)[0]
+    mempool.remove("t1")
+    assert mempool.pending_spend(ALICE) == 4
+    assert mempool.add(make_tx("t2", amount=5), 10)[0]
+
+
+def test_memory_budget():
+    tx = make_tx("t0")
+    mempool = Mempool(max_bytes=3 * size_of(tx))
+    for i in range(3):
+        assert mempool.add(make_tx(f"t{i}"), 100)[0]
+    assert mempool.add(make_tx("t3"), 100) == (False, "Mempool full")
+    assert mempool.total_bytes == 3 * size_of(tx)
+    mempool.remove("t0")
+    assert mempool.add(make_tx("t3"), 100)[0]
+    assert Mempool(max_bytes=10).add(tx, 100) == (False, "Transaction too large")
+
+
+def test_template_is_arrival_order_and_bounded():
+    mempool = Mempool()
+    txs = [make_tx(f"t{i}", sender=sender) for i, sender in enumerate([ALICE, BOB, ALICE, CAROL])]
+    for tx in txs:
+        assert mempool.add(tx, 100)[0]
+    assert mempool.template(10) == txs
+    assert mempool.template(2) == txs[:2]
+    assert mempool.template(10, max_bytes=size_of(txs[0]) * 2 + 1) == txs[:2]
+    assert mempool.template(0) == []
+
+
+def test_remove_block():
+    mempool = Mempool()
+    balances = {ALICE: 10, BOB: 10}
+    for tx in [make_tx("a1", amount=3), make_tx("a2", amount=3), make_tx("b1", sender=BOB, amount=4)]:
+        assert mempool.add(tx, balances[tx["sender"]])[0]
+
+    # a1 is mined; separately, BOB's balance was spent by a transaction this mempool never saw
+    block = {"transactions": [make_tx("a1", amount=3), make_tx("other", sender=BOB, amount=9)]}
+    balances = {ALICE: 7, BOB: 1}
+    removed = mempool.remove_block(block, lambda address: balances.get(address, 0))
+    assert sorted(removed) == ["a1", "b1"]
+    assert [tx["txid"] for tx in mempool.template(10)] == ["a2"]
+    assert mempool.pending_spend(ALICE) == 3 and mempool.pending_spend(BOB) == 0
+    assert mempool.total_bytes == size_of(mempool.get("a2"))
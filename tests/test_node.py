@@ -0,0 +1,82 @@
+import pytest
+
+import node as node_module
+from chainutil import coinbase_tx, make_chain, make_wallet, next_block, signed_tx
+from src.blockstore import BlockStore
+from src.lazychain import LazyChain
+from src.ledger import LedgerState
+
+
+@pytest.fixture
+def owner():
+    return make_wallet()
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch, owner):
+    monkeypatch.setattr(node_module, "TXINDEX_FILE", str(tmp_path / "txindex.sqlite"))
+    monkeypatch.setattr(node_module, "DIRECTORY_FILE", str(tmp_path / "addresses.sqlite"))
+    chain = LazyChain(BlockStore(str(tmp_path / "blocks")))
+    chain.append(make_chain(owner[1], 1)[0])
+    n = node_module.Node(chain, owner[1], LedgerState.from_chain(chain))
+    yield n
+    n.txindex.close()
+    n.directory.close()
+    chain.close()
+
+
+def heights(n):
+    return len(n.blockchain), n.ledger.height, n.txindex.height, n.directory.height
+
+
+@pytest.mark.parametrize("field, value", [
+    ("recipient", None),
+    ("recipient", 42),
+    ("recipient", "not-an-address"),
+    ("amount", "1"),
+    ("amount", True),
+    ("amount", float("nan")),
+    ("timestamp", None),
+    ("signature", None),
+])
+def test_malformed_coinbase_rejected_and_node_keeps_going(node, owner, field, value):
+    coinbase = coinbase_tx(owner[1])
+    if value is None:
+        del coinbase[field]
+    else:
+        coinbase[field] = value
+    bad = next_block(node.blockchain[-1], owner[1], coinbase=coinbase)
+    valid, message, _ = node._apply_block(bad)
+    assert not valid and message.startswith("Invalid coinbase transaction"), message
+    assert heights(node) == (1, 1, 1, 1)
+
+    good = next_block(node.blockchain[-1], owner[1])
+    valid, message, _ = node._apply_block(good)
+    assert valid, message
+    assert heights(node) == (2, 2, 2, 2)
+    assert node.ledger.get_balance(owner[1]) == node.blockchain[0]["transactions"][0]["amount"] + 1
+
+
+def test_failed_apply_leaves_state_untouched(node, owner):
+    recipient = make_wallet()[1]
+    tx = signed_tx(owner[0], owner[1], recipient, 5)
+    block = next_block(node.blockchain[-1], owner[1], [tx])
+
+    add_block = node.directory.add_block
+
+    def broken(block):
+        raise OSError("disk full")
+    node.directory.add_block = broken
+    valid, message, _ = node._apply_block(block)
+    assert not valid and "disk full" in message
+    assert heights(node) == (1, 1, 1, 1)
+    assert node.ledger.get_balance(recipient) == 0
+    assert tx["txid"] not in node.txindex
+
+    node.directory.add_block = add_block
+    valid, message, _ = node._apply_block(block)
+    assert valid, message
+    assert heights(node) == (2, 2, 2, 2)
+    assert node.ledger.get_balance(recipient) == 5
+    assert node.txindex.lookup(tx["txid"]) == (1, 1)
+
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import node as node_module
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from src import queries
+from src.ledger import LedgerState
+
+
+@pytest.fixture(scope="module")
+def wallets():
+    return make_wallet(), make_wallet(), make_wallet()
+
+
+@pytest.fixture(scope="module")
+def chain(wallets):
+    owner, alice, bob = wallets
+    chain = make_chain(owner[1], 2)
+    chain.append(next_block(chain[-1], bob[1], [signed_tx(owner[0], owner[1], alice[1], 7)]))
+    chain.append(next_block(chain[-1], bob[1], [signed_tx(alice[0], alice[1], bob[1], 2.5)]))
+    return chain
+
+
+def test_balances_scan_matches_ledger(chain, wallets):
+    addresses = [canonical for _, canonical in wallets] + ["never-seen"]
+    scanned = queries.get_balances(addresses, chain)
+    assert scanned == queries.get_balances(addresses, chain, LedgerState.from_chain(chain))
+    assert scanned[wallets[1][1]] == 4.5 and scanned["never-seen"] == 0
+
+
+def test_balances_follow_a_fork(chain, wallets):
+    owner, alice, bob = wallets
+    ledger = LedgerState.from_chain(chain)
+    ledger.rollback_block(chain[3])
+    fork = chain[:3] + [next_block(chain[2], owner[1], [signed_tx(alice[0], alice[1], owner[1], 1)])]
+    ledger.apply_block(fork[3])
+    addresses = [owner[1], alice[1], bob[1]]
+    assert queries.get_balances(addresses, fork, ledger) == queries.get_balances(addresses, fork)
+    assert queries.get_balances([alice[1]], fork, ledger) == {alice[1]: 6}
+
+
+def test_batch_limits_in_node_handlers(tmp_path, monkeypatch, chain, wallets):
+    monkeypatch.setattr(node_module, "TXINDEX_FILE", str(tmp_path / "txindex.sqlite"))
+    monkeypatch.setattr(node_module, "DIRECTORY_FILE", str(tmp_path / "addresses.sqlite"))
+    monkeypatch.setattr(node_module, "MAX_BATCH_SIZE", 3)
+    n = node_module.Node(list(chain), wallets[0][1], LedgerState.from_chain(chain))
+    addresses = [canonical for _, canonical in wallets]
+
+    async def calls():
+        return (
+            await n.get_balances(None, {"addresses": addresses}),
+            await n.get_balances(None, {"addresses": addresses + ["one-too-many"]}),
+            await n.get_balances(None, {"addresses": "not-a-list"}),
+            await n.get_tx_status(None, {"txids": [chain[2]["transactions"][1]["txid"]]}),
+            await n.get_tx_status(None, {"txids": ["a", "b", "c", "d"]}),
+        )
+
+    try:
+        balances, too_many, not_a_list, statuses, too_many_txids = asyncio.run(calls())
+    finally:
+        n.txindex.close()
+        n.directory.close()
+    assert balances == {"balances": queries.get_balances(addresses, chain)}
+    assert too_many == not_a_list == {"error": "'addresses' must be a list of at most 3 addresses"}
+    assert statuses == {"statuses": {chain[2]["transactions"][1]["txid"]: {"status": "confirmed", "height": 2, "confirmations": 2}}}
+    assert too_many_txids == {"error": "'txids' must be a list of at most 3 txids"}
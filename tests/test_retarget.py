@@ -0,0 +1,73 @@
+import pytest
+
+from bench.retarget_sim import DEFAULT_PHASES, DEFAULT_TOLERANCE, parse_phases, simulate, summarize
+from src.difficulty import (LEGACY_TARGET, MAX_TARGET, RetargetSchedule, bits_to_target, difficulty_to_target,
+                            retarget, target_to_bits, target_to_difficulty)
+
+BLOCK_TIME = 60
+INTERVAL = 20
+MAX_FACTOR = 4
+
+
+def settled_errors(phases, **kwargs):
+    chain = simulate(phases, INTERVAL, BLOCK_TIME, MAX_FACTOR, **kwargs)
+    results = summarize(chain, phases, INTERVAL, BLOCK_TIME)
+    return [abs(phase["settled_mean_interval"] - BLOCK_TIME) / BLOCK_TIME for phase in results["phases"]], chain
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_intervals_settle_under_changing_hashrate(seed):
+    errors, _ = settled_errors(parse_phases(DEFAULT_PHASES), seed=seed)
+    assert max(errors) < DEFAULT_TOLERANCE
+
+
+def test_pushing_timestamps_forward_does_not_lower_difficulty():
+    phases = parse_phases("1x400")
+    errors, chain = settled_errors(phases, manipulate=True)
+    assert max(errors) < DEFAULT_TOLERANCE
+    assert target_to_difficulty(chain[-1]["target"]) > target_to_difficulty(LEGACY_TARGET) - 0.5
+
+
+def test_without_future_bound_manipulation_collapses_difficulty():
+    # The same miner with no limit on future timestamps: what the rules prevent
+    _, chain = settled_errors(parse_phases("1x400"), manipulate=True, max_future=float("inf"))
+    assert target_to_difficulty(chain[-1]["target"]) < 0.5
+
+
+def schedule_chain(timestamps):
+    return [{"index": i, "timestamp": ts, "hash": f"{i:x}"} for i, ts in enumerate(timestamps)]
+
+
+def test_timestamp_rules():
+    schedule = RetargetSchedule(LEGACY_TARGET, 0, INTERVAL, BLOCK_TIME, MAX_FACTOR, median_blocks=5, max_future=600)
+    chain = schedule_chain([0, 60, 120, 180, 240, 300])  # Median of the last 5 is 180
+    assert schedule.check_timestamp(chain, 6, 181, now=400)[0]
+    assert not schedule.check_timestamp(chain, 6, 180, now=400)[0]
+    assert not schedule.check_timestamp(chain, 6, 1001, now=400)[0]
+    assert schedule.check_timestamp(chain, 6, 1000, now=400)[0]
+    assert schedule.check_timestamp(chain, 6, 10 ** 9)[0]  # Stored blocks: no clock to compare with
+    inactive = RetargetSchedule(LEGACY_TARGET, None, INTERVAL, BLOCK_TIME, MAX_FACTOR)
+    assert inactive.check_timestamp(chain, 6, 0, now=400)[0]
+
+
+def test_target_only_changes_at_window_boundaries():
+    schedule = RetargetSchedule(LEGACY_TARGET, 10, 5, BLOCK_TIME, MAX_FACTOR)
+    chain = schedule_chain([i * 30 for i in range(30)])  # Twice as fast as the block time
+    targets = [schedule.target_at(chain, h) for h in range(30)]
+    assert set(targets[:15]) == {LEGACY_TARGET}
+    assert targets[15] == LEGACY_TARGET // 2
+    assert len(set(targets[15:20])) == 1 and targets[20] == LEGACY_TARGET // 4
+
+
+def test_retarget_is_clamped():
+    assert retarget(LEGACY_TARGET, 10 ** 9, 100) == LEGACY_TARGET * MAX_FACTOR
+    assert retarget(LEGACY_TARGET, 0, 100) == LEGACY_TARGET // MAX_FACTOR
+    assert retarget(MAX_TARGET, 10 ** 9, 100) == MAX_TARGET
+    assert retarget(1, 0, 100) == 1
+
+
+@pytest.mark.parametrize("target", [1, 0x7F, 0x80, 0x123456, LEGACY_TARGET, difficulty_to_target(7), MAX_TARGET])
+def test_compact_bits(target):
+    bits = target_to_bits(target)
+    assert bits < 2 ** 32
+    assert bits_to_target(bits) <= target < bits_to_target(bits) + (target >> 15) + 1
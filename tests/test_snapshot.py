@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from src import snapshot
+from src.ledger import LedgerState
+
+
+def state(ledger):
+    return ledger.height, ledger.balances, ledger.nonces, ledger.last_seen
+
+
+@pytest.fixture(scope="module")
+def wallets():
+    return make_wallet(), make_wallet()
+
+
+@pytest.fixture(scope="module")
+def chain(wallets):
+    owner, alice = wallets
+    chain = make_chain(owner[1], 3)
+    for i in range(6):
+        txs = [signed_tx(owner[0], owner[1], alice[1], 2.5 if i % 2 else 3, timestamp=1700000000.0 + i)]
+        if i >= 2:
+            txs.append(signed_tx(alice[0], alice[1], owner[1], 1, timestamp=1700000100.0 + i))
+        chain.append(next_block(chain[-1], alice[1], txs))
+    return chain
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "snapshots")
+
+
+def test_round_trip(chain):
+    ledger = LedgerState.from_chain(chain)
+    ledger.last_seen["seen-without-balance"] = 0
+    ledger.balances["int-balance"] = 7
+    decoded, tip_hash = snapshot.decode_snapshot(snapshot.encode_snapshot(ledger, chain[-1]["hash"]))
+    assert tip_hash == chain[-1]["hash"]
+    assert state(decoded) == state(ledger)
+    # Int and float balances keep their type
+    assert {a: type(b) for a, b in decoded.balances.items()} == {a: type(b) for a, b in ledger.balances.items()}
+    assert {int, float} <= set(map(type, decoded.balances.values()))
+
+
+@pytest.mark.parametrize("damage", ["flip", "truncate", "extend"])
+def test_corrupt_snapshot_rejected(chain, damage):
+    data = bytearray(snapshot.encode_snapshot(LedgerState.from_chain(chain), chain[-1]["hash"]))
+    if damage == "flip":
+        data[snapshot.HEADER.size + 3] ^= 1
+    elif damage == "truncate":
+        del data[-40:]
+    else:
+        data += b"\0"
+    with pytest.raises(ValueError):
+        snapshot.decode_snapshot(bytes(data))
+
+
+def test_restore_replays_blocks_after_the_snapshot(chain, directory):
+    snapshot.write_snapshot(LedgerState.from_chain(chain[:5]), chain[4]["hash"], directory)
+    restored = snapshot.restore_ledger(chain, directory)
+    assert state(restored) == state(LedgerState.from_chain(chain))
+
+
+def test_snapshot_off_the_chain_is_skipped(chain, wallets, directory):
+    # Snapshots at heights 4 and 7, then the chain forks at height 6
+    snapshot.write_snapshot(LedgerState.from_chain(chain[:4]), chain[3]["hash"], directory)
+    snapshot.write_snapshot(LedgerState.from_chain(chain[:7]), chain[6]["hash"], directory)
+    fork = chain[:6]
+    while len(fork) < len(chain):
+        fork.append(next_block(fork[-1], wallets[0][1]))
+
+    assert snapshot.load_latest_snapshot(fork, directory).height == 4
+    assert state(snapshot.restore_ledger(fork, directory)) == state(LedgerState.from_chain(fork))
+    ok, message = snapshot.verify_snapshot(os.path.join(directory, snapshot._snapshot_name(7)), fork)
+    assert not ok and "not on the current chain" in message
+
+
+def test_unreadable_snapshot_falls_back(chain, directory):
+    snapshot.write_snapshot(LedgerState.from_chain(chain[:4]), chain[3]["hash"], directory)
+    path = snapshot.write_snapshot(LedgerState.from_chain(chain[:8]), chain[7]["hash"], directory)
+    with open(path, "r+b") as f:
+        f.truncate(20)
+    assert snapshot.load_latest_snapshot(chain, directory).height == 4
+
+
+def test_deep_verify_catches_a_wrong_state(chain, wallets, directory):
+    ledger = LedgerState.from_chain(chain[:6])
+    good = snapshot.write_snapshot(ledger, chain[5]["hash"], directory)
+    assert snapshot.verify_snapshot(good, chain, deep=True)[0]
+
+    # Intact file, right tip, wrong balance: only a replay notices
+    ledger.balances[wallets[1][1]] += 1
+    bad = snapshot.write_snapshot(ledger, chain[5]["hash"], os.path.join(directory, "bad"))
+    assert snapshot.verify_snapshot(bad, chain)[0]
+    assert snapshot.verify_snapshot(bad, chain, deep=True) == (False, "state differs from a replay of the chain")
+
+
+def test_restored_ledger_does_not_roll_back_below_the_snapshot(chain, directory):
+    snapshot.write_snapshot(LedgerState.from_chain(chain[:5]), chain[4]["hash"], directory)
+    ledger = snapshot.restore_ledger(chain, directory)
+    for block in reversed(chain[5:]):
+        ledger.rollback_block(block)
+    assert state(ledger) == state(LedgerState.from_chain(chain[:5]))
+    with pytest.raises(ValueError):
+        ledger.rollback_block(chain[4])
+
+
+def test_prune_keeps_the_newest(chain, directory):
+    for height in (2, 4, 6, 8):
+        snapshot.write_snapshot(LedgerState.from_chain(chain[:height]), chain[height - 1]["hash"], directory)
+    removed = snapshot.prune_snapshots(directory, keep=2)
+    assert [os.path.basename(path) for path in removed] == [snapshot._snapshot_name(2), snapshot._snapshot_name(4)]
+    assert [height for height, _ in snapshot.list_snapshots(directory)] == [6, 8]
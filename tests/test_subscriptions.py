@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+import node as node_module
+from blockchain_client import BlockchainClient
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from miner import ChainTipState
+from src import subscriptions
+from src.blockstore import BlockStore
+from src.difficulty import target_from_hex
+from src.lazychain import LazyChain
+from src.ledger import LedgerState
+from src.subscriptions import SubscriptionHub, tip_header
+
+
+@pytest.fixture
+def owner():
+    return make_wallet()
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch, owner):
+    monkeypatch.setattr(node_module, "TXINDEX_FILE", str(tmp_path / "txindex.sqlite"))
+    monkeypatch.setattr(node_module, "DIRECTORY_FILE", str(tmp_path / "addresses.sqlite"))
+    chain = LazyChain(BlockStore(str(tmp_path / "blocks")))
+    chain.append(make_chain(owner[1], 1)[0])
+    n = node_module.Node(chain, owner[1], LedgerState.from_chain(chain))
+    yield n
+    n.txindex.close()
+    n.directory.close()
+    chain.close()
+
+
+class FakeSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed = None
+        self.unblock = asyncio.Event()
+        if not blocked:
+            self.unblock.set()
+
+    async def send(self, message):
+        await self.unblock.wait()
+        self.sent.append(json.loads(message))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+def test_hub_routes_by_topic():
+    async def main():
+        hub = SubscriptionHub()
+        tips, everything = FakeSocket(), FakeSocket()
+        assert hub.subscribe(tips, ["tip", "bogus"]) == ["tip"]
+        assert hub.subscribe(everything, ["mempool"]) == ["mempool"]
+        assert hub.subscribe(everything, ["tip"]) == ["mempool", "tip"]
+        block = make_chain(make_wallet()[1], 1)[0]
+        hub.publish_tip(block, {"target": "00ff", "difficulty": 2})
+        hub.publish_mempool(added=[{"txid": "a"}])
+        hub.publish_mempool()  # Empty deltas are not sent
+        await asyncio.sleep(0)
+        hub.unsubscribe(tips)
+        hub.publish_mempool(removed=["a"])
+        await asyncio.sleep(0)
+        return block, tips.sent, everything.sent
+
+    block, tips, everything = asyncio.run(main())
+    new_tip = {"type": "new_tip", "tip": tip_header(block), "length": 1, "target": "00ff", "difficulty": 2}
+    assert tips == [new_tip]
+    assert everything == [
+        new_tip,
+        {"type": "mempool_delta", "added": [{"txid": "a"}], "removed": []},
+        {"type": "mempool_delta", "added": [], "removed": ["a"]},
+    ]
+
+
+def test_slow_subscriber_is_dropped(monkeypatch):
+    monkeypatch.setattr(subscriptions, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def main():
+        hub = SubscriptionHub()
+        slow, fast = FakeSocket(blocked=True), FakeSocket()
+        hub.subscribe(slow, ["mempool"])
+        hub.subscribe(fast, ["mempool"])
+        # The slow socket's delivery task takes the first push and blocks on it;
+        # two more fill its queue and the fourth overflows it
+        for i in range(4):
+            hub.publish_mempool(removed=[str(i)])
+            await asyncio.sleep(0)
+        return hub, slow, fast
+
+    hub, slow, fast = asyncio.run(main())
+    assert list(hub.subscribers) == [fast]
+    assert slow.closed == 1013
+    assert [message["removed"] for message in fast.sent] == [["0"], ["1"], ["2"], ["3"]]
+
+
+def test_node_pushes_tips_and_mempool_deltas(node, owner):
+    recipient = make_wallet()[1]
+    tx = signed_tx(owner[0], owner[1], recipient, 5)
+    genesis = node.blockchain[0]
+    block = next_block(genesis, owner[1], [tx])
+    stale = next_block(genesis, recipient)  # Competes with 'block' at height 1
+    child = next_block(block, owner[1])
+
+    async def main():
+        async with websockets.serve(node.handle_connection, "localhost", 0) as server:
+            url = f"ws://localhost:{server.sockets[0].getsockname()[1]}"
+            subscriber, sender = BlockchainClient(url, request_timeout=5), BlockchainClient(url, request_timeout=5)
+            pushes = asyncio.Queue()
+            subscriber.on_push = pushes.put_nowait
+            try:
+                subscribed = await subscriber.send_request({"type": "subscribe"})
+                replies = [await sender.send_request({"type": "send_tx", "tx": tx})]
+                received = [await asyncio.wait_for(pushes.get(), 2)]
+                for submitted in (block, stale, child):
+                    replies.append(await sender.send_request({"type": "submit_block", "block": submitted}))
+                while len(received) < 4:
+                    received.append(await asyncio.wait_for(pushes.get(), 2))
+                await asyncio.sleep(0.05)
+                return subscribed, replies, received, pushes.qsize()
+            finally:
+                await subscriber.disconnect()
+                await sender.disconnect()
+
+    subscribed, replies, received, leftover = asyncio.run(main())
+    assert subscribed["type"] == "subscribed" and subscribed["topics"] == ["mempool", "tip"]
+    assert subscribed["tip"] == tip_header(genesis) and subscribed["pending_transactions"] == []
+    assert [reply["status"] for reply in replies] == ["success", "success", "error", "success"]
+
+    added, first_tip, removed, second_tip = received
+    assert added == {"type": "mempool_delta", "added": [tx], "removed": []}
+    assert first_tip["tip"] == tip_header(block) and first_tip["length"] == 2
+    assert target_from_hex(first_tip["target"]) and "difficulty" in first_tip
+    assert removed == {"type": "mempool_delta", "added": [], "removed": [tx["txid"]]}
+    # The rejected block at height 1 was not pushed
+    assert second_tip["tip"] == tip_header(child) and second_tip["length"] == 3
+    assert leftover == 0
+
+
+def test_miner_tip_state_follows_pushes():
+    async def main():
+        chain = make_chain(make_wallet()[1], 2)
+        fork = next_block(chain[0], make_wallet()[1])
+        state = ChainTipState(tip_header(chain[1]), 2, [], 1 << 240, 2)
+        assert not state.work_available.is_set()
+
+        # The same tip again (e.g. our own block echoed back) changes nothing
+        state.handle_push({"type": "new_tip", "tip": tip_header(chain[1]), "length": 2})
+        assert not state.tip_changed.is_set()
+
+        # A competing block at the same height replaces the tip
+        state.handle_push({"type": "new_tip", "tip": tip_header(fork), "length": 2, "target": "00" + "ff" * 31, "difficulty": 2})
+        assert state.tip_changed.is_set() and state.tip == tip_header(fork)
+        assert state.target == target_from_hex("00" + "ff" * 31)
+
+        state.handle_push({"type": "mempool_delta", "added": [{"txid": "a"}, {"txid": "b"}], "removed": []})
+        state.handle_push({"type": "mempool_delta", "added": [], "removed": ["a", "unknown"]})
+        return state
+
+    state = asyncio.run(main())
+    assert list(state.pending) == ["b"] and state.work_available.is_set()
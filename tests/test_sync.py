@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+import websockets
+
+import node as node_module
+from blockchain_client import BlockchainClient
+from chainutil import make_chain, make_wallet, next_block
+from src.blockstore import BlockStore
+from src.lazychain import HEADER_FIELDS, LazyChain
+from src.ledger import LedgerState
+
+
+@pytest.fixture(scope="module")
+def chain():
+    return make_chain(make_wallet()[1], 12)
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch, chain):
+    monkeypatch.setattr(node_module, "TXINDEX_FILE", str(tmp_path / "txindex.sqlite"))
+    monkeypatch.setattr(node_module, "DIRECTORY_FILE", str(tmp_path / "addresses.sqlite"))
+    blockchain = LazyChain(BlockStore(str(tmp_path / "blocks")))
+    for block in chain:
+        blockchain.append(block)
+    n = node_module.Node(blockchain, chain[0]["transactions"][0]["recipient"], LedgerState.from_chain(chain))
+    yield n
+    n.txindex.close()
+    n.directory.close()
+    blockchain.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = BlockStore(str(tmp_path / "cache"))
+    yield store
+    store.close()
+
+
+def headers(blocks):
+    return [{field: block[field] for field in HEADER_FIELDS if field in block} for block in blocks]
+
+
+def reorg(node, height, length):
+    """Replace the node's chain above 'height' with a fork of 'length' blocks."""
+    fork = list(node.blockchain[:height])
+    while len(fork) < length:
+        fork.append(next_block(fork[-1], make_wallet()[1]))
+    node.blockchain.truncate(height)
+    for block in fork[height:]:
+        node.blockchain.append(block)
+    return fork
+
+
+def sync(node, store, page_size=5, header_page_size=4):
+    """Run client.sync_blocks(store) against 'node' served locally; returns the
+    heights of the blocks it yielded."""
+    async def main():
+        async with websockets.serve(node.handle_connection, "localhost", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            client = BlockchainClient(f"ws://localhost:{port}", request_timeout=5)
+            client.BLOCK_PAGE_SIZE = page_size
+            client.HEADER_PAGE_SIZE = header_page_size
+            try:
+                return [block["index"] async for block in client.sync_blocks(store)]
+            finally:
+                await client.disconnect()
+
+    return asyncio.run(main())
+
+
+def test_get_blocks_pages(node, chain):
+    response = asyncio.run(node.get_blocks(None, {"from_height": 3, "count": 4}))
+    assert response == {"from_height": 3, "blocks": chain[3:7], "length": len(chain)}
+    # Past the tip: an empty page, not an error
+    response = asyncio.run(node.get_blocks(None, {"from_height": 10, "count": 5}))
+    assert response["blocks"] == chain[10:]
+    assert asyncio.run(node.get_blocks(None, {"from_height": 20}))["blocks"] == []
+
+
+def test_get_blocks_byte_budget(node, chain, monkeypatch):
+    monkeypatch.setattr(node_module, "MAX_BLOCKS_PAGE_BYTES", 2 * node.blockchain.record_size(1) + 1)
+    assert asyncio.run(node.get_blocks(None, {"from_height": 1, "count": 8}))["blocks"] == chain[1:3]
+    # A single block over the budget still comes back on its own
+    monkeypatch.setattr(node_module, "MAX_BLOCKS_PAGE_BYTES", 1)
+    assert asyncio.run(node.get_blocks(None, {"from_height": 1, "count": 8}))["blocks"] == chain[1:2]
+
+
+def test_get_headers_pages(node, chain, monkeypatch):
+    response = asyncio.run(node.get_headers(None, {"from_height": 2, "count": 3}))
+    assert response == {"from_height": 2, "headers": headers(chain[2:5]), "length": len(chain)}
+    monkeypatch.setattr(node_module, "MAX_HEADERS_PAGE", 2)
+    assert asyncio.run(node.get_headers(None, {"from_height": 0, "count": 10}))["headers"] == headers(chain[:2])
+
+
+@pytest.mark.parametrize("request_type", ["get_blocks", "get_headers"])
+@pytest.mark.parametrize("args", [{"from_height": -1}, {"count": 0}, {"from_height": "0"}, {"from_height": None}])
+def test_bad_page_arguments(node, request_type, args):
+    response = asyncio.run(getattr(node, request_type)(None, dict(args, type=request_type)))
+    assert response == {"error": "'from_height' must be >= 0 and 'count' >= 1"}
+
+
+def test_sync_round_trip(node, chain, cache):
+    assert sync(node, cache) == list(range(len(chain)))
+    assert list(cache) == chain
+    # Nothing new: nothing fetched again
+    assert sync(node, cache) == []
+    node.blockchain.append(next_block(chain[-1], make_wallet()[1]))
+    assert sync(node, cache) == [len(chain)]
+    assert list(cache) == list(node.blockchain)
+
+
+@pytest.mark.parametrize("fork_height", [1, 6, 11])
+def test_sync_rolls_the_cache_back_to_the_fork(node, chain, cache, fork_height):
+    sync(node, cache)
+    fork = reorg(node, fork_height, len(chain) + 2)
+    assert sync(node, cache) == list(range(fork_height, len(fork)))
+    assert list(cache) == fork
+
+
+def test_sync_after_the_node_shrinks(node, chain, cache):
+    sync(node, cache)
+    node.blockchain.truncate(7)
+    assert sync(node, cache) == []
+    assert list(cache) == chain[:7]
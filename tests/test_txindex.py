@@ -0,0 +1,115 @@
+import pytest
+
+from chainutil import make_chain, make_wallet, next_block, signed_tx
+from src import queries
+from src.txindex import TxIndex
+
+
+@pytest.fixture(scope="module")
+def wallets():
+    return make_wallet(), make_wallet()
+
+
+@pytest.fixture(scope="module")
+def chain(wallets):
+    owner, alice = wallets
+    chain = make_chain(owner[1], 3)
+    for i in range(5):
+        txs = [signed_tx(owner[0], owner[1], alice[1], 1 + i, timestamp=1700000000.0 + i)]
+        chain.append(next_block(chain[-1], owner[1], txs))
+    return chain
+
+
+@pytest.fixture
+def txindex(tmp_path):
+    txindex = TxIndex(str(tmp_path / "txindex.db"))
+    yield txindex
+    txindex.close()
+
+
+def locations(chain):
+    return {tx["txid"]: (block["index"], position)
+            for block in chain for position, tx in enumerate(block["transactions"])}
+
+
+def test_round_trip(txindex, chain, wallets, tmp_path):
+    for block in chain:
+        txindex.add_block(block)
+    for txid, location in locations(chain).items():
+        assert txid in txindex
+        assert txindex.lookup(txid) == location
+    assert txindex.lookup("0" * 64) is None
+    assert txindex.block_hash(len(chain) - 1) == chain[-1]["hash"]
+    with pytest.raises(ValueError):
+        txindex.add_block(chain[2])
+
+    # Reopening picks up where it left off
+    txindex.close()
+    reopened = TxIndex(str(tmp_path / "txindex.db"))
+    assert reopened.height == len(chain)
+    assert reopened.lookup(chain[4]["transactions"][1]["txid"]) == (4, 1)
+    reopened.close()
+
+
+def test_address_history_pages_newest_first(txindex, chain, wallets):
+    txindex.sync(chain)
+    alice = wallets[1][1]
+    total, refs = txindex.address_history(alice)
+    assert total == 5
+    assert refs == [(height, 1) for height in range(7, 2, -1)]
+    assert txindex.address_history(alice, offset=1, limit=2) == (5, [(6, 1), (5, 1)])
+    assert txindex.address_history("nobody") == (0, [])
+
+
+def test_query_paths(txindex, chain, wallets):
+    txindex.sync(chain)
+    tx = chain[5]["transactions"][1]
+    assert queries.get_tx(tx["txid"], chain, txindex) == {
+        "tx": tx, "height": 5, "position": 1, "confirmations": len(chain) - 5,
+    }
+    assert queries.get_tx("0" * 64, chain, txindex) is None
+
+    page = queries.get_address_history(wallets[1][1], chain, txindex, offset=0, limit=2)
+    assert page["total"] == 5
+    assert [entry["tx"] for entry in page["history"]] == [chain[7]["transactions"][1], chain[6]["transactions"][1]]
+
+    txids = [tx["txid"], "pending-txid", "0" * 64]
+    indexed = queries.get_tx_status(txids, chain, {"pending-txid"}, txindex)
+    assert indexed == queries.get_tx_status(txids, chain, {"pending-txid"})
+    assert indexed[tx["txid"]] == {"status": "confirmed", "height": 5, "confirmations": 3}
+    assert indexed["pending-txid"] == {"status": "pending"}
+    assert indexed["0" * 64] == {"status": "unknown"}
+
+
+def test_sync_rolls_back_past_a_fork(txindex, chain, wallets):
+    owner, alice = wallets
+    txindex.sync(chain)
+    fork = chain[:5]
+    fork.append(next_block(fork[-1], alice[1], [signed_tx(owner[0], owner[1], alice[1], 9, timestamp=1700000900.0)]))
+    fork.append(next_block(fork[-1], alice[1]))
+
+    txindex.sync(fork)
+    assert txindex.height == len(fork)
+    assert locations(fork) == {txid: txindex.lookup(txid) for txid in locations(fork)}
+    for block in chain[5:]:
+        for tx in block["transactions"]:
+            assert tx["txid"] not in txindex
+    total, refs = txindex.address_history(alice[1])
+    # Two payments kept from before the fork, then the fork's payment and both of its coinbases
+    assert total == 5
+    assert refs == [(6, 0), (5, 1), (5, 0), (4, 1), (3, 1)]
+
+
+def test_truncate(txindex, chain):
+    txindex.sync(chain)
+    txindex.truncate(4)
+    assert txindex.height == 4
+    assert txindex.block_hash(4) is None
+    assert chain[4]["transactions"][0]["txid"] not in txindex
+    assert chain[3]["transactions"][1]["txid"] in txindex
+    # Truncating above the tip is a no-op
+    txindex.truncate(10)
+    assert txindex.height == 4
+    txindex.sync(chain)
+    assert txindex.height == len(chain)
+    assert txindex.lookup(chain[-1]["transactions"][1]["txid"]) == (len(chain) - 1, 1)
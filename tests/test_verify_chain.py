@@ -0,0 +1,82 @@
+import pytest
+
+from chainutil import coinbase_tx, make_chain, make_wallet, mine, next_block, signed_tx
+from src import pow
+
+
+@pytest.fixture(params=[1, 2], ids=["sequential", "pool"])
+def workers(request, monkeypatch):
+    # Small ranges so the pool path actually fans out on a short chain
+    monkeypatch.setattr(pow, "VERIFY_RANGE_SIZE", 2)
+    return request.param
+
+
+@pytest.fixture
+def owner():
+    return make_wallet()
+
+
+def rebuild_from(chain, height):
+    """Re-mine every block from 'height' on so linkage and hashes hold again."""
+    for h in range(height, len(chain)):
+        chain[h]["prev_hash"] = chain[h - 1]["hash"]
+        mine(chain[h])
+    return chain
+
+
+def test_valid_chain(owner, workers):
+    chain = make_chain(owner[1], 6)
+    chain.append(next_block(chain[-1], owner[1], [signed_tx(owner[0], owner[1], make_wallet()[1], 3)]))
+    valid, message, ledger = pow.verify_chain(chain, owner[1], workers=workers)
+    assert valid, message
+    assert ledger.height == 7
+
+
+@pytest.mark.parametrize("field, value", [("recipient", None), ("amount", "1"), ("amount", float("inf"))])
+def test_malformed_coinbase_is_a_clean_rejection(owner, workers, field, value):
+    chain = make_chain(owner[1], 6)
+    coinbase = chain[4]["transactions"][0]
+    if value is None:
+        del coinbase[field]
+    else:
+        coinbase[field] = value
+    rebuild_from(chain, 4)
+    valid, message, ledger = pow.verify_chain(chain, owner[1], workers=workers)
+    assert not valid
+    assert message.startswith("Block #4: Invalid coinbase transaction"), message
+    assert ledger.height == 4
+
+
+def test_malformed_checkpointed_block_is_a_clean_rejection(owner, workers):
+    chain = make_chain(owner[1], 6)
+    del chain[2]["transactions"][0]["recipient"]
+    rebuild_from(chain, 2)
+    checkpoints = {5: chain[5]["hash"]}
+    valid, message, ledger = pow.verify_chain(chain, owner[1], checkpoints=checkpoints, workers=workers)
+    assert not valid
+    assert message.startswith("Block #2: Invalid coinbase transaction"), message
+    assert ledger.height == 2
+
+
+def test_edited_block_without_remining(owner, workers):
+    chain = make_chain(owner[1], 6)
+    chain[3]["transactions"][0]["amount"] = 1000
+    valid, message, _ = pow.verify_chain(chain, owner[1], workers=workers)
+    assert not valid and message.startswith("Block #3:"), message
+
+
+def test_overspend_is_a_clean_rejection(owner, workers):
+    chain = make_chain(owner[1], 3)
+    poor = make_wallet()
+    chain.append(next_block(chain[-1], owner[1], [signed_tx(poor[0], poor[1], owner[1], 5)]))
+    valid, message, ledger = pow.verify_chain(chain, owner[1], workers=workers)
+    assert not valid
+    assert message == "Block #3: Invalid transaction in block: Insufficient balance"
+    assert ledger.height == 3
+
+
+def test_second_coinbase_rejected(owner, workers):
+    chain = make_chain(owner[1], 3)
+    chain.append(next_block(chain[-1], owner[1], [coinbase_tx(owner[1])]))
+    valid, message, _ = pow.verify_chain(chain, owner[1], workers=workers)
+    assert not valid and message.startswith("Block #3:"), message